@@ -1,14 +1,15 @@
 import pandas as pd
 import numpy as np
 import time
-import re
 import glob
 import os
-import string
-from fuzzywuzzy import fuzz
-from fuzzywuzzy import process
 from datetime import timedelta
-from geopy.distance import geodesic
+import scoringEngine
+import nameNormalizer
+import nameMatching
+import tokenWeights
+import locationMatching
+import companyDimension
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -38,6 +39,90 @@ algorithm.
 
 """
 
+### when True, the candidates that cannot be among the pruneTopK best records of their
+### ID are dropped before the date differences and distances are calculated. The
+### highest and lowest reachable scores are taken from the band tables in
+### scoringEngine.py. The pruning only gives the same results as an unpruned run when
+### the scoring script uses the 'fixed' scale mode and pruneTopK is not smaller than
+### its topK. The pruned candidates are marked with a pruneTopK column in the
+### readyForScoring.csv file, and the Score, Rescore, and Tune scripts refuse to
+### score a marked file in the 'batch' or 'calibration' scale modes, where the range
+### depends on the dropped records (see scoringEngine.checkPruning())
+candidatePruning = False
+pruneTopK = 3
+
+### when True, the distances are only calculated for the records whose score can
+### depend on them under one of the distanceProfiles, which must list every scoring
+### profile the readyForScoring.csv file will be scored with (see scoringEngine.PROFILES).
+### The state profile never uses a distance for records with a city match, while the
+### stateless profile uses every distance, so a file scored with the stateless profile
+### or a scoringProfile column must include 'stateless' here. With lazyDistanceBands,
+### the remaining distances are also skipped once a calculated distance falls in the
+### first distance band. Leave lazyDistances off when the file will be re-scored or
+### tuned with other profiles or distance bands
+lazyDistances = False
+lazyDistanceBands = False
+distanceProfiles = ['state']
+
+### the distances are calculated on the WGS-84 ellipsoid ('ellipsoid'), as geopy's
+### geodesic does, or on a sphere ('haversine'), which is faster but up to about 0.5%
+### off (see locationMatching.distanceMiles())
+distance_mode = 'ellipsoid'
+
+### each unique pair of PatentsView and OC coordinates is only calculated once. When
+### set to a numpy file (e.g., "../csvResults/locationPairDistances.npz"), the
+### distances are also kept in this file, which is read once and written once per
+### run, and later runs only calculate the city pairs they have not seen before (see
+### locationMatching.py). The vectorized distances of a few million pairs take
+### seconds, so the cache is off unless reading the file is faster than that
+distance_cache = None
+locationMatching.useDistanceCache(distance_cache)
+
+### when True, the matched, address, and agent cities that are not in the
+### location_suppLatLong1.tsv file are given the coordinates of the most similar city
+### of the same state with a fuzz.ratio score of at least fuzzyCityCutoff. The score
+### is kept in the geocodeScore_match, geocodeScore_add, and geocodeScore_agt columns,
+### which are 100 for the cities found in the file, and the geocodeFuzzy_match,
+### geocodeFuzzy_add, and geocodeFuzzy_agt columns are True for the coordinates from
+### a similar city. These columns are only added when the fallback is on (see
+### locationMatching.attachCoordinates())
+fuzzyCities = False
+fuzzyCityCutoff = 90
+
+### when set to the zipcitystatelatlon.csv file (e.g., "../sourceFiles/zipcitystatelatlon.csv"),
+### the address and agent coordinates are first taken from the centroid of the OC
+### address_zipcode and agent_zipcode, and only the records without a known zip code
+### are geocoded by their city and state. The coordinates of each zip code are kept
+### in zip_index and rebuilt when the zip file changes (see locationMatching.zipIndex())
+zip_coordinates = None
+zip_index = "../csvResults/zipCoordinates.npz"
+
+### the normalized names, cities, and states are kept in this SQLite file and reused
+### by later runs of this script and the Prepare Patentview Data script. Entries
+### made with other cleaning rules are ignored (see nameNormalizer.py). Set to None to
+### normalize every value again
+normalization_cache = "../csvResults/nameNormalizationCache.sqlite"
+nameNormalizer.useCache(normalization_cache)
+
+### the fuzzy scores of the name pairs can be kept in this numpy file and reused by
+### later runs (see nameMatching.py). Each unique pair is always scored once per run,
+### and rapidfuzz scores the pairs about as fast as they are looked up, so the file
+### is off by default. Set to a path such as "../csvResults/namePairScores.npz" to
+### use it
+pair_cache = None
+nameMatching.useCache(pair_cache)
+
+### when True, the names are scored with the weighted token scorer instead of
+### fuzz.ratio, so generic tokens such as Technologies or Systems count less than the
+### tokens that are particular to an organization (see tokenWeights.py). The scores
+### are on the same 0 to 100 scale but are not the same as fuzz.ratio, so the name
+### bands of the scoring script should be tuned before they are used. The number of
+### PatentsView organization names and OC names that contain each token is kept in
+### token_table and updated with the names of each run. Set token_table to None to
+### count the names of the current run only
+token_weights = False
+token_table = "../csvResults/nameTokenFrequencies.sqlite"
+
 ### the code below imports all output files provided by Mike. This is accomplished by
 ### creating a list of output files utilizing the pattern indicated by the joined_files
 ### variable. ENSURE ALL FILES HAVE A DATE AT THE END OF THE FILE NAME. If the names
@@ -60,7 +145,107 @@ df=pd.concat(map(pd.read_csv, joined_list), ignore_index=True)
 
 df.dropna(subset=['name'],inplace=True)
 df.sort_values(by=['ID'],inplace=True)
-df1=df.iloc[:,[0,1,2,3,5,6,21,22,34,43,44,47,48]].reset_index(drop=True).copy()
+
+### the OC output is split into a company dimension with one row per unique company
+### (company_number and jurisdiction_code) and the candidate rows of each ID, which
+### refer to their company by company_id (see companyDimension.py). The same company
+### is often a candidate for many IDs, so the company fields are cleaned and decoded
+### once per company below and joined back to the candidate rows
+ocCompanies,ocCandidates=companyDimension.splitCompanies(df.reset_index(drop=True))
+ocCandidates.to_csv("../csvResults/ocCandidates.csv",index=False)
+os.chmod("../csvResults/ocCandidates.csv",0o777)
+
+### the company_number for each ID/match_num is kept to the side and added back
+### to the final output, so each scored record can be traced to a single OC company
+ocCompanyKeys=companyDimension.joinCompanies(ocCandidates,ocCompanies,['company_number'])
+ocCompanyKeys=ocCompanyKeys[['ID','match_num','company_number']].drop_duplicates(subset=['ID','match_num'])
+
+### end timer and print total time
+t1=time.time()
+total=t1-t0
+print("Total time is %.3f" % (total/60), "mins\n")
+print("The number of unique assignee IDs are:",ocCandidates.assignee_id.nunique())
+print("The number of candidate records are:",len(ocCandidates))
+print("The number of unique OC companies are:",len(ocCompanies),"\n")
+
+print(ocCompanies.info(null_counts=True),flush=True)
+print(ocCompanies.head(),flush=True)
+
+
+### this section cleans the OC companies once per company. The names, cities, and
+### states are stripped and converted to title case. The names are then cleaned
+### using the OC_NAME_RULES in nameNormalizer.py, which replace & with And, remove
+### a list of possible suffixes, and convert any remaining names that are not
+### standardized. The suffix list was constructed by manually inspecting the names
+### prior to cleaning and does not represent a comprehensive list. The address and
+### agent cities have the street address removed and the abbreviations spelled out,
+### and the address and agent states were manually identified as records that
+### needed to be standardized
+t0=time.time()
+
+for col in ['name','jurisdiction_code','address_city','address_state','agent_city','agent_state']:
+    ocCompanies[col]=nameNormalizer.normalizeNames(ocCompanies[col],nameNormalizer.TITLE_RULES)
+
+ocCompanies['name']=nameNormalizer.normalizeNames(ocCompanies['name'],nameNormalizer.OC_NAME_RULES)
+
+for col in ['address_city','agent_city']:
+    ocCompanies[col]=nameNormalizer.normalizeNames(ocCompanies[col],nameNormalizer.OC_CITY_RULES)
+
+for col in ['address_state','agent_state']:
+    ocCompanies[col]=nameNormalizer.normalizeNames(ocCompanies[col],nameNormalizer.OC_STATE_RULES)
+
+### end timer and print total time
+t1=time.time()
+total=t1-t0
+print("Total time is %.3f" % (total/60), "mins\n")
+
+print(ocCompanies.info(),flush=True)
+print(ocCompanies.head(),flush=True)
+
+
+### the next block of code extracts alternative and previous
+### names provided by the OC output. Not every record contains
+### information in these two columns, but for those that do
+### contain data, we want to examine if there exists a match
+### with PatentsView given an OC record that does not match.
+### For example, if the PatentsView name is ABC and the OC name
+### is ABCD, we would like to utilize the alternative and
+### previous name to see if we can obtain a better match (i.e.,
+### ABC). The addresses in the data field are also extracted and
+### split into their city, state, and zip code. The fields are
+### decoded once per company into long tables with one row per
+### name or address (see nameMatching.py and locationMatching.py)
+t0=time.time()
+
+nameLists=nameMatching.nameListTable(ocCompanies)
+addresses=locationMatching.addressTable(ocCompanies)
+
+### end timer and print total time
+t1=time.time()
+total=t1-t0
+print("Total time is %4f" % (total/60), "mins\n")
+print("The number of alternative names are:",(nameLists['kind']=='alternative').sum())
+print("The number of previous names are:",(nameLists['kind']=='previous').sum())
+print("The number of addresses are:",len(addresses),"\n")
+
+print(nameLists.info(),flush=True)
+print(nameLists.head(),flush=True)
+print(addresses.info(),flush=True)
+print(addresses.head(),flush=True)
+
+nameLists.to_csv("../csvResults/ocNameLists.csv",index=False)
+os.chmod("../csvResults/ocNameLists.csv",0o777)
+
+addresses.to_csv("../csvResults/ocDataAddresses.csv",index=False)
+os.chmod("../csvResults/ocDataAddresses.csv",0o777)
+
+
+### the clean company fields are joined back to the candidate rows
+t0=time.time()
+
+df1=companyDimension.joinCompanies(ocCandidates,ocCompanies,['name','jurisdiction_code','incorporation_date',
+                                                               'address_city','address_state','address_zipcode',
+                                                               'agent_city','agent_state','agent_zipcode'])
 
 ### end timer and print total time
 t1=time.time()
@@ -129,10 +314,10 @@ print(mergeResults1.head(),flush=True)
 mergeResults1.to_csv("../csvResults/mergedOCResultsAndPVInput.csv",index=False)
 os.chmod("../csvResults/mergedOCResultsAndPVInput.csv",0o777)
 
-### this section standardizes organization names from the PatentsView and OpenCorporates
-### data. This includes removing suffixes from company names and ensuring all strings
-### begin with a capital letter and the remainder is lowercase. Further, the alternate
-### and previous company names are extracted and standardized as well.
+### this section standardizes organization names from the PatentsView data. This
+### includes removing suffixes from company names and ensuring all strings begin with
+### a capital letter and the remainder is lowercase. The OC names were standardized
+### once per company above.
 
 ### start timer
 t0=time.time()
@@ -146,21 +331,13 @@ print(input_directory,"\n")
 
 ### import the output file from OC API matching and select columns
 df=pd.read_csv(input_directory)
-df['organization']=df['organization'].str.lstrip().str.rstrip().str.title()
-df['city']=df['city'].str.lstrip().str.rstrip().str.title()
-df['state']=df['state'].str.lstrip().str.rstrip().str.title()
-df['name']=df['name'].str.lstrip().str.rstrip().str.title()
-df['jurisdiction_code']=df['jurisdiction_code'].str.lstrip().str.rstrip().str.title()
-df['alternative_names']=df['alternative_names'].str.lstrip().str.rstrip().str.title()
-df['previous_names']=df['previous_names'].str.lstrip().str.rstrip().str.title()
-df['data']=df['data'].str.lstrip().str.rstrip().str.title()
-df['address_city']=df['address_city'].str.lstrip().str.rstrip().str.title()
-df['address_state']=df['address_state'].str.lstrip().str.rstrip().str.title()
-df['agent_city']=df['agent_city'].str.lstrip().str.rstrip().str.title()
-df['agent_state']=df['agent_state'].str.lstrip().str.rstrip().str.title()
-
-last = df.pop('match_num')
-df.insert(24, 'match_num', last)
+
+### the names, cities, and states are stripped and converted to title case. Each
+### column is normalized once per unique value (see nameNormalizer.py)
+for col in ['organization','city','state']:
+    df[col]=nameNormalizer.normalizeNames(df[col],nameNormalizer.TITLE_RULES)
+
+df['match_num']=df.pop('match_num')
 
 ### end timer and print total time
 t1=time.time()
@@ -173,54 +350,13 @@ print(df.info(null_counts=True),flush=True)
 print(df.head(),flush=True)
 
 
-### this section cleans the organization and name fields by standardizing
-### the names to facilitate better merge results. Skipping this section
-### will yield poor results in any subsequent merges.
+### this section cleans the organization field by standardizing the names
+### to facilitate better merge results. Skipping this section will yield
+### poor results in any subsequent merges.
 t0=time.time()
 
-### the pattern variable is utilized to create a 'list' of possible
-### suffixes that should be removed from the organization and name
-### fields. This list was constructed by manually inspecting the names
-### prior to cleaning and does not represent a comprehensive list
-pattern = '|'.join(['Llc','L\.L\.C\.','Inc\.$','Inc$','Ltd','\(','\)','Plc','P\.L\.C\.','Pllc','P\.L\.L\.C\.',
-                    'Lp\.$','Lp$','Llp$','LP','L\.P\.','LC','L\.C\.','Ag$','Gmbh','SA$','Kg','Pvt','Sa$','BV','Nv$',
-                    'Ab$','Pty$','SPA$','S\.P\.A\.','Bv','B\.V\.','B\.v\.','@','\.',','])
-
-### converts the first character in each word to Uppercase and
-### remaining characters to lowercase in the string, followed
-### by removing any whitespace that may exist to the left and
-### right of the strings
-df['name']=df['name'].str.replace('\s+',' ')
-
-df['name']=df['name'].str.replace(' & ', ' And ')
-df['name']=df['name'].str.replace('&', ' And ')
-df['name']=df['name'].str.replace(' - |-', ' ')
-df['name']=df['name'].str.replace('+', ' ')
-df['name']=df['name'].str.replace(' (Co\.$|Co$)', ' Company')
-df['name']=df['name'].str.replace(' (Corp\.|Corp) | (Corp\.$|Corp$) | (Corp\.$|Corp$)|[Cc]orporation', '')
-df['name']=df['name'].str.replace('Mfg', 'Manufacturing')
-df['name']=df['name'].str.replace('Incorporated|Usa|Incorportated', '')
-
-### apply the pattern variable to the organization field and
-### clean the resulting whitespace to the left and right of
-### the strings
-df['name']=df['name'].str.replace(pattern, '')
-df['name']=df['name'].str.lstrip().str.rstrip()
-
-### convert any remaining names that are not standardized
-df['name']=df['name'].str.replace(' (Co\.$|Co$)', ' Company')
-df['name']=df['name'].str.replace("\'S", "\'s")
-df['name']=df['name'].str.replace("L L C|Lc|Llc| Usa|Umi$|\/| Inc | Limited$| Llc", "")
-df['name']=df['name'].str.replace("Dba |DBA ", " ")
-df['name']=df['name'].str.replace("'|\?", "")
-df['name']=df['name'].str.replace(" Company$| USA$", "")
-df['name']=df['name'].str.replace("\s+", " ")
-df['name']=df['name'].str.rstrip().str.lstrip()
-
 ### cleanup any missed suffixes in the organization column
-df['organization']=df['organization'].str.replace("L L C|Lc|Llc| Usa|\/| Inc |\?| Ltd$| Ltd | Inc$| Company$", "")
-df['organization']=df['organization'].str.replace("\s+", " ")
-df['organization']=df['organization'].str.rstrip().str.lstrip()
+df['organization']=nameNormalizer.normalizeNames(df['organization'],nameNormalizer.OC_ORGANIZATION_RULES)
 
 ### end timer and print total time
 t1=time.time()
@@ -236,41 +372,8 @@ print(df.head(),flush=True)
 ### start timer
 t0=time.time()
 
-### the pattern variable is utilized to create a 'list' of
-### possible suffixes that should be removed from the
-### organization and name fields. This list was constructed
-### by manually inspecting the names prior to cleaning and
-### does not represent a comprehensive list
-pattern = '|'.join(['Llc','L\.L\.C\.','Inc\.$','Inc$','Ltd','\(','\)','Plc','P\.L\.C\.','Pllc','P\.L\.L\.C\.',
-                    'Lp\.$','Lp$','Llp$','LP','L\.P\.','LC','L\.C\.','Ag$','Gmbh','SA$','Kg','Pvt','Sa$','BV','Nv$',
-                    'Ab$','Pty$','SPA$','S\.P\.A\.','Bv','B\.V\.','B\.v\.','@','\.',','])
-
-df['assignee']=df['assignee'].str.replace('\s+',' ')
-
-df['assignee']=df['assignee'].str.replace(' & ', ' And ')
-df['assignee']=df['assignee'].str.replace('&', ' And ')
-df['assignee']=df['assignee'].str.replace(' - |-', ' ')
-df['assignee']=df['assignee'].str.replace('+', ' ')
-df['assignee']=df['assignee'].str.replace(' (Co\.$|Co$)', ' Company')
-df['assignee']=df['assignee'].str.replace(' (Corp\.|Corp) | (Corp\.$|Corp$) | (Corp\.$|Corp$)|[Cc]orporation', '')
-df['assignee']=df['assignee'].str.replace('Mfg', 'Manufacturing')
-df['assignee']=df['assignee'].str.replace('Incorporated|Usa|Incorportated', '')
-
-### apply the pattern variable to the organization field and
-### clean the resulting whitespace to the left and right of
-### the strings
-df['assignee']=df['assignee'].str.replace(pattern, '')
-df['assignee']=df['assignee'].str.lstrip().str.rstrip()
-
-### convert any remaining names that are not standardized
-df['assignee']=df['assignee'].str.replace(' (Co\.$|Co$)', ' Company')
-df['assignee']=df['assignee'].str.replace("\'S", "\'s")
-df['assignee']=df['assignee'].str.replace("L L C|Lc|Llc| Usa|Umi$|\/| Inc | Limited$| Llc", "")
-df['assignee']=df['assignee'].str.replace("Dba |DBA ", " ")
-df['assignee']=df['assignee'].str.replace("'|\?", "")
-df['assignee']=df['assignee'].str.replace(" Company$| USA$", "")
-df['assignee']=df['assignee'].str.replace("\s+", " ")
-df['assignee']=df['assignee'].str.rstrip().str.lstrip()
+### the assignee names are cleaned using the same rules as the OC names
+df['assignee']=nameNormalizer.normalizeNames(df['assignee'],nameNormalizer.OC_NAME_RULES)
 
 ### end timer and print total time
 t1=time.time()
@@ -283,264 +386,8 @@ print(df.info(),flush=True)
 print(df.head(),flush=True)
 
 
-### the script below compares the organization name from
-### PatentsView and OpenCorporates. If the name between the
-### two data sets are the same, a new column called matches
-### will place a one in the column for the respective record.
-### Otherwise, a zero will be recorded
-t0=time.time()
-matches=[]
-
-for i in range(len(df)):
-    if df.iloc[i,3] == df.iloc[i,14]:
-        matches.append(1)
-    else:
-        matches.append(0)
-
-df['matches']=matches
-
-### end timer and print total time
-t1=time.time()
-total=t1-t0
-print("Total time is %.3f" % (total/60), "mins\n")
-print("The number of unique assignee IDs are:",df.assignee_id.nunique())
-print("The number of unique patents are:",df.patent.nunique(),"\n")
-
-print(df.info(),flush=True)
-print(df.head(),flush=True)
-
-
-### the next couple blocks of code extracts alternative and
-### previous names provided by the OC output. Not every record
-### contains information in these two columns, but for those that
-### do contain data, we want to step through the records and
-### examine if there exists a match with PatentsView given
-### an OC record that does not match. For example, if the
-### PatentsView name is ABC and the OC name is ABCD, we would
-### like to utilize the alternative and previous name to see
-### if we can obtain a better match (i.e., ABC).
-t0=time.time()
-
-### regex and regex1 were used to extract the names
-regex="'Company_Name': '[A-Z].+?'"
-regex1="'[A-Z].+': "
-
-### the variable b records the length of the df, followed by
-### creating two empty lists
-b=len(df)
-sub_finalAlt = []
-finalAlt = []
-
-### this for loop reviews each record individually to extract
-### the organization names under the alternative_names column
-for j in range(b):
-
-    ### if the record is empty or nan the record will be skipped
-    if pd.isna(df.iloc[j,17]) is True:
-        pass
-
-    ### if the matches column has a 1, which indicates an exact
-    ### match, the record will be skipped
-    elif df.iloc[j,25] == 1:
-        pass
-
-    ### we begin by removing curly brackets from non-empty records
-    ### The findall function searches the list for all instances
-    ### that matches the regex variable and saves the list to the
-    ### match variable. The length of this list is determined and
-    ### provide to the nested loop below
-    else:
-        a=df.iloc[j,17][2:-2]
-        match = re.findall(regex, a)
-        c=len(match)
-
-        ### for any length of c greater than 0, this for loop will
-        ### evaluate each instance for the organization name by using
-        ### the regex1 variable to remove characters that are not
-        ### required. Once a match is found, the first character in
-        ### each string is converted to an uppercase and saved to the
-        ### sub_finalAlt list. The for loop repeats as many times
-        ### that is equal to c
-        for i in range(c):
-            match1 = re.sub(regex1,"",match[i])
-            match1=match1.replace("'","").title()
-
-            ### ensures all spaces between strings are a single space
-            match1 = re.sub('\s+',' ',match1)
-
-            ### replaces specific characters
-            match1=re.sub(' & ', ' And ',match1)
-            match1=match1.replace('&', ' And ')
-            match1=re.sub('Mfg', 'Manufacturing',match1)
-
-            ### convert any names that are not standardized
-            match1=re.sub(', Inc\.| Usa, Incorporated| Usa| Inc\.| Inc$| Incorpor$| Incorporated$|Incorporated', '',match1)
-            match1=re.sub(', Llc$| Ltd\.| Ltd| Limited| Pty\.| Pty|L\.L\.C\.| Llp$| Llc$|\(.+?\)|,Inc\.', '',match1)
-            match1=re.sub(', P\.C\.| P\.C\.| P\. C\.| D\.M\.D\.|D\.D\.S\.| D\. D\. S\.| M\.D\.|L\.L\.C', '',match1)
-            match1=re.sub(' Corporation$| Corporation,$| Corp\.$ | Corp.$| Corp\.$| Corp\.,$', ' Corporation',match1)
-            match1=re.sub('Co\.$| Co$', 'Company',match1)
-            match1=re.sub("'", '',match1)
-            match1=re.sub('L L C|Lc|Llc', '',match1)
-
-            ### removes as much punctuation as possible and ensures
-            ### all spaces were single spaced after processing the strings
-            match1 = re.sub('-|/',' ',match1)
-            match1 = match1.translate(str.maketrans('','',string.punctuation))
-            match1 = re.sub(' $| LP$','',match1)
-            match1 = re.sub('\s+',' ',match1)
-
-            ### appends the strings to list
-            sub_finalAlt.append(match1)
-
-    ### after the nested for loop is finished extracting all possible
-    ### organization names, the sub_finalAlt list is appended to the
-    ### finalAlt list. The finalAlt list is updated with the alternative
-    ### names for each record after the for loops are finished and resets
-    ### the sub_finalAlt to an empty list
-    finalAlt.append(sub_finalAlt)
-    sub_finalAlt = []
-
-### end timer and print total time
-t1=time.time()
-total=t1-t0
-print("Total time is %4f" % (total/60), "mins\n")
-
-### prints the finalAlt list for review
-print(finalAlt,flush=True)
-
-
-### start timer
-t0=time.time()
-
-### creates 2 empty lists to be filled with the extracted organization names
-### from the previous name field
-sub_finalPre = []
-finalPre = []
-
-regex="'Company_Name': '[A-Za-z].+?'"
-regex1="'[A-Za-z].+': "
-
-### this for loop reviews each record individually to extract
-### the organization names under the previous_names column
-for j in range(b):
-
-    ### if the record is empty or nan the record will be skipped
-    if pd.isna(df.iloc[j,18]) is True:
-        pass
-
-    ### if the matches column has a 1, which indicates an exact
-    ### match, the record will be skipped
-    elif df.iloc[j,25] == 1:
-        pass
-
-    ### we begin by removing curly brackets from non-empty records
-    ### The findall function searches the list for all instances
-    ### that matches the regex variable and saves the list to the
-    ### match variable. The length of this list is determined and
-    ### provide to the nested loop below
-    else:
-        a=df.iloc[j,18][2:-2]
-        match = re.findall(regex, a)
-        c=len(match)
-
-        ### for any length of c greater than 0, this for loop will
-        ### evaluate each instance for the organization name by using
-        ### the regex1 variable to remove characters that are not
-        ### required. Once a match is found, the first character in
-        ### each string is converted to an uppercase and saved to the
-        ### sub_finalPre list. The for loop repeats as many times
-        ### that is equal to c
-        for i in range(c):
-            match1 = re.sub(regex1,"",match[i])
-            match1=match1.replace("'","").title().lstrip().rstrip()
-
-            ### ensures all spaces between strings are a single space
-            match1 = re.sub('\s+',' ',match1)
-
-            ### replaces specific characters
-            match1=re.sub(' & ', ' And ',match1)
-            match1=match1.replace('&', ' And ')
-            match1=re.sub('Mfg', 'Manufacturing',match1)
-
-            ### convert any names that are not standardized
-            match1=re.sub(', Inc\.| Usa, Incorporated| Usa| Inc\.| Inc$| Incorpor$| Incorporated$|Incorporated', '',match1)
-            match1=re.sub(', Llc$| Ltd\.| Ltd| Limited| Pty\.| Pty', '',match1)
-            match1=re.sub('L\.L\.C\.| Llp$| Llc$|\(.+?\)|,Inc\.', '',match1)
-            match1=re.sub(', P\.C\.| P\.C\.| P\. C\.| D\.M\.D\.|D\.D\.S\.| D\. D\. S\.| M\.D\.', '',match1)
-            match1=re.sub(' Corporation$| Corporation,$| Corp\.$ | Corp.$| Corp\.$| Corp\.,$', ' Corporation',match1)
-            match1=re.sub('Co\.$| Co$', ' Company',match1)
-
-            match1=re.sub("'", '',match1)
-            match1=re.sub('L L C|Lc|Llc', '',match1)
-
-            ### removes all punctuation and ensures all spaces were single spaced after processing
-            ### the strings
-            match1 = re.sub('-|/',' ',match1)
-            match1 = match1.translate(str.maketrans('','',string.punctuation))
-            match1 = re.sub(' $| LP$','',match1)
-            match1 = re.sub('\s+',' ',match1)
-
-            ### appends the strings to list
-            sub_finalPre.append(match1)
-
-    ### after the nested for loop is finished extracting all possible organization names, the
-    ### sub_finalPre list is appended to the finalAlt list. The finalPre list is updated with
-    ### the previous names for each record after the for loops are finished and resets the
-    ### sub_finalPre to an empty list
-    finalPre.append(sub_finalPre)
-    sub_finalPre = []
-
-### end timer and print total time
-t1=time.time()
-total=t1-t0
-print("Total time is %4f" % (total/60), "mins\n")
-
-### prints the finalPre list for review
-print(finalPre,flush=True)
-
-
-### the alternative and previous names are appended to the existing data set using the lists
-### constructed in the above steps
-t0=time.time()
-
-df['alternative_names_clean'] = finalAlt
-df['previous_names_clean'] = finalPre
-
-### end timer and print total time
-t1=time.time()
-total=t1-t0
-print("Total time is %4f" % (total/60), "mins\n")
-print("The number of unique assignee IDs are:",df.assignee_id.nunique())
-print("The number of unique patents are:",df.patent.nunique(),"\n")
-
-print(df.info(),flush=True)
-print(df.head(),flush=True)
-
-
-### drop the alternative_names and previous_names columns and rearrange the alternative_names_clean
-### and previous_names_clean features
-t0=time.time()
-
-df1=df.copy()
-df1.drop(labels=['alternative_names','previous_names','matches'],axis=1,inplace=True)
-
-thr_col = df1.pop('alternative_names_clean')
-for_col = df1.pop('previous_names_clean')
-
-df1.insert(15, 'alternative_names_clean', thr_col)
-df1.insert(16, 'previous_names_clean', for_col)
-
-### end timer and print total time
-t1=time.time()
-total=t1-t0
-print("Total time is %4f" % (total/60), "mins\n")
-print("The number of unique assignee IDs are:",df.assignee_id.nunique())
-print("The number of unique patents are:",df.patent.nunique(),"\n")
-
-print(df1.info(),flush=True)
-print(df1.head(),flush=True)
-
-df1.to_csv("../csvResults/mergedOCResultsAndPVInputClnNames.csv",index=False)
+### the data is saved with the clean names
+df.to_csv("../csvResults/mergedOCResultsAndPVInputClnNames.csv",index=False)
 os.chmod("../csvResults/mergedOCResultsAndPVInputClnNames.csv",0o777)
 
 
@@ -571,59 +418,18 @@ print(df.head(),flush=True)
 ### standardize city names in the fields indicated below
 t0=time.time()
 
-df['city']=df['city'].str.replace("St\. |^St ","Saint ")
-df['city']=df['city'].str.replace("Ft\. |^Ft ","Fort ")
-df['city']=df['city'].str.replace("Mt\. |^Mt ","Mount ")
-df['city']=df['city'].str.replace("Pte\. |^Pte ","Pointe ")
-
-df['address_city']=df['address_city'].str.replace("St\. |^St ","Saint ")
-df['address_city']=df['address_city'].str.replace("Ft\. |^Ft ","Fort ")
-df['address_city']=df['address_city'].str.replace("Mt\. |^Mt ","Mount ")
-df['address_city']=df['address_city'].str.replace("Pte\. |^Pte ","Pointe ")
-df['address_city']=df['address_city'].str.replace("Mpls","Minneapolis")
-df['address_city']=df['address_city'].str.replace("^.+?, ","")
-
-df['agent_city']=df['agent_city'].str.replace("St\. |^St ","Saint ")
-df['agent_city']=df['agent_city'].str.replace("Ft\. |^Ft ","Fort ")
-df['agent_city']=df['agent_city'].str.replace("Mt\. |^Mt ","Mount ")
-df['agent_city']=df['agent_city'].str.replace("Pte\. |^Pte ","Pointe ")
-df['agent_city']=df['agent_city'].str.replace("Mpls","Minneapolis")
-df['agent_city']=df['agent_city'].str.replace("^.+?, ","")
-
-df['data']=df['data'].str.replace("St\. |^St ","Saint ")
-df['data']=df['data'].str.replace("Ft\. |^Ft ","Fort ")
-df['data']=df['data'].str.replace("Mt\. |^Mt ","Mount ")
-df['data']=df['data'].str.replace("Pte\. |^Pte ","Pointe ")
-
-### end timer and print total time
-t1=time.time()
-total=t1-t0
-print("Total time is %4f" % (total/60), "mins\n")
-print("The number of unique assignee IDs are:",df.assignee_id.nunique())
-print("The number of unique patents are:",df.patent.nunique(),"\n")
-
-print(df.info(),flush=True)
-print(df.head(),flush=True)
-
-
-### manually identified records that needed to be standardized
-### using the regex patterns indicated below
-t0=time.time()
-
-df['address_state']=df['address_state'].str.replace("^.+?, ","")
-df['address_state']=df['address_state'].str.replace("^Pa [0-9].*","Pa")
-df['address_state']=df['address_state'].str.replace("^.*Of ","")
-
-df['agent_state']=df['agent_state'].str.replace("^.+?, ","")
-df['agent_state']=df['agent_state'].str.replace("^Pa [0-9].*","Pa")
-df['agent_state']=df['agent_state'].str.replace("^.*Of ","")
+### the abbreviations are spelled out using the CITY_RULES in nameNormalizer.py.
+### The OC cities were cleaned once per company
+df['city']=nameNormalizer.normalizeNames(df['city'],nameNormalizer.CITY_RULES)
 
 ### end timer and print total time
 t1=time.time()
 total=t1-t0
 print("Total time is %4f" % (total/60), "mins\n")
 print("The number of unique assignee IDs are:",df.assignee_id.nunique())
-print("The number of unique patents are:",df.patent.nunique(),"\n")
+print("The number of unique patents are:",df.patent.nunique())
+print("The hit ratio of the unique-value name cleaning is: %.3f" % nameNormalizer.hitRatio())
+print("The number of unique values read from the normalization cache are:",nameNormalizer.normalizationStats['cached'],"\n")
 
 print(df.info(),flush=True)
 print(df.head(),flush=True)
@@ -631,260 +437,33 @@ print(df.head(),flush=True)
 
 ### now that the city and states are cleaned-up, we can perform
 ### direct matches between the PatentsView data and OC API results.
-### Performing this step now will save us time later when we must
-### extract city-state pairs from the data field
-t0=time.time()
-matchesC=[]
-matchesS=[]
-
-### if there is a match between cities, assign a one for the record
-### in a new column called cityMatches
-for i in range(len(df)):
-    if df.iloc[i,4] == df.iloc[i,20]:
-        matchesC.append(1)
-
-    elif df.iloc[i,4] == df.iloc[i,22]:
-        matchesC.append(1)
-
-    else:
-        matchesC.append(0)
-
-df['cityMatches']=matchesC
-
-### if there is a match between states, assign a one for the record
-### in a new column called stateMatches
-for i in range(len(df)):
-    if df.iloc[i,5] == df.iloc[i,21]:
-        matchesS.append(1)
-
-    elif df.iloc[i,5] == df.iloc[i,23]:
-        matchesS.append(1)
-
-    else:
-        matchesS.append(0)
-
-df['stateMatches']=matchesS
-
-### end timer and print total time
-t1=time.time()
-total=t1-t0
-print("Total time is %.3f" % (total/60), "mins\n")
-print("The number of unique assignee IDs are:",df.assignee_id.nunique())
-print("The number of unique patents are:",df.patent.nunique(),"\n")
-
-print(df.info(),flush=True)
-print(df.head(),flush=True)
-
-
-### the next couple blocks of code extracts city-state pairs from the data field
-### provided by the OC API results. Regex and regex1 are patterns utilized to
-### identify matches within the cell. These matchs are saved in a list and will
-### be appended to the existing data set
-t0=time.time()
-
-### creates 2 empty lists to be filled with the extracted cities
-sub_finalCity = []
-finalCity = []
-
-regex="'Description': '[A-Za-z0-9].+?'"
-regex1="'[A-Za-z].+': "
-
-### this for loop is initiated to review each record individually and extract the
-### city names under the data column
-for j in range(len(df)):
-
-    ### if the record is empty or nan the record will be skipped
-    if pd.isna(df.iloc[j,19]) is True:
-        pass
-
-    ### if the cityMatches column contains a 1 the record will be skipped
-    elif df.iloc[j,25] == 1:
-        pass
-
-    ### we begin by removing curly brackets from non-empty records
-    ### The findall function searches the list for all instances
-    ### that matches the regex variable and saves the list to the
-    ### match variable. The length of this list is determined and
-    ### provide to the nested loop below
-    else:
-        a=df.iloc[j,19][2:-2]
-        match = re.findall(regex, a)
-        c=len(match)
-
-        ### for any length of c greater than 0, this for loop will
-        ### evaluate each city instance by using the regex1 variable
-        ### to remove characters that are not required. Once a match
-        ### is found, the match is processed and tested to see if it
-        ### matches with the PatentsView city AND if there were no
-        ### previous matches within this loop. The result is saved
-        ### in the sub_finalCity list
-        for i in range(c):
-            match1 = re.sub(regex1,"",match[i])
-            match1 = match1.replace("'","")
-            match1 = re.sub('\s+',' ',match1)
-            match2=match1.split(",")
-
-            for k in range(len(match2)):
-                match2[k]=match2[k].lstrip().rstrip()
-
-                if match2[k] == df.iloc[j,4] and len(sub_finalCity) == 0:
-                    sub_finalCity.append(match2[k])
-
-    ### after the nested for loop is finished, the sub_finalCity result
-    ### is appended to the finalCity list and sub_finalCity is reset to
-    ### empty for the next record
-    finalCity.append(sub_finalCity)
-    sub_finalCity = []
-
-### end timer and print total time
-t1=time.time()
-total=t1-t0
-print("Total time is %4f" % (total/60), "mins\n")
-
-
-### start timer
+### The PatentsView city and state are compared to the address and
+### agent city and state, and to the addresses in the data field,
+### which were decoded once per company into a table with one row
+### per address (see locationMatching.py). The matching city and
+### state are saved to new columns called cityMatch and stateMatch.
+### Some of the records do not have a state in any of the state
+### fields, so the state of the jurisdiction code is used instead.
+### Since this is a STATE match and not STATELESS, it is appropriate
+### to truncate the jurisdiction code to represent the records state
 t0=time.time()
 
-### creates 2 empty lists to be filled with the extracted states
-sub_finalState = []
-finalState = []
-
-regex="'Description': '[A-Za-z0-9].+?'"
-regex1="'[A-Za-z].+': "
-
-### this for loop is initiated to review each record individually and extract the
-### state names under the data column
-for j in range(len(df)):
-
-    ### if the record is empty or nan the record will be skipped
-    if pd.isna(df.iloc[j,19]) is True:
-        pass
-
-    ### if the stateMatches column contains a 1 the record will be skipped
-    elif df.iloc[j,25] == 1:
-        pass
+addresses=pd.read_csv("../csvResults/ocDataAddresses.csv",dtype={'city':str,'state':str,'zip':str})
+locations=locationMatching.resolveLocations(df,addresses)
 
-    ### we begin by removing curly brackets from non-empty records
-    ### The findall function searches the list for all instances
-    ### that matches the regex variable and saves the list to the
-    ### match variable. The length of this list is determined and
-    ### provide to the nested loop below
-    else:
-        a=df.iloc[j,19][2:-2]
-        match = re.findall(regex, a)
-        c=len(match)
-
-        ### for any length of c greater than 0, this for loop will
-        ### evaluate each state instance by using the regex1 variable
-        ### to remove characters that are not required. Once a match
-        ### is found, the match is processed and tested to see if it
-        ### matches with the PatentsView state AND if there were no
-        ### previous matches within this loop. The result is saved
-        ### in the sub_finalState list
-        for i in range(c):
-            match1 = re.sub(regex1,"",match[i])
-            match1 = match1.replace("'","")
-            match1 = re.sub('\s+',' ',match1)
-            match2=match1.split(",")
-
-            for k in range(len(match2)):
-                match2[k]=match2[k].lstrip().rstrip()
-
-                if match2[k] == df.iloc[j,5] and len(sub_finalState) == 0:
-                    sub_finalState.append(match2[k])
-
-    ### after the nested for loop is finished, the sub_finalState result
-    ### is appended to the finalState list and sub_finalState is reset to
-    ### empty for the next record
-    finalState.append(sub_finalState)
-    sub_finalState = []
-
-### end timer and print total time
-t1=time.time()
-total=t1-t0
-print("Total time is %4f" % (total/60), "mins\n")
-
-
-### the list of matching cities and states are appended to the existing
-### data set. The cityMatches and stateMatches were dropped from the
-### data since they are no longer used
-t0=time.time()
-
-df['data_city'] = finalCity
-df['data_state'] = finalState
 df1=df.copy()
-df1.drop(labels=['cityMatches','stateMatches'],axis=1,inplace=True)
-
-### end timer and print total time
-t1=time.time()
-total=t1-t0
-print("Total time is %4f" % (total/60), "mins\n")
-print("The number of unique assignee IDs are:",df.assignee_id.nunique())
-print("The number of unique patents are:",df.patent.nunique(),"\n")
-
-print(df1.info(),flush=True)
-print(df1.head(),flush=True)
-
-
-### with the newly extracted city and states from the data field, we
-### want to update to new columns called cityMatch and stateMatch. These
-### fields will only update if the address and agent city or state does
-### not match the PatentsView data.
-t0=time.time()
-
-sub_newCity=[]
-newCity=[]
-sub_newState=[]
-newState=[]
-
-for t in range(len(df1)):
-    state=''.join(map(str,df1.data_state[t]))
-    city=''.join(map(str,df1.data_city[t]))
-
-    if df1.city[t] == df1.address_city[t]:
-        sub_newCity.append(df1.address_city[t])
-        pass
-
-    elif df1.city[t] == df1.agent_city[t]:
-        sub_newCity.append(df1.agent_city[t])
-        pass
-
-    elif df1.city[t] == city:
-        sub_newCity.append(city)
-        pass
-
-    else:
-        sub_newCity.append("")
-
-    newCity.append(sub_newCity)
-    sub_newCity=[]
-
-    if df1.state[t] == df1.address_state[t]:
-        sub_newState.append(df1.address_state[t])
-        pass
-
-    elif df1.state[t] == df1.agent_state[t]:
-        sub_newState.append(df1.agent_state[t])
-        pass
-
-    elif df1.state[t] == state:
-        sub_newState.append(state)
-        pass
-
-    else:
-        sub_newState.append("")
-
-    newState.append(sub_newState)
-    sub_newState=[]
-
-### append the existing data with the new city and state matches
-df1['cityMatch']=newCity
-df1['stateMatch']=newState
+df1['cityMatch']=locations['cityMatch']
+df1['stateMatch']=locations['stateMatch']
 
 ### end timer and print total time
 t1=time.time()
 total=t1-t0
 print("Total time is %4f" % (total/60), "mins\n")
+print("The number of records with a city match are:",locations['cityMatches'].sum())
+print("The number of records with a state match are:",locations['stateMatches'].sum())
+print("The number of addresses are:",len(addresses))
+print("The number of records with a data city are:",(locations['data_city']!='').sum())
+print("The number of records with a data state are:",(locations['data_state']!='').sum(),"\n")
 print("The number of unique assignee IDs are:",df1.assignee_id.nunique())
 print("The number of unique patents are:",df1.patent.nunique(),"\n")
 
@@ -892,27 +471,13 @@ print(df1.info(),flush=True)
 print(df1.head(),flush=True)
 
 
-### copy the data to a new variable and drop labels
-t0=time.time()
-
-df2=df1.copy()
-df2.drop(labels=['data','data_city','data_state'],axis=1,inplace=True)
-
-### end timer and print total time
-t1=time.time()
-total=t1-t0
-print("Total time is %4f" % (total/60), "mins\n")
-print("The number of unique assignee IDs are:",df2.assignee_id.nunique())
-print("The number of unique patents are:",df2.patent.nunique(),"\n")
-
-print(df2.info(),flush=True)
-print(df2.head(),flush=True)
-
-
 ### subset the data to include only the necessary columns required
 t0=time.time()
 
-df3=df2.iloc[:,[0,1,2,3,4,5,6,7,8,9,10,11,12,13,14,17,18,24,25,15,16,19,20,21,22,23]].copy()
+df3=df1[['ID','assignee_id','patent','organization','city','state','latitude','longitude','dateFiledMin',
+         'dateGrantedMin','patentCount','assignee','assignor','record_date','name','jurisdiction_code',
+         'incorporation_date','cityMatch','stateMatch','address_city','address_state','agent_city','agent_state',
+         'match_num','address_zipcode','agent_zipcode']].copy()
 
 ### end timer and print total time
 t1=time.time()
@@ -942,14 +507,30 @@ print(input_directory,"\n")
 ### import the output file from OC API matching and select columns
 latLong=pd.read_csv(input_directory,sep="\t",usecols=['city','state','latitude','longitude'])
 
-latLong.city=latLong.city.str.title()
-latLong.state=latLong.state.str.title()
-latLong.drop_duplicates(keep='first',inplace=True)
+latLong.city=nameNormalizer.normalizeNames(latLong.city,('title',))
+latLong.state=nameNormalizer.normalizeNames(latLong.state,('title',))
+
+### the file repeats some of the cities and states, so the coordinate lookup keeps
+### the first row of each city and state, which is given an integer key. The rows
+### with a missing or invalid city, state, or coordinate are dropped (see
+### locationMatching.coordinateTable())
+latLong,repeatedKeys,conflictingKeys=locationMatching.coordinateTable(latLong)
+
+### the cities of each state are indexed once for the fuzzy city fallback
+cityIndex=locationMatching.cityIndex(latLong) if fuzzyCities else None
+
+### the coordinates of each zip code are read from the zip index
+zipIndex=locationMatching.zipIndex(zip_coordinates,zip_index) if zip_coordinates else None
 
 ### end timer and print total time
 t1=time.time()
 total=t1-t0
 print("Total time is %.3f" % (total/60), "mins\n")
+print("The number of cities and states with coordinates are:",len(latLong))
+print("The number of repeated cities and states dropped are:",repeatedKeys)
+print("The number of repeated cities and states with other coordinates are:",conflictingKeys,"\n")
+if zipIndex is not None:
+    print("The number of zip codes with coordinates are:",(~np.isnan(zipIndex[0])).sum(),"\n")
 
 print(latLong.info(null_counts=True),flush=True)
 print(latLong.head(),flush=True)
@@ -964,11 +545,11 @@ input_file = "mergedOCResultsAndPVInputClnNamesClnStCy.csv"
 input_directory=os.path.join(res_folder,input_file)
 print(input_directory,"\n")
 
-### removed brackets that were introduced when creating list of
-### states and cities
+### the cities and states without a match are read back as empty strings, and
+### any duplicated records are removed with the first record being kept
 cleanCityStates=pd.read_csv(input_directory)
-cleanCityStates.stateMatch=cleanCityStates.stateMatch.str.replace("\[|'|\]","")
-cleanCityStates.cityMatch=cleanCityStates.cityMatch.str.replace("\[|'|\]","")
+cleanCityStates[['cityMatch','stateMatch']]=cleanCityStates[['cityMatch','stateMatch']].fillna('')
+cleanCityStates.drop_duplicates(keep='first',inplace=True)
 
 ### end timer and print total time
 t1=time.time()
@@ -1024,181 +605,49 @@ print(cleanCityStates.info(null_counts=True),flush=True)
 print(cleanCityStates.head(),flush=True)
 
 
-### some of the records do not have a state in any of the state fields. The
-### jurisdiction code was utilized to resolve this problem. Since this is
-### a STATE match and not STATELESS, it is appropriate to truncate the
-### jurisdiction code and utilize it to represent the records state. The
-### for loop below accomplishes this task
+### coordinates are added to the cityMatch-stateMatch, address_city-address_state,
+### and agent_city-agent_state pairs with one lookup of their integer keys in the
+### coordinate table. Each record keeps a single row, and the pairs that are not in
+### the table are left blank unless the fuzzy city fallback finds a similar city of
+### the same state
 t0=time.time()
 
-for s in range(len(cleanCityStates)):
-    if cleanCityStates.stateMatch[s] == "":
-        cleanCityStates.stateMatch[s]=cleanCityStates.jurisdiction_code[s][3:]
+longLat=locationMatching.attachCoordinates(cleanCityStates,latLong,index=cityIndex,cutoff=fuzzyCityCutoff,zips=zipIndex)
+longLat=longLat.sort_values(by=['ID']).reset_index(drop=True)
 
-### end timer and print total time
-t1=time.time()
-total=t1-t0
-print("Total time is %.3f" % (total/60), "mins\n")
-print("The number of unique assignee IDs are:",cleanCityStates.assignee_id.nunique())
-print("The number of unique patents are:",cleanCityStates.patent.nunique(),"\n")
+### the zip codes are only used for the coordinates
+zipCodes={suffix:locationMatching.zipCodes(longLat[col]) for suffix,col in locationMatching.ZIP_COLUMNS.items()}
+longLat.drop(labels=list(locationMatching.ZIP_COLUMNS.values()),axis=1,inplace=True)
 
-print(cleanCityStates.info(null_counts=True),flush=True)
-print(cleanCityStates.head(),flush=True)
-
-
-### coordinates were added to the cityMatch-stateMatch pair using an outer merge
-t0=time.time()
-
-matchLatLong=cleanCityStates.merge(latLong,left_on=['cityMatch','stateMatch'],right_on=['city','state'],
-                                  how='outer',indicator=True)
-
-### end timer and print total time
-t1=time.time()
-total=t1-t0
-print("Total time is %.3f" % (total/60), "mins\n")
-print("The number of unique assignee IDs are:",matchLatLong.assignee_id.nunique())
-print("The number of unique patents are:",matchLatLong.patent.nunique(),"\n")
-
-print(matchLatLong.info(),flush=True)
-print(matchLatLong.head(),flush=True)
-
-
-### this section cleans up the merge results and selects the necessary columns for
-### subsequent merges. Any duplicates were removed with the first record being
-### kept
-t0=time.time()
-
-matchLatLongBoth=matchLatLong.loc[matchLatLong['_merge']=='both']
-matchLatLongBoth.rename(columns={'city_x':'city','state_x':'state','latitude_x':'latitude','longitude_x':'longitude',
-                                 'latitude_y':'latitude_match','longitude_y':'longitude_match'},inplace=True)
-matchLatLongBoth.drop(labels=['_merge','city_y','state_y'],axis=1,inplace=True)
-
-matchLatLongLeft=matchLatLong.loc[matchLatLong['_merge']=='left_only']
-matchLatLongLeft.rename(columns={'city_x':'city','state_x':'state','latitude_x':'latitude','longitude_x':'longitude',
-                                'latitude_y':'latitude_match','longitude_y':'longitude_match'},inplace=True)
-matchLatLongLeft.drop(labels=['_merge','city_y','state_y'],axis=1,inplace=True)
-
-matchLatLongCon=pd.concat([matchLatLongBoth,matchLatLongLeft],axis=0)
-matchLatLongCon1=matchLatLongCon.iloc[:,[0,1,2,3,4,5,6,7,8,9,10,11,12,13,14,15,16,17,18,26,27,
-                                         19,20,21,22,23,24,25]].copy()
-
-matchLatLongCon1.drop_duplicates(keep='first',inplace=True)
-matchLatLongCon2=matchLatLongCon1.sort_values(by=['ID']).reset_index(drop=True).copy()
-matchLatLongCon2.ID=matchLatLongCon2.ID.astype(int)
-
-### end timer and print total time
-t1=time.time()
-total=t1-t0
-print("Total time is %.3f" % (total/60), "mins\n")
-print("The number of unique assignee IDs are:",matchLatLongCon2.assignee_id.nunique())
-print("The number of unique patents are:",matchLatLongCon2.patent.nunique(),"\n")
-
-print(matchLatLongCon2.info(),flush=True)
-print(matchLatLongCon2.head(),flush=True)
-
-
-### coordinates were added to the address_city-address_state pair using an outer merge
-t0=time.time()
-
-addLatLong=matchLatLongCon2.merge(latLong,left_on=['address_city','address_state'],right_on=['city','state'],
-                                  how='outer',indicator=True)
+### the integer columns other than the ID are written as floats, as they were by the
+### outer merges, so the records keep the fingerprints of earlier runs in the
+### scoring store (see scoringStore.py)
+intColumns=[col for col in longLat.select_dtypes(include='integer').columns if col!='ID']
+longLat[intColumns]=longLat[intColumns].astype(float)
+longLat.ID=longLat.ID.astype(int)
 
 ### end timer and print total time
 t1=time.time()
 total=t1-t0
 print("Total time is %.3f" % (total/60), "mins\n")
-print("The number of unique assignee IDs are:",addLatLong.assignee_id.nunique())
-print("The number of unique patents are:",addLatLong.patent.nunique(),"\n")
-
-print(addLatLong.info(),flush=True)
-print(addLatLong.head(),flush=True)
-
-
-### this section cleans up the merge results and selects the necessary columns for
-### subsequent merges. Any duplicates were removed with the first record being
-### kept
-t0=time.time()
-
-addLatLongBoth=addLatLong.loc[addLatLong['_merge']=='both']
-addLatLongBoth.rename(columns={'city_x':'city','state_x':'state','latitude_x':'latitude','longitude_x':'longitude',
-                               'latitude_y':'latitude_add','longitude_y':'longitude_add'},inplace=True)
-addLatLongBoth.drop(labels=['_merge','city_y','state_y'],axis=1,inplace=True)
-
-addLatLongLeft=addLatLong.loc[addLatLong['_merge']=='left_only']
-addLatLongLeft.rename(columns={'city_x':'city','state_x':'state','latitude_x':'latitude','longitude_x':'longitude',
-                               'latitude_y':'latitude_add','longitude_y':'longitude_add'},inplace=True)
-addLatLongLeft.drop(labels=['_merge','city_y','state_y'],axis=1,inplace=True)
-
-addLatLongCon=pd.concat([addLatLongBoth,addLatLongLeft],axis=0)
-addLatLongCon1=addLatLongCon.iloc[:,[0,1,2,3,4,5,6,7,8,9,10,11,12,13,14,15,16,17,18,19,20,
-                                     21,22,23,24,28,29,25,26,27]].copy()
-
-addLatLongCon1.drop_duplicates(keep='first',inplace=True)
-addLatLongCon2=addLatLongCon1.sort_values(by=['ID']).reset_index(drop=True).copy()
-addLatLongCon2.ID=addLatLongCon2.ID.astype(int)
-
-### end timer and print total time
-t1=time.time()
-total=t1-t0
-print("Total time is %.3f" % (total/60), "mins\n")
-print("The number of unique assignee IDs are:",addLatLongCon2.assignee_id.nunique())
-print("The number of unique patents are:",addLatLongCon2.patent.nunique(),"\n")
-
-print(addLatLongCon2.info(),flush=True)
-print(addLatLongCon2.head(),flush=True)
-
-
-### coordinates were added to the agent_city-agent_state pair using an outer merge
-t0=time.time()
-
-agtLatLong=addLatLongCon2.merge(latLong,left_on=['agent_city','agent_state'],right_on=['city','state'],
-                                how='outer',indicator=True)
-
-### end timer and print total time
-t1=time.time()
-total=t1-t0
-print("Total time is %.3f" % (total/60), "mins\n")
-print("The number of unique assignee IDs are:",agtLatLong.assignee_id.nunique())
-print("The number of unique patents are:",agtLatLong.patent.nunique(),"\n")
-
-print(agtLatLong.info(),flush=True)
-print(agtLatLong.head(),flush=True)
-
-
-### this section cleans up the merge results and selects the necessary columns for
-### subsequent merges. Any duplicates were removed with the first record being
-### kept
-t0=time.time()
-
-agtLatLongBoth=agtLatLong.loc[agtLatLong['_merge']=='both']
-agtLatLongBoth.rename(columns={'city_x':'city','state_x':'state','latitude_x':'latitude','longitude_x':'longitude',
-                               'latitude_y':'latitude_agt','longitude_y':'longitude_agt'},inplace=True)
-agtLatLongBoth.drop(labels=['_merge','city_y','state_y'],axis=1,inplace=True)
-
-agtLatLongLeft=agtLatLong.loc[agtLatLong['_merge']=='left_only']
-agtLatLongLeft.rename(columns={'city_x':'city','state_x':'state','latitude_x':'latitude','longitude_x':'longitude',
-                               'latitude_y':'latitude_agt','longitude_y':'longitude_agt'},inplace=True)
-agtLatLongLeft.drop(labels=['_merge','city_y','state_y'],axis=1,inplace=True)
-
-agtLatLongCon=pd.concat([agtLatLongBoth,agtLatLongLeft],axis=0)
-agtLatLongCon1=agtLatLongCon.iloc[:,[0,1,2,3,4,5,6,7,8,9,10,11,12,13,14,15,16,17,18,19,20,21,22,23,24,
-                                     25,26,27,28,30,31,29]].copy()
-
-agtLatLongCon1.drop_duplicates(keep='first',inplace=True)
-agtLatLongCon2=agtLatLongCon1.sort_values(by=['ID']).reset_index(drop=True).copy()
-agtLatLongCon2.ID=agtLatLongCon2.ID.astype(int)
-
-### end timer and print total time
-t1=time.time()
-total=t1-t0
-print("Total time is %.3f" % (total/60), "mins\n")
-print("The number of unique assignee IDs are:",agtLatLongCon2.assignee_id.nunique())
-print("The number of unique patents are:",agtLatLongCon2.patent.nunique(),"\n")
-
-print(agtLatLongCon2.info(),flush=True)
-print(agtLatLongCon2.head(),flush=True)
-
-agtLatLongCon2.to_csv("../csvResults/mergedOCResultsAndPVInputClnNamesClnStCyLongLat.csv",index=False)
+print("The number of records with match coordinates are:",longLat['latitude_match'].notnull().sum())
+print("The number of records with address coordinates are:",longLat['latitude_add'].notnull().sum())
+print("The number of records with agent coordinates are:",longLat['latitude_agt'].notnull().sum())
+if zipIndex is not None:
+    for suffix,codes in zipCodes.items():
+        print("The number of %s coordinates from a zip code are:" % suffix,
+              ((codes>=0)&~np.isnan(zipIndex[0][np.maximum(codes,0)])).sum())
+if fuzzyCities:
+    for suffix in ['match','add','agt']:
+        print("The number of %s coordinates from a similar city are:" % suffix,
+              longLat['geocodeFuzzy_'+suffix].sum())
+print("The number of unique assignee IDs are:",longLat.assignee_id.nunique())
+print("The number of unique patents are:",longLat.patent.nunique(),"\n")
+
+print(longLat.info(),flush=True)
+print(longLat.head(),flush=True)
+
+longLat.to_csv("../csvResults/mergedOCResultsAndPVInputClnNamesClnStCyLongLat.csv",index=False)
 os.chmod("../csvResults/mergedOCResultsAndPVInputClnNamesClnStCyLongLat.csv",0o777)
 
 
@@ -1214,33 +663,7 @@ print(input_directory,"\n")
 
 ### import the output file from OC API matching and select columns
 noOrgScores=pd.read_csv(input_directory)
-noOrgScores.name=noOrgScores.name.str.title()
-
-### end timer and print total time
-t1=time.time()
-total=t1-t0
-print("Total time is %.3f" % (total/60), "mins\n")
-print("The number of unique assignee IDs are:",noOrgScores.assignee_id.nunique())
-print("The number of unique patents are:",noOrgScores.patent.nunique(),"\n")
-
-print(noOrgScores.info(null_counts=True),flush=True)
-print(noOrgScores.head(),flush=True)
-
-
-### the clean alternative and previous names are split by comma and
-### placed into a new column that will be used to perform the fuzzy
-### matching
-t0=time.time()
-
-noOrgScores['alternative_names_clean']=noOrgScores['alternative_names_clean'].str.replace("'","")
-noOrgScores['previous_names_clean']=noOrgScores['previous_names_clean'].str.replace("'","")
-
-e=[]
-f=[]
-
-for y in range(len(noOrgScores)):
-    e.append(noOrgScores['alternative_names_clean'][y][1:-1].split(","))
-    f.append(noOrgScores['previous_names_clean'][y][1:-1].split(","))
+noOrgScores.name=nameNormalizer.normalizeNames(noOrgScores.name,('title',))
 
 ### end timer and print total time
 t1=time.time()
@@ -1253,206 +676,67 @@ print(noOrgScores.info(null_counts=True),flush=True)
 print(noOrgScores.head(),flush=True)
 
 
-### creates a new data set with the new columns
-t0=time.time()
-
-altPreList=[list(z) for z in zip(e, f)]
-altPreList=pd.DataFrame(altPreList,columns=['new_alt','new_pre'])
-
-### end timer and print total time
-t1=time.time()
-total=t1-t0
-print("Total time is %.3f" % (total/60), "mins\n")
-print("The number of unique assignee IDs are:",noOrgScores.assignee_id.nunique())
-print("The number of unique patents are:",noOrgScores.patent.nunique(),"\n")
-
-print(altPreList.info(null_counts=True),flush=True)
-print(altPreList.head(),flush=True)
-
-
-### appends the existing data set with the new columns
+### import the long table of alternative and previous names of each OC company.
+### The empty names are kept as empty strings
 t0=time.time()
 
-noOrgScores['newAltClean'] = altPreList['new_alt']
-noOrgScores['newPreClean'] = altPreList['new_pre']
-
-### end timer and print total time
-t1=time.time()
-total=t1-t0
-print("Total time is %.3f" % (total/60), "mins\n")
-print("The number of unique assignee IDs are:",noOrgScores.assignee_id.nunique())
-print("The number of unique patents are:",noOrgScores.patent.nunique(),"\n")
-
-print(noOrgScores.info(),flush=True)
-print(noOrgScores.head(),flush=True)
+input_file = "ocNameLists.csv"
+input_directory=os.path.join(res_folder,input_file)
+print(input_directory,"\n")
 
+nameLists=pd.read_csv(input_directory,keep_default_na=False,dtype={'kind':str,'raw_name':str,'clean_name':str})
 
-### removed labels that were no longer needed and rename columns
-t0=time.time()
+### the candidate rows give the OC company of each ID and match_num
+input_file = "ocCandidates.csv"
+input_directory=os.path.join(res_folder,input_file)
+print(input_directory,"\n")
 
-noOrgScores.drop(labels=['alternative_names_clean','previous_names_clean'],axis=1,inplace=True)
-noOrgScores.rename(columns={'newAltClean':'alternative_names_clean', 'newPreClean':'previous_names_clean'},
-                   inplace=True)
+ocCandidates=pd.read_csv(input_directory).drop_duplicates(subset=['ID','match_num'])
 
 ### end timer and print total time
 t1=time.time()
 total=t1-t0
 print("Total time is %.3f" % (total/60), "mins\n")
-print("The number of unique assignee IDs are:",noOrgScores.assignee_id.nunique())
-print("The number of unique patents are:",noOrgScores.patent.nunique(),"\n")
+print("The number of alternative names are:",(nameLists['kind']=='alternative').sum())
+print("The number of previous names are:",(nameLists['kind']=='previous').sum(),"\n")
 
-print(noOrgScores.info(),flush=True)
-print(noOrgScores.head(),flush=True)
+print(nameLists.info(),flush=True)
+print(nameLists.head(),flush=True)
 
 
 ### score the OC API organization names against the PatentsView names
 t0=time.time()
 
 ### removes any whitespace from left and right
-noOrgScores['organization']=noOrgScores['organization'].str.lstrip()
-noOrgScores['organization']=noOrgScores['organization'].str.rstrip()
-
-a=len(noOrgScores)
-mat1=[]
-mat2=[]
-
-for i in range(a):
-
-    ### try/except is used to bypass cells with an NaN. Removing this will force the user
-    ### to deal with exception errors
-    try:
-
-        ### calculate the fuzzy score for further evaluation
-        q=fuzz.ratio(noOrgScores['organization'][i], noOrgScores['name'][i])
-
-        ### most simplest and most representative in the data; if the score is 100, it is
-        ### a perfect match, otherwise, the remaining code will resolve score differences
-        if q == 100:
-            mat1.append(q)
-            mat2.append(noOrgScores['name'][i])
-
-        elif ( q != 100 ):
-
-            ### calculate the size of the data in each row for the alternative_names_clean
-            ### column and previous_names_clean column
-            r=len(noOrgScores['alternative_names_clean'][i])
-            d=len(noOrgScores['previous_names_clean'][i])
-
-            ### the remaining parts of the code uses if statements to step through the many
-            ### conditions that may be present in the data. As each conditions is satisfied,
-            ### the mat1 and mat2 lists are appended with the data; take note that q is the
-            ### original score and s, v, e, and f are separate scores that are compared
-            ### against q
-            if r == 0 and d == 0:
-                mat1.append(q)
-                mat2.append(noOrgScores['name'][i])
-
-            ### calculate the score for the alternative_names_clean and previous_names_clean
-            ### columns. Once calculated, they are compared against each other and q to
-            ### determine the score that is highest. The 'best' score is appened to mat1 and
-            ### the name of the organization is appended to mat2. The same scorer is utilized
-            ### as the above but the process.extractOne function retrieves the organization
-            ### match with the highest score and saves it as a tuple
-            elif r == 1 and d == 1:
-                s=process.extractOne(noOrgScores['organization'][i],
-                                     noOrgScores['alternative_names_clean'][i],scorer=fuzz.ratio)
-                e=process.extractOne(noOrgScores['organization'][i],
-                                     noOrgScores['previous_names_clean'][i],scorer=fuzz.ratio)
-
-                if s[1] > e[1] and s[1] > q:
-                    mat1.append(s[1])
-                    mat2.append(s[0])
-
-                elif e[1] > s[1] and e[1] > q:
-                    mat1.append(e[1])
-                    mat2.append(e[0])
-
-                else:
-                    mat1.append(q)
-                    mat2.append(noOrgScores['name'][i])
-
-            ### this section is the same as above, except the code is looking at the
-            ### alternative_names_clean column only
-            elif r == 1 or d == 1:
-                s=process.extractOne(noOrgScores['organization'][i],
-                                     noOrgScores['alternative_names_clean'][i],scorer=fuzz.ratio)
-                e=process.extractOne(noOrgScores['organization'][i],
-                                     noOrgScores['previous_names_clean'][i],scorer=fuzz.ratio)
-
-                if s[1] > q and s[1] > e[1]:
-                    mat1.append(s[1])
-                    mat2.append(s[0])
-
-                elif e[1] > q and e[1] > s[1]:
-                    mat1.append(e[1])
-                    mat2.append(e[0])
-
-                else:
-                    mat1.append(q)
-                    mat2.append(noOrgScores['name'][i])
-
-            ### the following two sections resolve r and d lengths greater than 1 (i.e.,
-            ### records that have more than 1 company names in the alternative_names_clean
-            ### and previous_names_clean columns)
-            elif r > 1:
-                v=process.extractOne(noOrgScores['organization'][i],
-                                     noOrgScores['alternative_names_clean'][i],scorer=fuzz.ratio)
-
-                for p in range(r):
-
-                    if v[1][p] > q:
-                        mat1.append(v[1])
-                        mat2.append(v[0])
-
-                    elif v[1][p] == q:
-                        mat1.append(q)
-                        mat2.append(noOrgScores['name'][i])
-
-                    else:
-                        mat1.append(q)
-                        mat2.append(noOrgScores['name'][i])
-
-            elif d > 1:
-                f=process.extractOne(noOrgScores['organization'][i], noOrgScores['previous_names_clean'][i],scorer=fuzz.ratio)
-
-                for p in range(d):
-
-                    if f[1][p] > q:
-                        mat1.append(f[1])
-                        mat2.append(f[0])
-
-                    elif f[1][p] == q:
-                        mat1.append(q)
-                        mat2.append(noOrgScores['name'][i])
-
-                    else:
-                        mat1.append(q)
-                        mat2.append(noOrgScores['name'][i])
-
-    except:
-
-        ### error handling that places an NaN for every cells that does not have a value
-        ### in the mat1 and/or mat2 lists
-        mat1.append(np.nan)
-        mat2.append(np.nan)
-
-### end timer and print total time
-t1=time.time()
-total=t1-t0
-print("Total time is %.3f" % (total/60), "mins\n")
+noOrgScores['organization']=nameNormalizer.normalizeNames(noOrgScores['organization'],('strip',))
 
+### the token table is updated with the organization names and OC names of this run
+### before the token weights are read
+weights=None
+if token_weights:
+    tokenWeights.useTable(token_table)
+    tokenWeights.updateTable(pd.concat([noOrgScores['organization'],noOrgScores['name'],nameLists['clean_name']]))
+    weights=tokenWeights.weightTable()
 
-### create a new data frame using mat1 and mat2 that will be used to append
-### to the existing data set
-t0=time.time()
+    print("The number of names in the token table are:",tokenWeights.tableStats['names'])
+    print("The number of names added to the token table are:",tokenWeights.tableStats['added'],"\n")
 
-finalList=[list(w) for w in zip(mat1, mat2)]
-finalListDf=pd.DataFrame(finalList,columns=['scores','names'])
+### the organization names are scored against the OC name, alternative names, and
+### previous names of all records at once (see nameMatching.py). The best score of
+### each record is saved to the scores column and the name with that score to the
+### names column
+companyKeys=noOrgScores[['ID','match_num']].merge(ocCandidates[['ID','match_num']+nameMatching.NAME_LIST_KEYS],
+                                                  on=['ID','match_num'],how='left')
+finalListDf=nameMatching.batchNameScores(noOrgScores['organization'],noOrgScores['name'],
+                                         companyKeys[nameMatching.NAME_LIST_KEYS],nameLists,weights=weights)
 
 ### end timer and print total time
 t1=time.time()
 total=t1-t0
 print("Total time is %.3f" % (total/60), "mins\n")
+print("The number of name pairs scored are:",nameMatching.scoringStats['pairs'])
+print("The number of unique name pairs scored are:",nameMatching.scoringStats['unique'])
+print("The hit rate of the name pair cache is: %.3f" % nameMatching.hitRate(),"\n")
 
 print(finalListDf.info(),flush=True)
 print(finalListDf.head(),flush=True)
@@ -1478,8 +762,11 @@ print(noOrgScores.head(),flush=True)
 ### select features and sort by ID/nameScores
 t0=time.time()
 
-noOrgScores1=noOrgScores.iloc[:,[0,1,2,3,4,5,6,7,8,9,11,12,13,32,33,15,16,17,18,19,20,
-                                 21,22,23,24,25,26,27,28,29]].copy()
+### the patentCount and name are dropped and the nameScores and matchNames are
+### placed after the record_date
+cols=list(noOrgScores.columns.drop(['patentCount','name','nameScores','matchNames']))
+position=cols.index('record_date')+1
+noOrgScores1=noOrgScores[cols[:position]+['nameScores','matchNames']+cols[position:]].copy()
 noOrgScores1.sort_values(by=['ID','nameScores'],ascending=[True,False],inplace=True)
 
 ### end timer and print total time
@@ -1521,6 +808,24 @@ print(noDiff.info(null_counts=True),flush=True)
 print(noDiff.head(),flush=True)
 
 
+### the name scores and city-state matches are known at this point, so the candidates
+### of each ID that cannot beat its pruneTopK best candidates are dropped before the
+### date differences and distances are calculated
+if candidatePruning:
+    t0=time.time()
+
+    keep=scoringEngine.pruneCandidates(noDiff,k=pruneTopK)
+    noDiff=noDiff.loc[keep].reset_index(drop=True)
+    noDiff[scoringEngine.PRUNE_COLUMN]=pruneTopK
+
+    ### end timer and print total time
+    t1=time.time()
+    total=t1-t0
+    print("Total time is %.3f" % (total/60), "mins\n")
+    print("The number of pruned candidates are:",(~keep).sum())
+    print("The number of remaining candidates are:",len(noDiff),"\n")
+
+
 ### in most cases, the date difference will be calculated utilizing the
 ### incorporation date and dateFiledMin date. However, in some cases,
 ### the inc date is 'younger' than the dateFiledMin date, suggesting
@@ -1559,8 +864,9 @@ for i in range(len(noDiff)):
     else:
         noDiff['dateDiff'][i]=round((noDiff['dateFiledMin'][i]-noDiff['incorporation_date'][i])/timedelta(days=365),3)
 
-### sort the data and drop labels
-noDiff1=noDiff.iloc[:,0:31].sort_values(by=['ID']).copy()
+### sort the data, add the OC company_number, and drop labels
+noDiff1=noDiff.drop(labels=['date','org'],axis=1).sort_values(by=['ID']).copy()
+noDiff1=noDiff1.merge(ocCompanyKeys,on=['ID','match_num'],how='left')
 noDiff1.drop(labels=['match_num'],axis=1,inplace=True)
 
 ### end timer and print total time
@@ -1576,63 +882,57 @@ print(noDiff1.head(),flush=True)
 
 ### the code block below calculates the geodesic distance between the
 ### city-state pairs between PatentsView and the OC API results using
-### the latitude and longitude coordinates added above
-t0=time.time()
-
-cityAddrCor=[]
-cityAgtCor=[]
-cityDataCor=[]
-
-### each for loop below calculates the distance between the city found
-### in PatentsView and the cities from the address_city, agent_city,and
-### data_city. The try/except is included to deal with exception errors
-for p in range(len(noDiff1)):
-
-    try:
-        cityCor = (noDiff1.iloc[p,6], noDiff1.iloc[p,7])
-        cityMatchCor = (noDiff1.iloc[p,19], noDiff1.iloc[p,20])
-
-        cityDataCor.append(geodesic(cityCor, cityMatchCor).miles)
-
-    except:
-        cityDataCor.append(np.nan)
-
-for p in range(len(noDiff1)):
-
-    try:
-        cityCor = (noDiff1.iloc[p,6], noDiff1.iloc[p,7])
-        cityAddressCor = (noDiff1.iloc[p,23], noDiff1.iloc[p,24])
-
-        cityAddrCor.append(geodesic(cityCor, cityAddressCor).miles)
-
-    except:
-        cityAddrCor.append(np.nan)
-
-for p in range(len(noDiff1)):
-
-    try:
-        cityCor = (noDiff1.iloc[p,6], noDiff1.iloc[p,7])
-        cityAgentCor = (noDiff1.iloc[p,27], noDiff1.iloc[p,28])
-
-        cityAgtCor.append(geodesic(cityCor, cityAgentCor).miles)
-
-    except:
-        cityAgtCor.append(np.nan)
+### the latitude and longitude coordinates added above. With lazyDistances,
+### a distance is only calculated for the records whose score can still
+### depend on it under one of the distanceProfiles (see
+### scoringEngine.distanceDemand()), and the remaining
+### records are left blank
+t0=time.time()
+
+cityAddrCor=np.full(len(noDiff1),np.nan)
+cityAgtCor=np.full(len(noDiff1),np.nan)
+cityDataCor=np.full(len(noDiff1),np.nan)
+
+### the distances between the city found in PatentsView and the cities from
+### the data field, address_city, and agent_city are calculated for all of the
+### records that need them at once, with each unique pair of coordinates
+### calculated once (see locationMatching.py). Records with a missing
+### coordinate get a blank distance. The distances are rounded as they
+### are calculated, so the rounded values are used to decide which records need
+### the next distance
+calculated=[]
+for distances,latitude,longitude in [(cityDataCor,'latitude_match','longitude_match'),
+                                     (cityAddrCor,'latitude_add','longitude_add'),
+                                     (cityAgtCor,'latitude_agt','longitude_agt')]:
+
+    if lazyDistances:
+        need=scoringEngine.distanceDemand(noDiff1,calculated,
+                                          rules=[scoringEngine.PROFILES[name] for name in distanceProfiles],
+                                          shortCircuit=lazyDistanceBands)
+    else:
+        need=np.ones(len(noDiff1),dtype=bool)
 
+    distances[need]=np.round(locationMatching.pairDistances(noDiff1['latitude'].to_numpy()[need],
+                                                            noDiff1['longitude'].to_numpy()[need],
+                                                            noDiff1[latitude].to_numpy()[need],
+                                                            noDiff1[longitude].to_numpy()[need],
+                                                            mode=distance_mode),1)
+    calculated.append(distances)
 
-### add the distance to the input dataframe and round the value
-cityAddrCor1=[round(num, 1) for num in cityAddrCor]
-cityAgtCor1=[round(num1, 1) for num1 in cityAgtCor]
-cityDataCor1=[round(num1, 1) for num1 in cityDataCor]
+locationMatching.saveDistanceCache()
 
-noDiff1['cityToAddrDistance'] = cityAddrCor1
-noDiff1['cityToAgtDistance'] = cityAgtCor1
-noDiff1['cityToDataDistance'] = cityDataCor1
+### add the distances to the input dataframe
+noDiff1['cityToAddrDistance'] = cityAddrCor
+noDiff1['cityToAgtDistance'] = cityAgtCor
+noDiff1['cityToDataDistance'] = cityDataCor
 
 ### end timer and print total time
 t1=time.time()
 total=t1-t0
 print("Total time is %4f" % (total/60), "mins\n")
+print("The number of distances calculated are:",locationMatching.distanceStats['pairs'])
+print("The number of unique location pairs are:",locationMatching.distanceStats['unique'])
+print("The hit rate of the location pair cache is: %.3f" % locationMatching.distanceHitRate(),"\n")
 print("The number of unique assignee IDs are:",noDiff1.assignee_id.nunique())
 print("The number of unique patents are:",noDiff1.patent.nunique(),"\n")
 
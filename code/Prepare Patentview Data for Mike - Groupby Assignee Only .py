@@ -533,6 +533,7 @@ import pandas as pd
 import os
 import datetime
 import time
+import nameNormalizer
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -615,44 +616,12 @@ display(disNames.info(null_counts=True),disNames.head())
 ### start timer
 t0=time.time()
 
-### converts the first character in each word to Uppercase and remaining characters to lowercase in 
-### the string, followed by removing any whitespace that may exist to the left and right of the strings
-disNames['name_std']=disNames['name_std'].str.title()
-disNames['name_std']=disNames['name_std'].str.lstrip().str.rstrip()
-disNames['name_std']=disNames['name_std'].str.replace('\s+',' ')
-
-### some strings must be replaced rather than removed because the resulting organization names would
-### not make sense or match incorrectly. For example, Arjang & Co., which is the full name for the
-### organization, would become Arjang and would match to multiple records via the merge instead of
-### one. This was observed through multiple trials of cleaning the data
-disNames['name_std']=disNames['name_std'].str.replace(' & ', ' And ')
-disNames['name_std']=disNames['name_std'].str.replace(' (Co\.|Co)$', ' Company')
-disNames['name_std']=disNames['name_std'].str.replace(' (Corp\.|Corp)$', ' Corporation')
-disNames['name_std']=disNames['name_std'].str.replace('Intl', 'International')
-disNames['name_std']=disNames['name_std'].str.replace('Mfg', 'Manufacturing')
-disNames['name_std']=disNames['name_std'].str.replace(' (Inc\.|Inc)$| Inc ', ' Incorporated')
-disNames['name_std']=disNames['name_std'].str.replace(' (Ltd\.|Ltd)$', ' Limited')
-disNames['name_std']=disNames['name_std'].str.replace(' (Mgmt\.|Mgmt)$| (Mgmt\.|Mgmt)', ' Management')
-disNames['name_std']=disNames['name_std'].str.replace('Solut$', 'Solutions')
-disNames['name_std']=disNames['name_std'].str.replace('Gen Electr|Ge$', 'General Electric')
-disNames['name_std']=disNames['name_std'].str.replace(' Gen ', ' General ')
-disNames['name_std']=disNames['name_std'].str.replace('R C A', 'Rca')
-disNames['name_std']=disNames['name_std'].str.replace('A M P', 'Amp')
-disNames['name_std']=disNames['name_std'].str.replace('P P G', 'Ppg')
-disNames['name_std']=disNames['name_std'].str.replace('G T E', 'Gte')
-disNames['name_std']=disNames['name_std'].str.replace('G A F', 'Gaf')
-disNames['name_std']=disNames['name_std'].str.replace('Ibm', 'Ibm Corporation')
-disNames['name_std']=disNames['name_std'].str.replace('Sys |Syt$', 'Systems ')
-disNames['name_std']=disNames['name_std'].str.replace('Ind ', 'Industries ')
-
-# disNames['name_std']=disNames['name_std'].str.replace('Llc|Llc\.|Pllc|Pllc\.', '')
-
-
-disNames['name_std']=disNames['name_std'].str.replace('\s+',' ')
-
-### apply the pattern variable to the organization field and clean the resulting whitespace to the
-### left and right of the strings
-disNames['name_std']=disNames['name_std'].str.lstrip().str.rstrip()
+### the names are title cased, stripped, and cleaned using the PV_ORGANIZATION_RULES in
+### nameNormalizer.py. Some strings must be replaced rather than removed because the resulting
+### organization names would not make sense or match incorrectly. For example, Arjang & Co., which
+### is the full name for the organization, would become Arjang and would match to multiple records
+### via the merge instead of one. Each unique name is cleaned once
+disNames['name_std']=nameNormalizer.normalizeNames(disNames['name_std'],nameNormalizer.PV_ORGANIZATION_RULES)
 
 ### end timer and print total time
 t1=time.time()
@@ -677,47 +646,9 @@ display(disNames.info(),disNames.head())
 ### start timer
 t0=time.time()
 
-### converts the first character in each word to Uppercase and remaining characters to lowercase in 
-### the string, followed by removing any whitespace that may exist to the left and right of the strings
-dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.title()
-dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.lstrip().str.rstrip()
-dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.replace('\s+',' ')
-
-### some strings must be replaced rather than removed because the resulting organization names would
-### not make sense or match incorrectly. For example, Arjang & Co., which is the full name for the
-### organization, would become Arjang and would match to multiple records via the merge instead of
-### one. This was observed through multiple trials of cleaning the data
-dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.replace(' & ', ' And ')
-dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.replace(' (Co\.|Co)$', ' Company')
-dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.replace(' (Corp\.|Corp)$', ' Corporation')
-dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.replace('Intl', 'International')
-dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.replace('Mfg', 'Manufacturing')
-dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.replace(' (Inc\.|Inc)$| Inc ',
-                                                                                              ' Incorporated')
-dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.replace(' (Ltd\.|Ltd)$', ' Limited')
-dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.replace(' (Mgmt\.|Mgmt)$| (Mgmt\.|Mgmt)', 
-                                                                                              ' Management')
-dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.replace('Solut$', 'Solutions')
-dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.replace('Gen Electr|Ge$', 
-                                                                                              'General Electric')
-dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.replace(' Gen ', ' General ')
-dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.replace('R C A', 'Rca')
-dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.replace('A M P', 'Amp')
-dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.replace('P P G', 'Ppg')
-dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.replace('G T E', 'Gte')
-dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.replace('G A F', 'Gaf')
-dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.replace('Ibm', 'Ibm Corporation')
-dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.replace('Sys |Syt$', 'Systems ')
-dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.replace('Ind ', 'Industries ')
-
-# dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.replace('Llc|Llc\.|Pllc|Pllc\.', '')
-
-
-dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.replace('\s+',' ')
-
-### apply the pattern variable to the organization field and clean the resulting whitespace to the
-### left and right of the strings
-dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.lstrip().str.rstrip()
+### the organizations are cleaned using the same PV_ORGANIZATION_RULES as the names above
+dfPreFinalMinDatesNoUniv['organization']=nameNormalizer.normalizeNames(dfPreFinalMinDatesNoUniv['organization'],
+                                                                       nameNormalizer.PV_ORGANIZATION_RULES)
 
 ### end timer and print total time
 t1=time.time()
@@ -782,40 +713,23 @@ display(rmPubMerge2.info(null_counts=True),rmPubMerge2.head())
 ### start timer
 t0=time.time()
 
-## converts the first character in each word to Uppercase and remaining characters to lowercase in 
-## the string, followed by removing any whitespace that may exist to the left and right of the strings
-rmPubMerge2.organization=rmPubMerge2.organization.str.lstrip().str.rstrip()
-rmPubMerge2.organization=rmPubMerge2.organization.str.replace('\s+',' ')
-
-### some strings must be replaced rather than removed because the resulting organization names would
-### not make sense or match incorrectly. For example, Arjang & Co., which is the full name for the
-### organization, would become Arjang and would match to multiple records via the merge instead of
-### one. This was observed through multiple trials of cleaning the data
-rmPubMerge2.organization=rmPubMerge2.organization.str.replace('R&D', 'Research And Design')
-rmPubMerge2.organization=rmPubMerge2.organization.str.replace('Medrea.+$', 'Medrea')
-
-# rmPubMerge2.organization=rmPubMerge2.organization.str.replace('Incorporated|Corporation|L\.P\.|A Division Of.+$| Company$', '')
-# rmPubMerge2.organization=rmPubMerge2.organization.str.replace('Inc\.$| Company,$| Limited$| Limited,$|L\.L\.C\.| Lp$', '')
-# rmPubMerge2.organization=rmPubMerge2.organization.str.replace(' Co\.,$|Corp\.,| Company,$| Lcc$| A Div\. Of.+$ Lc$', '')
-
-rmPubMerge2.organization=rmPubMerge2.organization.str.replace(' Co\.,', ' Company')
-rmPubMerge2.organization=rmPubMerge2.organization.str.replace("Int'L", 'International')
-
-rmPubMerge2.organization=rmPubMerge2.organization.str.replace('\s+',' ')
+### the abbreviations are spelled out using the PV_ABBREVIATION_RULES in
+### nameNormalizer.py, with each unique name cleaned once
+rmPubMerge2.organization=nameNormalizer.normalizeNames(rmPubMerge2.organization,nameNormalizer.PV_ABBREVIATION_RULES)
 
 rmPubMerge2=rmPubMerge2[~rmPubMerge2['organization'].str.contains('M\.D\.|Gmbh|Bv$|D/B/A/| Pte$| Pte | Trust$| Trustee ')]
 rmPubMerge2=rmPubMerge2[~rmPubMerge2['organization'].str.contains(' b\.v\. ',case=False)]
 
-### apply the pattern variable to the organization field and clean the resulting whitespace to the
-### left and right of the strings
-rmPubMerge2.organization=rmPubMerge2.organization.str.lstrip().str.rstrip()
+### strip the left and right of the strings for extra whitespace
+rmPubMerge2.organization=nameNormalizer.normalizeNames(rmPubMerge2.organization,('strip',))
 
 ### end timer and print total time
 t1=time.time()
 total=t1-t0
 print("Total time is %4f" % (total/60), "mins\n")
 
-print("There are",len(rmPubMerge2['assignee'].unique()),"unique assignees\n")
+print("There are",len(rmPubMerge2['assignee'].unique()),"unique assignees")
+print("The hit ratio of the unique-value name cleaning is: %.3f" % nameNormalizer.hitRatio(),"\n")
 display(rmPubMerge2.info(),rmPubMerge2.head())
 
 
@@ -831,7 +745,7 @@ display(rmPubMerge2.info(),rmPubMerge2.head())
 t0=time.time()
 
 rmPubMerge2.organization=rmPubMerge2.organization.astype('str')
-rmPubMerge2['rmPunc'] = rmPubMerge2.organization.str.replace('[^\w\s]','')
+rmPubMerge2['rmPunc'] = nameNormalizer.normalizeNames(rmPubMerge2.organization,nameNormalizer.PUNCTUATION_RULES)
 rmPubMerge2.rmPunc=rmPubMerge2.rmPunc.astype('str')
 
 mask=rmPubMerge2.rmPunc.str.len() < 5
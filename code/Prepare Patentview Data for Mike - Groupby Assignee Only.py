@@ -2,6 +2,7 @@ import pandas as pd
 import os
 import time
 import datetime
+import nameNormalizer
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -25,6 +26,13 @@ Failure to execute the script above will result in all subsequent scripts to fai
 
 """
 
+### the normalized names, cities, and states are kept in this SQLite file and reused
+### by later runs of this script and the Merge OpenCorporate Results script. Entries
+### made with other cleaning rules are ignored (see nameNormalizer.py). Set to None to
+### normalize every value again
+normalization_cache = "../csvResults/nameNormalizationCache.sqlite"
+nameNormalizer.useCache(normalization_cache)
+
 ### the assignee.tsv file was imported and fields selected, then records
 ### were filtered using the assignee_type set to 2. The type 2 option
 ### keeps only US-based company.
@@ -407,8 +415,8 @@ assignMergeleft=assignMerge[assignMerge['_merge']=='left_only']
 pvDataPubComp1=pd.concat([assignMergeboth,assignMergeleft],axis=0)
 pvDataPubComp2=pvDataPubComp1.iloc[:,0:16].reset_index(drop=True).copy()
 
-pvDataPubComp2.assignee=pvDataPubComp2.assignee.str.title()
-pvDataPubComp2.assignor=pvDataPubComp2.assignor.str.title()
+pvDataPubComp2.assignee=nameNormalizer.normalizeNames(pvDataPubComp2.assignee,('title',))
+pvDataPubComp2.assignor=nameNormalizer.normalizeNames(pvDataPubComp2.assignor,('title',))
 
 t1=time.time()
 total=t1-t0
@@ -483,44 +491,13 @@ print(disNames.head(),flush=True)
 ### subsequent merges using this data
 t0=time.time()
 
-### converts the first character in each word to Uppercase and
-### remaining characters to lowercase in the string, followed
-### by removing any whitespace that may exist to the left and
-### right of the strings
-disNames['name_std']=disNames['name_std'].str.title()
-disNames['name_std']=disNames['name_std'].str.lstrip().str.rstrip()
-disNames['name_std']=disNames['name_std'].str.replace('\s+',' ')
-
-### some strings must be replaced rather than removed because
-### the resulting organization names would not make sense or
-### match incorrectly. For example, Arjang & Co., which is the
-### full name for the organization, would become Arjang and
-### would match to multiple records via the merge instead of one.
-### This was observed through multiple trials of cleaning the data
-disNames['name_std']=disNames['name_std'].str.replace(' & ', ' And ')
-disNames['name_std']=disNames['name_std'].str.replace(' (Co\.|Co)$', ' Company')
-disNames['name_std']=disNames['name_std'].str.replace(' (Corp\.|Corp)$', ' Corporation')
-disNames['name_std']=disNames['name_std'].str.replace('Intl', 'International')
-disNames['name_std']=disNames['name_std'].str.replace('Mfg', 'Manufacturing')
-disNames['name_std']=disNames['name_std'].str.replace(' (Inc\.|Inc)$| Inc ', ' Incorporated')
-disNames['name_std']=disNames['name_std'].str.replace(' (Ltd\.|Ltd)$', ' Limited')
-disNames['name_std']=disNames['name_std'].str.replace(' (Mgmt\.|Mgmt)$| (Mgmt\.|Mgmt)', ' Management')
-disNames['name_std']=disNames['name_std'].str.replace('Solut$', 'Solutions')
-disNames['name_std']=disNames['name_std'].str.replace('Gen Electr|Ge$', 'General Electric')
-disNames['name_std']=disNames['name_std'].str.replace(' Gen ', ' General ')
-disNames['name_std']=disNames['name_std'].str.replace('R C A', 'Rca')
-disNames['name_std']=disNames['name_std'].str.replace('A M P', 'Amp')
-disNames['name_std']=disNames['name_std'].str.replace('P P G', 'Ppg')
-disNames['name_std']=disNames['name_std'].str.replace('G T E', 'Gte')
-disNames['name_std']=disNames['name_std'].str.replace('G A F', 'Gaf')
-disNames['name_std']=disNames['name_std'].str.replace('Ibm', 'Ibm Corporation')
-disNames['name_std']=disNames['name_std'].str.replace('Sys |Syt$', 'Systems ')
-disNames['name_std']=disNames['name_std'].str.replace('Ind ', 'Industries ')
-
-### this line ensures the strings contain single spaces and
-### strip the left and right of strings for extra whitespace
-disNames['name_std']=disNames['name_std'].str.replace('\s+',' ')
-disNames['name_std']=disNames['name_std'].str.lstrip().str.rstrip()
+### the names are cleaned using the PV_ORGANIZATION_RULES in nameNormalizer.py.
+### The rules convert the first character in each word to Uppercase and
+### remaining characters to lowercase in the string, remove any whitespace
+### that may exist to the left and right of the strings, and replace the
+### strings that must be replaced rather than removed (e.g., & to And). The
+### same rules are applied to the organization names below
+disNames['name_std']=nameNormalizer.normalizeNames(disNames['name_std'],nameNormalizer.PV_ORGANIZATION_RULES)
 
 ### end timer and print total time
 t1=time.time()
@@ -536,47 +513,14 @@ print(disNames.head(),flush=True)
 ### Skipping this step will result in a poor merge
 t0=time.time()
 
-### converts the first character in each word to Uppercase and
-### remaining characters to lowercase in the string, followed
-### by removing any whitespace that may exist to the left and
-### right of the strings
-dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.title()
-dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.lstrip().str.rstrip()
-dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.replace('\s+',' ')
-
-### some strings must be replaced rather than removed because
-### the resulting organization names would not make sense or
-### match incorrectly. For example, Arjang & Co., which is the
-### full name for the organization, would become Arjang and
-### would match to multiple records via the merge instead of one.
-### This was observed through multiple trials of cleaning the data
-dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.replace(' & ', ' And ')
-dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.replace(' (Co\.|Co)$', ' Company')
-dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.replace(' (Corp\.|Corp)$', ' Corporation')
-dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.replace('Intl', 'International')
-dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.replace('Mfg', 'Manufacturing')
-dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.replace(' (Inc\.|Inc)$| Inc ',
-                                                                                              ' Incorporated')
-dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.replace(' (Ltd\.|Ltd)$', ' Limited')
-dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.replace(' (Mgmt\.|Mgmt)$| (Mgmt\.|Mgmt)',
-                                                                                              ' Management')
-dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.replace('Solut$', 'Solutions')
-dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.replace('Gen Electr|Ge$',
-                                                                                              'General Electric')
-dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.replace(' Gen ', ' General ')
-dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.replace('R C A', 'Rca')
-dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.replace('A M P', 'Amp')
-dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.replace('P P G', 'Ppg')
-dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.replace('G T E', 'Gte')
-dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.replace('G A F', 'Gaf')
-dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.replace('Ibm', 'Ibm Corporation')
-dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.replace('Sys |Syt$', 'Systems ')
-dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.replace('Ind ', 'Industries ')
-
-### this section ensures the strings contain single spaces and
-### strip the left and right of strings for extra whitespace
-dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.replace('\s+',' ')
-dfPreFinalMinDatesNoUniv['organization']=dfPreFinalMinDatesNoUniv['organization'].str.lstrip().str.rstrip()
+### the organization names are cleaned using the same rules as the names above
+### (see PV_ORGANIZATION_RULES in nameNormalizer.py). Some strings must be replaced
+### rather than removed because the resulting organization names would not make
+### sense or match incorrectly. For example, Arjang & Co., which is the full name
+### for the organization, would become Arjang and would match to multiple records
+### via the merge instead of one
+dfPreFinalMinDatesNoUniv['organization']=nameNormalizer.normalizeNames(dfPreFinalMinDatesNoUniv['organization'],
+                                                                       nameNormalizer.PV_ORGANIZATION_RULES)
 
 ### end timer and print total time
 t1=time.time()
@@ -632,18 +576,8 @@ print(rmPubMerge2.head(),flush=True)
 ### the code below
 t0=time.time()
 
-rmPubMerge2.organization=rmPubMerge2.organization.str.lstrip().str.rstrip()
-rmPubMerge2.organization=rmPubMerge2.organization.str.replace('\s+',' ')
-
-rmPubMerge2.organization=rmPubMerge2.organization.str.replace('R&D', 'Research And Design')
-rmPubMerge2.organization=rmPubMerge2.organization.str.replace('Medrea.+$', 'Medrea')
-rmPubMerge2.organization=rmPubMerge2.organization.str.replace('Incorporated|Corporation|L\.P\.|A Division Of.+$| Company$', '')
-rmPubMerge2.organization=rmPubMerge2.organization.str.replace('Inc\.$| Company,$| Limited$| Limited,$|L\.L\.C\.| Lp$', '')
-rmPubMerge2.organization=rmPubMerge2.organization.str.replace(' Co\.,$|Corp\.,| Company,$| Lcc$| A Div\. Of.+$ Lc$', '')
-rmPubMerge2.organization=rmPubMerge2.organization.str.replace(' Llc$|,', '')
-rmPubMerge2.organization=rmPubMerge2.organization.str.replace(' Co\.,', ' Company')
-rmPubMerge2.organization=rmPubMerge2.organization.str.replace("Int'L", 'International')
-rmPubMerge2.organization=rmPubMerge2.organization.str.replace('\s+',' ')
+### the suffixes are removed using the PV_SUFFIX_RULES in nameNormalizer.py
+rmPubMerge2.organization=nameNormalizer.normalizeNames(rmPubMerge2.organization,nameNormalizer.PV_SUFFIX_RULES)
 
 ### this removes suspected foreign orgs
 rmPubMerge2=rmPubMerge2[~rmPubMerge2['organization'].str.contains('M\.D\.|Gmbh|Bv$|D/B/A/| Pte$| Pte | Trust$| Trustee ')]
@@ -651,15 +585,16 @@ rmPubMerge2=rmPubMerge2[~rmPubMerge2['organization'].str.contains(' b\.v\. ',cas
 
 ### this section ensures the strings contain single spaces and
 ### strip the left and right of strings for extra whitespace
-rmPubMerge2.organization=rmPubMerge2.organization.str.replace('\s+',' ')
-rmPubMerge2.organization=rmPubMerge2.organization.str.lstrip().str.rstrip()
+rmPubMerge2.organization=nameNormalizer.normalizeNames(rmPubMerge2.organization,nameNormalizer.WHITESPACE_RULES)
 
 ### end timer and print total time
 t1=time.time()
 total=t1-t0
 print("Total time is %4f" % (total/60), "mins\n")
 print("The total number of unique assignee ids are:",len(rmPubMerge2['assignee_id'].unique()))
-print("The total number of unique patents are:",rmPubMerge2['patent'].nunique(),"\n")
+print("The total number of unique patents are:",rmPubMerge2['patent'].nunique())
+print("The hit ratio of the unique-value name cleaning is: %.3f" % nameNormalizer.hitRatio())
+print("The number of unique values read from the normalization cache are:",nameNormalizer.normalizationStats['cached'],"\n")
 
 print(rmPubMerge2.info(),flush=True)
 print(rmPubMerge2.head(),flush=True)
@@ -675,7 +610,7 @@ print(rmPubMerge2.head(),flush=True)
 t0=time.time()
 
 rmPubMerge2.organization=rmPubMerge2.organization.astype('str')
-rmPubMerge2['rmPunc'] = rmPubMerge2.organization.str.replace('[^\w\s]','')
+rmPubMerge2['rmPunc'] = nameNormalizer.normalizeNames(rmPubMerge2.organization,nameNormalizer.PUNCTUATION_RULES)
 rmPubMerge2.rmPunc=rmPubMerge2.rmPunc.astype('str')
 
 mask=rmPubMerge2.rmPunc.str.len() < 5
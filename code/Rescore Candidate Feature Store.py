@@ -0,0 +1,153 @@
+import pandas as pd
+import numpy as np
+import time
+import os
+import warnings
+import scoringEngine
+import scoringStore
+warnings.filterwarnings('ignore')
+
+"""
+Author: Joshua Chu
+Date: October 18, 2026
+
+Description: this script re-scores the candidates in the readyForScoring.csv file
+with a changed set of scoring rules, without running the 'Merge OpenCorporate Results
+with Input Data and Clean for Scoring.py' script again. The inputs of the scoring
+rules (nameScores, organization length, the state and city match flags, dateDiff,
+the three distances, and record_date) are saved once to a feature store keyed by ID
+and candidate. The store is rebuilt automatically when readyForScoring.csv is newer
+than the store.
+
+The changed rules are read from a JSON file that only needs to contain the band
+tables that differ from the rules in scoringEngine.py, for example:
+
+  {"nameBands": [[100, 100, [5], [0, 5]],
+                 [92, 100, [5, 10, 15], [0, 1, 2, 5]],
+                 [87, 92, [5, 10, 15], [-1, 1, 2, 4]],
+                 [-Infinity, 87, [], [-7]]]}
+
+The output lists the topK candidates for each ID under the changed rules, with the
+rank 1 candidate under the original rules for comparison. The candidate column is
+the position of the record within its ID in the readyForScoring.csv file.
+
+"""
+
+### set the scoring rules file, the scale mode for the confidence scores ('batch',
+### 'fixed', or 'calibration', see 'Score OpenCorporates Data With States.py'), and
+### the number of candidates kept for each ID. The calibration mode uses the state
+### profile range saved to the calibration file by a batch run of the scoring script
+rules_file = "scoringRules.json"
+scaleMode = 'batch'
+topK = 3
+
+### set the path for the input, feature store, and output files and save to variables
+res_folder = "../csvResults/"
+input_file = "readyForScoring.csv"
+store_file = "candidateFeatureStore.npz"
+output_file = "rescoredResults.csv"
+calibration_file = "scoreCalibration.json"
+
+input_directory=os.path.join(res_folder,input_file)
+store_directory=os.path.join(res_folder,store_file)
+rules_directory=os.path.join(res_folder,rules_file)
+output_directory=os.path.join(res_folder,output_file)
+calibration_directory=os.path.join(res_folder,calibration_file)
+
+
+### the feature store is built from the readyForScoring.csv file if it does not
+### exist or is older than the input file. Otherwise, the store is loaded. The
+### candidates pruned by the Merge script can only be re-scored in the 'fixed' scale
+### mode (see scoringEngine.checkPruning())
+t0=time.time()
+
+scoringEngine.checkPruning(pd.read_csv(input_directory,nrows=1),scaleMode,topK)
+
+if scoringStore.featureStoreIsCurrent(store_directory,input_directory):
+    print(store_directory,"\n")
+    features=scoringStore.loadFeatureStore(store_directory)
+
+else:
+    print(input_directory,"\n")
+    features=scoringStore.buildFeatureStore(pd.read_csv(input_directory))
+    scoringStore.saveFeatureStore(store_directory,features)
+
+### end timer and print total time
+t1=time.time()
+total=t1-t0
+print("Total time is %.3f" % (total/60), "mins\n")
+print("The number of unique IDs are:",features.ID.nunique(),"\n")
+
+print(features.info(),flush=True)
+print(features.head(),flush=True)
+
+
+### load the changed scoring rules. The rules that are not included in the rules
+### file are taken from scoringEngine.py
+t0=time.time()
+
+rules=scoringEngine.loadRules(rules_directory)
+
+### end timer and print total time
+t1=time.time()
+total=t1-t0
+print("Total time is %.3f" % (total/60), "mins\n")
+print(rules,"\n",flush=True)
+
+
+### score the candidates using the original and changed rules, then select the
+### best candidates for each ID using the same order as the scoring script
+t0=time.time()
+
+results=[]
+
+for ruleSet in [scoringEngine.STATE_RULES, rules]:
+    scored=features[['ID','candidate','dateDiff','record_date']].copy()
+    scored['totalScore']=scoringEngine.scoreFeatures(features,ruleSet)
+
+    if scaleMode == 'batch':
+        scoreMin,scoreMax=min(scored['totalScore']),max(scored['totalScore'])
+
+    elif scaleMode == 'fixed':
+        scoreMin,scoreMax=scoringEngine.scoreRange(ruleSet)
+
+    elif scaleMode == 'calibration':
+        scoreMin,scoreMax=scoringEngine.loadCalibration(calibration_directory)['state']
+
+    else:
+        raise ValueError("Unknown scale mode: %s" % scaleMode)
+
+    scored['confidenceScore']=scoringEngine.confidenceScores(scored['totalScore'],scoreMin,scoreMax)
+    scored['score']=scored['confidenceScore'].apply(np.floor)
+
+    results.append(scoringEngine.topCandidates(scored,k=topK))
+
+original,rescored=results
+
+### end timer and print total time
+t1=time.time()
+total=t1-t0
+print("Total time is %.3f" % (total/60), "mins\n")
+
+
+### compare the rank 1 candidates under the changed rules against the original rules
+### and save the results
+t0=time.time()
+
+original=original.loc[original['candidateRank']==1,['ID','candidate']].rename(columns={'candidate':'originalCandidate'})
+rescored=rescored.merge(original,on=['ID'],how='left')
+
+changed=rescored.loc[(rescored['candidateRank']==1) & (rescored['candidate']!=rescored['originalCandidate'])]
+
+### end timer and print total time
+t1=time.time()
+total=t1-t0
+print("Total time is %.3f" % (total/60), "mins\n")
+print("The number of unique IDs are:",rescored.ID.nunique())
+print("The number of IDs with a changed best candidate are:",changed.ID.nunique(),"\n")
+
+print(rescored.info(),flush=True)
+print(rescored.head(),flush=True)
+
+rescored.to_csv(output_directory,index=False)
+os.chmod(output_directory,0o777)
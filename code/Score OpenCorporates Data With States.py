@@ -4,6 +4,8 @@ import time
 import os
 from datetime import timedelta
 import warnings
+import scoringEngine
+import scoringStore
 warnings.filterwarnings('ignore')
 
 """
@@ -16,268 +18,286 @@ no date prep steps in this script, only scoring. If addtional data prep steps mu
 performed, the 'Merge OpenCorporate Results with Input Data and Clean for Scoring.py'
 script should be modified to include those steps.
 
-"""
+The scoring rules are held in named profiles in scoringEngine.py. The 'state' profile
+holds the rules of this script and the 'stateless' profile holds the rules of the
+'Score OpenCorporates Data With No States' notebook. A combined candidate file can be
+scored in one run by including a scoringProfile column with the profile of each
+record. Records without this column are scored with the scoringProfile set below.
 
-### the code below imports the file to be scored and converts the date fields
-### to the necessary data types
-t0=time.time()
+"""
 
-### set the path for the input file and save to variable
+### the confidence scores are scaled to a 1-10 range using one of the modes below:
+###
+###   'batch'       - the min and max totalScore of the whole input file. This is the
+###                   original behavior and requires the whole file to be loaded. The
+###                   range is saved to the calibration file for later runs
+###   'fixed'       - the range declared by the band tables in scoringEngine.py
+###   'calibration' - the range saved to the calibration file by a previous batch run
+###
+### the range is determined separately for each scoring profile
+###
+### the fixed and calibration modes score the input file in chunks of chunkSize
+### records, so memory stays flat as the candidate file grows and a record's
+### score does not depend on the other records in the batch
+scaleMode = 'batch'
+chunkSize = 500000
+
+### the number of candidate records kept for each ID. The best record is saved to
+### the reviewScoredResults.csv file and all topK records are saved with their ranks
+### to the reviewScoredResultsTopK.csv file
+topK = 3
+
+### the scoring profile used for records without a scoringProfile column
+scoringProfile = 'state'
+
+### when True, each OC company (company_number and jurisdiction_code) is assigned to
+### at most one ID using the topK records of each ID, and the assignment is saved to
+### the reviewScoredResultsResolved.csv file
+resolveConflicts = False
+
+### when True, a fingerprint of the candidates of each ID is saved to the decision
+### store, and later runs only score the IDs whose candidates changed. The results
+### of these IDs are merged into the existing output files. All IDs are scored when
+### the scoring rules or settings change, and always in the 'batch' scale mode since
+### the batch range depends on every record in the file
+incrementalScoring = False
+
+### set the path for the input, output, and calibration files and save to variables
 res_folder = "../csvResults/"
 input_file = "readyForScoring.csv"
+calibration_file = "scoreCalibration.json"
+decision_file = "scoreDecisions.npz"
 
 input_directory=os.path.join(res_folder,input_file)
+calibration_directory=os.path.join(res_folder,calibration_file)
+decision_directory=os.path.join(res_folder,decision_file)
 print(input_directory,"\n")
 
-df=pd.read_csv(input_directory)
-df['incorporation_date'] = pd.to_datetime(df['incorporation_date'],errors='coerce')
-df['dateFiledMin'] = pd.to_datetime(df['dateFiledMin'],errors='coerce')
-df['record_date'] = pd.to_datetime(df['record_date'],errors='coerce')
-
-### end timer and print total time
-t1=time.time()
-total=t1-t0
-print("Total time is %.3f" % (total/60), "mins\n")
-print("The number of unique assignee IDs are:",df.assignee_id.nunique())
-print("The number of unique IDs are:",df.ID.nunique(),"\n")
-
-print(df.info(null_counts=True),flush=True)
-print(df.head(),flush=True)
-
-
-### the scoring algorithm is below. A short description for each section is provided
-### to understand the steps
-t0=time.time()
-
-totalScore=[]
-d=len(df)
-x=''
-
-for s in range(d):
-
-    ### scores all records with a fuzzy match score with a 100%; account for organization
-    ### name lengths (i.e., shorter names are scored lower than longer names). There should
-    ### be no org names with less than 5 characters, but if any squeaked through, make sure
-    ### they are penalized
-    if df['nameScores'][s] == 100:
+scored_directory=os.path.join(res_folder,"scoredOCResults.csv")
+topK_directory=os.path.join(res_folder,"reviewScoredResultsTopK.csv")
+review_directory=os.path.join(res_folder,"reviewScoredResults.csv")
 
-        if len(df['organization'][s]) < 5:
-            x=0
+### the candidates pruned by the Merge script can only be scored in the 'fixed' scale
+### mode with a topK no larger than the pruneTopK they were pruned with
+scoringEngine.checkPruning(pd.read_csv(input_directory,nrows=1),scaleMode,topK)
 
-        elif len(df['organization'][s]) >= 5:
-            x=5
+if scaleMode == 'batch':
+    chunks=[pd.read_csv(input_directory)]
 
-    ### visual inspection of the data indicates discrete groups exist, which results in
-    ### the next section. Name lengths are again considered where shorter names/scores
-    ### are downweighted
-    elif 90 <= df['nameScores'][s] < 100:
+elif scaleMode == 'fixed':
+    chunks=pd.read_csv(input_directory,chunksize=chunkSize)
+    scoreRanges={name:scoringEngine.scoreRange(rules) for name,rules in scoringEngine.PROFILES.items()}
 
-        if len(df['organization'][s]) < 5:
-            x=0
+elif scaleMode == 'calibration':
+    chunks=pd.read_csv(input_directory,chunksize=chunkSize)
+    scoreRanges=scoringEngine.loadCalibration(calibration_directory)
 
-        elif 5 <= len(df['organization'][s]) < 10:
-            x=1
+print("The scale mode is:",scaleMode,"\n")
 
-        elif 10 <= len(df['organization'][s]) < 15:
-            x=2
 
-        elif len(df['organization'][s]) >= 15:
-            x=5
+### the candidates of each ID are compared against the decision store from the
+### previous run. If the rules and settings have not changed, only the IDs with new
+### or changed candidates are scored and written to separate files, which are merged
+### into the existing output files after scoring
+rescoreChanged=False
 
-    ### this section and below could probably use some optimizing. The existing
-    ### fuzzy score ranges were manually determined early on in the project and
-    ### likely be refined
-    elif 87 <= df['nameScores'][s] < 90:
+if incrementalScoring:
+    t0=time.time()
 
-        if len(df['organization'][s]) < 5:
-            x=-1
+    fingerprints=scoringStore.candidateFingerprints(pd.read_csv(input_directory,dtype=str,chunksize=chunkSize))
+    settings=scoringStore.settingsFingerprint(scoringEngine.PROFILES,scaleMode,scoringProfile,topK,
+                                              scoreRanges if scaleMode != 'batch' else None)
 
-        elif 5 <= len(df['organization'][s]) < 10:
-            x=1
+    if scaleMode != 'batch' and os.path.exists(decision_directory) and os.path.exists(scored_directory):
+        decisions,previousSettings=scoringStore.loadDecisionStore(decision_directory)
+        rescoreChanged=previousSettings == settings
 
-        elif 10 <= len(df['organization'][s]) < 15:
-            x=2
+    if rescoreChanged:
+        changedIDs,removedIDs=scoringStore.changedIDs(fingerprints,decisions)
+        chunks=(chunk.loc[chunk['ID'].isin(changedIDs)] for chunk in chunks)
 
-        elif len(df['organization'][s]) >= 15:
-            x=4
+        scored_directory,topK_directory,review_directory=[path.replace('.csv','Changed.csv') for path in
+                                                          [scored_directory,topK_directory,review_directory]]
 
-    elif df['nameScores'][s] < 87:
-        x=-7
+    ### end timer and print total time
+    t1=time.time()
+    total=t1-t0
+    print("Total time is %.3f" % (total/60), "mins\n")
+    print("The number of unique IDs are:",len(fingerprints))
+    print("Only the changed IDs are scored:",rescoreChanged)
 
-    elif np.isnan(df['nameScores'][s]):
-        x=-10
+    if rescoreChanged:
+        print("The number of new or changed IDs are:",len(changedIDs))
+        print("The number of removed IDs are:",len(removedIDs),"\n")
 
-    ### scoring the city-state pairs for each organization. A new variable 'a' is
-    ### included in this section. The purpose of this variable is to prevent records
-    ### from getting points in this section for an exact city-state pair match and in
-    ### coordinates scoring section below
-    if df['state'][s] == df['stateMatch'][s]:
-        x=x+5
+### the topK best scoring records for each ID are carried from chunk to chunk
+### and compared against the records in the next chunk
+df1=None
 
-    elif df['state'][s] == df['address_state'][s]:
-        x=x+5
+for n, df in enumerate(chunks):
 
-    elif df['state'][s] == df['agent_state'][s]:
-        x=x+5
+    ### the code below converts the date fields to the necessary data types
+    t0=time.time()
 
-    if df['city'][s] == df['cityMatch'][s]:
-        x=x+5
-        a=1
+    profiles=scoringEngine.candidateProfiles(df,default=scoringProfile)
 
-    elif df['city'][s] == df['address_city'][s]:
-        x=x+5
-        a=1
+    for rules in scoringEngine.PROFILES.values():
+        for col in rules['dateColumns']:
+            if col in df:
+                df[col] = pd.to_datetime(df[col],errors='coerce')
 
-    elif df['city'][s] == df['agent_city'][s]:
-        x=x+5
-        a=1
+    df['record_date'] = pd.to_datetime(df['record_date'],errors='coerce')
 
-    else:
-        a=0
+    ### end timer and print total time
+    t1=time.time()
+    total=t1-t0
+    print("Total time is %.3f" % (total/60), "mins\n")
+    print("The number of unique assignee IDs are:",df.assignee_id.nunique())
+    print("The number of unique IDs are:",df.ID.nunique(),"\n")
 
-    ### the code below penalizes records with a first patent applied for date that is older
-    ### than the incorporation date for that organization
+    print(df.info(null_counts=True),flush=True)
+    print(df.head(),flush=True)
 
-    ###IMPORTANT: THIS SHOULD BE CHANGED BECAUSE WE NOW CALCULATE DATE DIFFERENCES USING ASSIGNEE DATA###
 
-    if df['dateFiledMin'][s] < df['incorporation_date'][s]:
+    ### the scoring algorithm is applied below using the columnar scoring engine in
+    ### scoringEngine.py. The band tables in that module are the same rules that were
+    ### previously applied to one record at a time, including the name score/length
+    ### bands, the state and city matches, the date penalty and bonus bands, and the
+    ### distance bands. Each record is scored with the rules of its profile
+    t0=time.time()
 
-        if df['dateDiff'][s] >= -5 and df['dateDiff'][s] < 0:
-            x=x-1
+    df['totalScore']=scoringEngine.scoreCandidates(df,profiles)
 
-        elif df['dateDiff'][s] >= -10 and df['dateDiff'][s] < -5:
-            x=x-3
+    ### end timer and print total time
+    t1=time.time()
+    total=t1-t0
+    print("Total time is %.3f" % (total/60), "mins\n")
+    print("The number of unique assignee IDs are:",df.assignee.nunique())
+    print("The number of unique IDs are:",df.ID.nunique(),"\n")
 
-        elif df['dateDiff'][s] < -10:
-            x=x-5
+    print(df.info(),flush=True)
+    print(df.head(),flush=True)
 
-    ### if the variable 'a' is set to 1, the record is skipped and moves to the date difference
-    ### scoring section below. If 'a' is not 1, the city-city distance that was calculated in the
-    ### 'Merge OpenCorporate Results with Input Data and Clean for Scoring.py' script is utilized
-    ### to score the record using distance ranges set below. If no distance was able to be determined
-    ### a score of zero is given. It is possible this section could be refined
-    if a == 1:
-        pass
+    ### the first chunk creates the output file and the remaining chunks are appended
+    df.to_csv(scored_directory,index=False,mode='w' if n == 0 else 'a',header=n == 0)
+    os.chmod(scored_directory,0o777)
 
-    elif 0 <= df['cityToAddrDistance'][s] < 50 or 0 <= df['cityToAgtDistance'][s] < 50 or 0 <= df['cityToDataDistance'][s] < 50:
-        x=x+5
 
-    elif 50 <= df['cityToAddrDistance'][s] < 100 or 50 <= df['cityToAgtDistance'][s] < 100 or 50 <= df['cityToDataDistance'][s] < 100:
-        x=x+2
+    ### calculate the confidence scores using the totalScores from the previous
+    ### section. In batch mode the range of each profile is taken from the scores and
+    ### saved to the calibration file
+    t0=time.time()
 
-    elif 100 <= df['cityToAddrDistance'][s] < 200 or 100 <= df['cityToAgtDistance'][s] < 200 or 100 <= df['cityToDataDistance'][s] < 200:
-        x=x+1
+    if scaleMode == 'batch':
+        scoreRanges=scoringEngine.batchScoreRanges(df['totalScore'],profiles)
+        scoringEngine.saveCalibration(calibration_directory,scoreRanges)
 
-    elif df['cityToAddrDistance'][s] >= 200 or df['cityToAgtDistance'][s] >= 200 or df['cityToDataDistance'][s] >= 200:
-        x=x-2
+    df['confidenceScore']=scoringEngine.profileConfidenceScores(df['totalScore'],profiles,scoreRanges)
 
-    elif np.isnan(df['cityToDataDistance'][s]):
-        x=x+0
+    ### end timer and print total time
+    t1=time.time()
+    total=t1-t0
+    print("Total time is %.3f" % (total/60), "mins\n")
+    print("The totalScore ranges used for the confidence scores are:",scoreRanges,"\n")
 
-    ### this final section utilizes the dateDiff field and scores the record
-    ### according to the corresponding ranges. There is an opportunity to
-    ### modify these ranges to move lower scoring records to a 'higher' level
-    try:
-        if df['dateDiff'][s] <= 15:
-            x=x+5
+    print(df.info(),flush=True)
+    print(df.head(),flush=True)
 
-        elif 15 < df['dateDiff'][s] <= 25:
-            x=x+4
 
-        elif 25 < df['dateDiff'][s] <= 30:
-            x=x+3
+    ### convert the confidence scores from floats to integers by using the floor
+    ### function, which moves each score to the next lowest integer, not the next
+    ### highest integer. The stateless profile also maps these integers to its
+    ### score buckets. After this step, the topK best records for each ID are
+    ### selected using the same order as sorting by ID, score, dateDiff, and
+    ### record_date, without sorting the whole data set. The best records from the
+    ### previous chunks are placed first so ties are resolved in file order
+    t0=time.time()
 
-        elif 30 < df['dateDiff'][s] <= 35:
-            x=x+2
+    df['score'] = scoringEngine.bucketScores(df['confidenceScore'],profiles)
+    df1=pd.concat([df1,df],axis=0)
+    df1=scoringEngine.topCandidates(df1,k=topK).reset_index(drop=True)
 
-        elif df['dateDiff'][s] > 35:
-            x=x+1
+    ### end timer and print total time
+    t1=time.time()
+    total=t1-t0
+    print("Total time is %.3f" % (total/60), "mins\n")
 
-    except:
-        print('cannot compare dates')
-
-    totalScore.append(x)
-    a=0
-
-### end timer and print total time
-t1=time.time()
-total=t1-t0
-print("Total time is %.3f" % (total/60), "mins\n")
+    print(df1.info(),flush=True)
+    print(df1.head(),flush=True)
 
 
-### append the existing data frame with the scores for each record
+### keep the highest ranked record for each ID, which should result in the highest
+### scoring record for each assignee. The runner-up records are saved to a separate
+### file with their ranks for review
 t0=time.time()
 
-df['totalScore'] = totalScore
+df2=df1.loc[df1['candidateRank']==1].drop(labels=['candidateRank'],axis=1)
 
 ### end timer and print total time
 t1=time.time()
 total=t1-t0
 print("Total time is %.3f" % (total/60), "mins\n")
-print("The number of unique assignee IDs are:",df.assignee.nunique())
-print("The number of unique IDs are:",df.ID.nunique(),"\n")
-
-print(df.info(),flush=True)
-print(df.head(),flush=True)
-
-df.to_csv("../csvResults/scoredOCResults.csv",index=False)
-os.chmod("../csvResults/scoredOCResults.csv",0o777)
-
+print("The number of unique assignee IDs are:",df2.assignee_id.nunique())
+print("The number of unique IDs are:",df2.ID.nunique(),"\n")
 
-### calculate the confidence scores using the totalScores from the previous section
-t0=time.time()
+print(df2.info(),flush=True)
+print(df2.head(),flush=True)
 
-df['confidenceScore']=((10-1)*((df['totalScore']-min(df['totalScore']))/
-                               (max(df['totalScore'])-min(df['totalScore']))))+1
+df1.to_csv(topK_directory,index=False)
+os.chmod(topK_directory,0o777)
 
-df['confidenceScore']=[round(num1, 2) for num1 in df['confidenceScore']]
+df2.to_csv(review_directory,index=False)
+os.chmod(review_directory,0o777)
 
-### end timer and print total time
-t1=time.time()
-total=t1-t0
-print("Total time is %.3f" % (total/60), "mins\n")
-print("The number of unique assignee IDs are:",df.assignee.nunique())
-print("The number of unique IDs are:",df.ID.nunique(),"\n")
 
-print(df.info(),flush=True)
-print(df.head(),flush=True)
+### the results of the changed IDs replace the results of the same IDs in the existing
+### output files, and the results of the removed IDs are dropped. The decision store
+### is then updated with the fingerprints and best companies of all IDs
+if incrementalScoring:
+    t0=time.time()
 
+    if rescoreChanged:
+        replaceIDs=np.concatenate([changedIDs,removedIDs])
 
-### convert the confidence scores from floats to integers by using the floor
-### function, which moves each score to the next lowest integer, not the next
-### highest integer. After this step, the values are sorted using the fields
-### below and applying different ascending options
-t0=time.time()
+        for path in [scored_directory,topK_directory,review_directory]:
+            scoringStore.mergeScoredFile(path.replace('Changed.csv','.csv'),path,replaceIDs)
+            os.remove(path)
 
-df['score'] = df['confidenceScore'].apply(np.floor)
-df1=df.sort_values(by=['ID','score','dateDiff','record_date'],ascending=[True,False,False,False]).reset_index(drop=True)
+        df1=pd.read_csv(topK_directory.replace('Changed.csv','.csv'),parse_dates=['record_date'])
+        df2=pd.read_csv(review_directory.replace('Changed.csv','.csv'),parse_dates=['record_date'])
 
-### end timer and print total time
-t1=time.time()
-total=t1-t0
-print("Total time is %.3f" % (total/60), "mins\n")
+    scoringStore.saveDecisionStore(decision_directory,fingerprints,df2,settings)
 
-print(df1.info(),flush=True)
-print(df1.head(),flush=True)
+    ### end timer and print total time
+    t1=time.time()
+    total=t1-t0
+    print("Total time is %.3f" % (total/60), "mins\n")
+    print("The number of unique IDs are:",df2.ID.nunique(),"\n")
 
 
-### drop duplicates in the data set. By using the sorting options in the
-### previous section, the goal is to drop by ID and keeping the first. This
-### should result in the highest scoring record for each assignee
-t0=time.time()
+### the best record of each ID is selected on its own, so the same OC company can be
+### the best record for several IDs. The optional step below resolves these conflicts
+### by assigning the highest ranked records first and skipping the records of IDs and
+### companies that were already assigned. IDs that lose their company are given their
+### next best record that is not taken, or no record if all topK records are taken
+if resolveConflicts:
+    t0=time.time()
 
-df2=df1.drop_duplicates(subset=['ID'],keep='first')
+    assigned=scoringEngine.resolveCompanyConflicts(df1)
+    df3=df1.loc[assigned]
 
-### end timer and print total time
-t1=time.time()
-total=t1-t0
-print("Total time is %.3f" % (total/60), "mins\n")
-print("The number of unique assignee IDs are:",df2.assignee_id.nunique())
-print("The number of unique IDs are:",df2.ID.nunique(),"\n")
+    conflicts=df2.loc[df2['company_number'].notnull()].duplicated(subset=['company_number','jurisdiction_code'],keep=False)
 
-print(df2.info(),flush=True)
-print(df2.head(),flush=True)
+    ### end timer and print total time
+    t1=time.time()
+    total=t1-t0
+    print("Total time is %.3f" % (total/60), "mins\n")
+    print("The number of IDs with a conflicting best record are:",conflicts.sum())
+    print("The number of IDs reassigned to a lower ranked record are:",(df3['candidateRank']>1).sum())
+    print("The number of IDs left without a record are:",df2.ID.nunique()-df3.ID.nunique(),"\n")
 
+    print(df3.info(),flush=True)
+    print(df3.head(),flush=True)
 
-df2.to_csv("../csvResults/reviewScoredResults.csv",index=False)
-os.chmod("../csvResults/reviewScoredResults.csv",0o777)
+    df3.to_csv("../csvResults/reviewScoredResultsResolved.csv",index=False)
+    os.chmod("../csvResults/reviewScoredResultsResolved.csv",0o777)
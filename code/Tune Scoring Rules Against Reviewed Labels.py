@@ -0,0 +1,155 @@
+import pandas as pd
+import time
+import os
+import warnings
+import scoringEngine
+import scoringTuning
+warnings.filterwarnings('ignore')
+
+"""
+Author: Joshua Chu
+Date: October 18, 2026
+
+Description: the thresholds in the scoring rules were manually determined early on in
+the project. This script evaluates a grid or a random sample of scoring configurations
+against a file of human-reviewed labels and reports the precision and recall of the
+top-1 pick for each configuration. The scoring features are extracted once from the
+readyForScoring.csv file and every configuration is scored with the columnar engine
+in scoringEngine.py, so thousands of configurations can be checked in one run.
+
+The labels file must contain the ID, company_number, and jurisdiction_code columns,
+where company_number and jurisdiction_code are the OC company the reviewers found to
+be correct for the ID. IDs with no correct OC company are included with an empty
+company_number. The parameters that can be tuned are listed in scoringTuning.py.
+
+The confidence scores are scaled with scaleMode, which takes the same values as in
+the scoring script. The acceptScore and the precision and recall of a configuration
+only describe scoring runs with the same scale mode. In the 'batch' mode, every
+candidate in the input file is scored with each configuration to find its range.
+
+"""
+
+### set the search type ('grid' or 'random'), the number of random configurations,
+### and the values to search for each parameter. Parameters that are not listed
+### keep their values from the state rules
+search = 'grid'
+nSamples = 1000
+seed = 0
+
+space = {
+    'nameLowCut': [85, 87, 89],
+    'nameHighCut': [90, 92, 95],
+    'nameBelowPoints': [-10, -7, -5],
+    'distanceNearMiles': [25, 50, 75],
+    'distanceMidMiles': [100, 150],
+    'distanceOutPoints': [-4, -2, 0],
+    'acceptScore': [1, 5, 7, 8, 9],
+}
+
+### the scale mode of the confidence scores, which should match the scaleMode of the
+### scoring script ('batch', 'fixed', or 'calibration')
+scaleMode = 'batch'
+
+### set the path for the input, labels, and output files and save to variables
+res_folder = "../csvResults/"
+input_file = "readyForScoring.csv"
+labels_file = "reviewedLabels.csv"
+output_file = "scoringTuningResults.csv"
+calibration_file = "scoreCalibration.json"
+
+input_directory=os.path.join(res_folder,input_file)
+labels_directory=os.path.join(res_folder,labels_file)
+output_directory=os.path.join(res_folder,output_file)
+calibration_directory=os.path.join(res_folder,calibration_file)
+
+
+### import the reviewed labels
+t0=time.time()
+
+labels=pd.read_csv(labels_directory,usecols=['ID','company_number','jurisdiction_code'],
+                   dtype={'company_number':str,'jurisdiction_code':str})
+labels.drop_duplicates(subset=['ID'],keep='first',inplace=True)
+
+### end timer and print total time
+t1=time.time()
+total=t1-t0
+print("Total time is %.3f" % (total/60), "mins\n")
+print("The number of labeled IDs are:",labels.ID.nunique())
+print("The number of labeled IDs with a correct company are:",labels.company_number.notnull().sum(),"\n")
+
+
+### the candidates of the labeled IDs are selected from the input file in chunks
+### and their scoring features are extracted once. In the 'batch' scale mode, the
+### unique feature rows of every candidate are also kept to find the batch range.
+### The candidates pruned by the Merge script can only be tuned in the 'fixed' scale
+### mode (see scoringEngine.checkPruning())
+t0=time.time()
+
+scoringEngine.checkPruning(pd.read_csv(input_directory,nrows=1),scaleMode)
+
+usecols=['ID','organization','nameScores','state','stateMatch','address_state','agent_state','city','cityMatch',
+         'address_city','agent_city','dateFiledMin','incorporation_date','record_date','dateDiff',
+         'company_number','jurisdiction_code']+scoringEngine.DISTANCE_COLUMNS
+
+candidates=[]
+rangeFeatures=[]
+
+for chunk in pd.read_csv(input_directory,usecols=usecols,chunksize=500000,
+                         dtype={'company_number':str,'jurisdiction_code':str}):
+    candidates.append(chunk.loc[chunk['ID'].isin(labels['ID'])])
+
+    if scaleMode == 'batch':
+        rangeFeatures.append(scoringEngine.candidateFeatures(chunk).drop_duplicates())
+
+candidates=pd.concat(candidates,axis=0).reset_index(drop=True)
+rangeFeatures=pd.concat(rangeFeatures,axis=0).drop_duplicates().reset_index(drop=True) if rangeFeatures else None
+
+calibration=scoringEngine.loadCalibration(calibration_directory)['state'] if scaleMode == 'calibration' else None
+
+features=scoringEngine.candidateFeatures(candidates)
+features['ID']=candidates['ID']
+features['record_date']=pd.to_datetime(candidates['record_date'],errors='coerce')
+
+### a candidate is correct if it is the company the reviewers chose for the ID
+candidates=candidates.merge(labels,on=['ID'],how='left',suffixes=('','_label'))
+correct=((candidates['company_number']==candidates['company_number_label']) &
+         (candidates['jurisdiction_code'].str.lower()==candidates['jurisdiction_code_label'].str.lower())).to_numpy()
+
+### the recall is measured against every labeled ID with a correct company, including
+### the IDs whose candidates were dropped before the readyForScoring.csv file
+nMatches=labels.company_number.notnull().sum()
+
+### end timer and print total time
+t1=time.time()
+total=t1-t0
+print("Total time is %.3f" % (total/60), "mins\n")
+print("The number of labeled candidates are:",len(features))
+print("The number of labeled IDs with candidates are:",features.ID.nunique(),"\n")
+
+print(features.info(),flush=True)
+print(features.head(),flush=True)
+
+
+### build the configurations and evaluate them against the labels
+t0=time.time()
+
+if search == 'grid':
+    configs=scoringTuning.parameterGrid(space)
+
+elif search == 'random':
+    configs=scoringTuning.parameterSample(space,nSamples,seed)
+
+results=scoringTuning.evaluateConfigurations(features,correct,nMatches,configs,scaleMode,rangeFeatures,calibration)
+results.sort_values(by=['f1','precision'],ascending=[False,False],inplace=True)
+
+### end timer and print total time
+t1=time.time()
+total=t1-t0
+print("Total time is %.3f" % (total/60), "mins\n")
+print("The number of configurations evaluated are:",len(results))
+print("The scale mode is:",scaleMode,"- the acceptScore values only apply to scoring runs with this scale mode\n")
+
+print(results.head(20),flush=True)
+
+results.to_csv(output_directory,index=False)
+os.chmod(output_directory,0o777)
@@ -0,0 +1,64 @@
+import pandas as pd
+import numpy as np
+
+"""
+Author: Joshua Chu
+Date: October 18, 2026
+
+Description: this module splits the OC output of the 'Merge OpenCorporate Results with
+Input Data and Clean for Scoring.py' script into a company dimension and the candidate
+rows that refer to it. The same OC company (company_number and jurisdiction_code) is
+returned as a candidate for many IDs and in more than one output file, and each copy
+carries the same name, alternative and previous names, data field, and addresses.
+The company dimension holds these fields once per unique company, so the names and
+addresses are cleaned and decoded once per company and joined back to the (ID,
+match_num) candidate rows with the company_id column.
+
+"""
+
+### the columns identifying an OC company
+COMPANY_KEYS = ['company_number', 'jurisdiction_code']
+
+### the columns of the candidate rows
+CANDIDATE_COLUMNS = ['ID', 'assignee_id', 'match_num']
+
+### the fields of the OC output that describe the company rather than the candidate
+COMPANY_COLUMNS = ['name', 'incorporation_date', 'alternative_names', 'previous_names', 'data', 'address_city',
+                   'address_state', 'address_zipcode', 'agent_city', 'agent_state', 'agent_zipcode']
+
+
+def companyIds(records):
+    """Return the company_id of each record, numbered in order of first appearance.
+
+    The records without a company_number or jurisdiction_code cannot be matched to
+    another record, so each of them is given its own company_id.
+    """
+
+    ids = records.groupby(COMPANY_KEYS, sort=False).ngroup().fillna(-1).to_numpy(dtype=np.int64)
+
+    missing = records[COMPANY_KEYS].isnull().any(axis=1).to_numpy()
+    ids[missing] = ids.max(initial=-1) + 1 + np.arange(missing.sum())
+
+    return pd.Series(ids, index=records.index, name='company_id')
+
+
+def splitCompanies(records):
+    """Split the OC records into the company dimension and the candidate rows.
+
+    The company dimension has one row per company_id with the company keys and the
+    COMPANY_COLUMNS of the first record of the company. The candidate rows have the
+    ID, assignee_id, match_num, and company_id of each record.
+    """
+
+    records = records.assign(company_id=companyIds(records))
+
+    companies = records.drop_duplicates(subset=['company_id'])[['company_id']+COMPANY_KEYS+COMPANY_COLUMNS]
+    candidates = records[CANDIDATE_COLUMNS+['company_id']]
+
+    return companies.reset_index(drop=True), candidates.reset_index(drop=True)
+
+
+def joinCompanies(candidates, companies, columns):
+    """Return the candidate rows with the given columns of their company."""
+
+    return candidates.merge(companies[['company_id']+list(columns)], on='company_id', how='left', sort=False)
@@ -0,0 +1,760 @@
+import pandas as pd
+import numpy as np
+import re
+import os
+import ast
+import fcntl
+import nameNormalizer
+from geopy.distance import geodesic
+from rapidfuzz import fuzz
+from rapidfuzz import process
+from rapidfuzz import utils
+
+"""
+Author: Joshua Chu
+Date: October 18, 2026
+
+Description: this module holds the location steps of the 'Merge OpenCorporate Results
+with Input Data and Clean for Scoring.py' script. The data field of the OC output holds
+the most recent data items of the company (addresses, websites, telephone numbers,
+etc.) written as a string. addressTable() decodes each unique field once and returns a
+child table with one row per company address, where the description of the address
+is split into its city, state, and zip code. The PatentsView cities and states are
+then looked up in the addresses of their OC company with a single join instead of
+searching the strings of every record.
+
+coordinateTable() builds the (city, state) to (latitude, longitude) lookup from the
+location_suppLatLong1.tsv file with exactly one row per city and state, and
+attachCoordinates() adds the coordinates of the matched, address, and agent cities
+of every record with one integer lookup, so the records are never duplicated by the
+repeated keys of the file. The cities that are not in the table (e.g., misspelled or
+abbreviated cities) can be given the coordinates of the most similar city of the
+same state instead. cityIndex() groups the cities of the table by state once, and
+each unique city and state that is missing is compared by rapidfuzz to the cities
+of its state only, so the whole table is never searched. The fuzz.ratio score of the
+city that was used is kept with the coordinates as their confidence.
+
+The OC address and agent zip codes can also be geocoded before their cities.
+zipIndex() builds the coordinates of each ZIP5 code from the zipcitystatelatlon.csv
+file into two arrays indexed by the code itself, which are kept in a compressed
+numpy file and rebuilt only when the zip file changes, so each zip code is looked up
+by its integer value without any merge. The zip codes also give coordinates to the
+OC records whose cities are misspelled.
+
+resolveLocations() builds all of the location matches of the records (the city and
+state matches against the address, agent, and data field, and the state of the
+jurisdiction code when no state matches) with column operations that select the
+columns by name.
+
+distanceMiles() calculates the distances between the PatentsView and OC coordinates
+for whole columns at once. The 'ellipsoid' mode solves the inverse problem on the
+WGS-84 ellipsoid with Vincenty's formulae, which agree with geopy's geodesic to well
+within 0.1 mile, and the 'haversine' mode uses a sphere with the mean earth radius,
+which is faster and within about 0.5% of the ellipsoid distance. Missing or invalid
+coordinates give a NaN distance.
+
+pairDistances() calculates each unique pair of coordinates once, as most of the
+records compare the same few thousand pairs of PatentsView and OC cities. The
+coordinates are rounded to DISTANCE_DECIMALS places (about 1 centimeter), which
+are the keys of the pairs. When a cache file is set with useDistanceCache(), the
+distances are also kept in a compressed numpy file, which is read once per run and
+held in memory, and the new pairs are written once by saveDistanceCache() at the
+end of the run. Each distance mode is kept in its own file, named after the cache
+path with the mode added before the extension (e.g., locationPairDistances.haversine.npz),
+so the modes do not replace each other's pairs. The file is merged with the pairs of
+other runs under a lock and replaced in a single rename, and it is tagged with the
+kernel version, so it is not read after the kernel changes. The vectorized kernel calculates
+millions of pairs in a few seconds, so the cache is off by default and is only
+worth turning on when reading the file is faster than calculating the pairs. The
+share of the unique pairs read from the cache is kept in distanceStats.
+
+"""
+
+### the data type of the address items in the data field
+ADDRESS_DATA_TYPE = 'CompanyAddress'
+
+### the pattern used to find the descriptions in fields that cannot be decoded (e.g., a
+### field that was cut off)
+DESCRIPTION_PATTERN = re.compile(r"""'description': (?:'((?:[^'\\]|\\.)*)'|"((?:[^"\\]|\\.)*)")""")
+
+### the zip codes at the end of the addresses (e.g., 55343, 55343-1234, or 553431234)
+ZIP_CODE = re.compile(r'^\d{5}(?:-?\d{4})?$')
+
+### the countries at the end of some addresses, which are removed before the zip code
+COUNTRY_PARTS = frozenset(['Us', 'Usa', 'United States', 'United States Of America'])
+
+### the columns identifying an OC company in the address table (see companyDimension.py)
+ADDRESS_KEYS = ['company_id']
+
+### the city and state columns of the records that are given coordinates, and the
+### suffix of their latitude and longitude columns
+COORDINATE_PAIRS = (
+    ('cityMatch', 'stateMatch', 'match'),
+    ('address_city', 'address_state', 'add'),
+    ('agent_city', 'agent_state', 'agt'),
+)
+
+### the lowest fuzz.ratio score of a city of the same state whose coordinates are used
+### for a city that is not in the coordinate table
+FUZZY_CITY_CUTOFF = 90
+
+### the number of missing cities compared to the cities of their state at once
+FUZZY_CITY_BATCH = 2000
+
+### the zip code columns of the records that are geocoded before their city and state,
+### by the suffix of their coordinate columns
+ZIP_COLUMNS = {'add': 'address_zipcode', 'agt': 'agent_zipcode'}
+
+### the number of ZIP5 codes, which are the positions in the zip index
+ZIP5_CODES = 100000
+
+### the zip codes of the OC output, which are sometimes written as numbers (e.g.,
+### 55343.0, 553431234, or 2139 for 02139)
+ZIP5_TEXT = re.compile(r'^(\d{5})(?:-?\d{4})?$')
+
+### the distance modes of distanceMiles()
+DISTANCE_MODES = ('ellipsoid', 'haversine')
+
+### the WGS-84 ellipsoid used by geopy's geodesic (semi-major axis in meters and
+### flattening), the mean earth radius in meters, and the meters per mile
+WGS84_AXIS = 6378137.0
+WGS84_FLATTENING = 1/298.257223563
+MEAN_RADIUS = 6371008.8
+METERS_PER_MILE = 1609.344
+
+### the convergence tolerance (radians) and the iteration limit of Vincenty's formulae
+VINCENTY_TOLERANCE = 1e-12
+VINCENTY_ITERATIONS = 200
+
+### the decimal places the coordinates are rounded to before the pairs are compared
+DISTANCE_DECIMALS = 7
+
+### the version of the distance kernel. It is part of the cache tag, so the cached
+### distances are no longer read when the way the distances are calculated changes
+DISTANCE_VERSION = 'vincenty-1'
+
+### the columns of the coordinate pairs in the distance cache
+PAIR_COLUMNS = ['lat1', 'lon1', 'lat2', 'lon2']
+
+### the number of distances calculated, the number of unique coordinate pairs, and
+### the number of unique pairs read from the cache
+distanceStats = {'pairs': 0, 'unique': 0, 'cached': 0}
+
+### the path to the distance cache file, which is set with useDistanceCache()
+distanceCacheFile = None
+
+### the cached pairs of each distance mode that were read from the file or
+### calculated during this run, and the pairs that are not yet in the file
+_distanceCache = {}
+_newDistances = {}
+
+
+def addressDescriptions(field):
+    """Decode a data field and return the descriptions of its company addresses."""
+
+    if not isinstance(field, str):
+        return []
+
+    try:
+        data = ast.literal_eval(field)
+
+    except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+        return [single or double for single, double in DESCRIPTION_PATTERN.findall(field)]
+
+    if not isinstance(data, dict) or not isinstance(data.get('most_recent'), list):
+        return []
+
+    descriptions = []
+    for item in data['most_recent']:
+        datum = item.get('datum') if isinstance(item, dict) else None
+
+        if isinstance(datum, dict) and datum.get('data_type') == ADDRESS_DATA_TYPE \
+                and isinstance(datum.get('description'), str):
+            descriptions.append(datum['description'])
+
+    return descriptions
+
+
+def addressParts(description):
+    """Split an address description into its city, state, and zip code.
+
+    The parts of the description are separated by commas and end with the city,
+    state, zip code, and sometimes the country (e.g., '150 Maple Hill Road, Hopkins,
+    MN, 55343'). The zip code is NaN when it is missing, and None is returned for
+    descriptions without at least a city and state.
+    """
+
+    parts = [part.strip() for part in re.sub(r'\s+', ' ', description).split(',')]
+    parts = [part for part in parts if part]
+
+    if parts and parts[-1].title() in COUNTRY_PARTS:
+        parts.pop()
+
+    zipCode = parts.pop() if parts and ZIP_CODE.match(parts[-1]) else np.nan
+
+    if len(parts) < 2:
+        return None
+
+    return parts[-2], parts[-1], zipCode
+
+
+def addressTable(records, skip=None):
+    """Decode the data fields of the OC companies into a table with one row per address.
+
+    The table has the company_id, city, state, and zip columns. Each company is
+    decoded once, however many rows it has in records, and each unique field is only
+    decoded once. The cities and states are converted to title case and the cities
+    are cleaned with the CITY_RULES in nameNormalizer.py, as the PatentsView cities
+    are. The rows where skip is True are not decoded.
+    """
+
+    if skip is not None:
+        records = records.loc[~np.asarray(skip, dtype=bool)]
+
+    fields = records[ADDRESS_KEYS+['data']].drop_duplicates(subset=ADDRESS_KEYS)
+    codes, uniques = pd.factorize(fields['data'])
+
+    ### the missing fields have a code of -1, which selects the empty list at the end
+    decoded = [[parts for parts in map(addressParts, addressDescriptions(field)) if parts is not None]
+               for field in uniques] + [[]]
+    lengths = np.array([len(addresses) for addresses in decoded], dtype=np.int64)[codes]
+
+    table = fields[ADDRESS_KEYS].iloc[np.repeat(np.arange(len(fields)), lengths)].reset_index(drop=True)
+    parts = pd.DataFrame([address for code in codes for address in decoded[code]],
+                         columns=['city', 'state', 'zip'], dtype=object)
+
+    table['city'] = nameNormalizer.normalizeNames(parts['city'], nameNormalizer.TITLE_RULES+nameNormalizer.CITY_RULES)
+    table['state'] = nameNormalizer.normalizeNames(parts['state'], nameNormalizer.TITLE_RULES)
+    table['zip'] = parts['zip']
+
+    return table
+
+
+def addressMatches(records, addresses, column):
+    """Return the PatentsView city or state of each record when it is the city or state
+    of one of the addresses of its OC company, and an empty string otherwise."""
+
+    found = addresses[ADDRESS_KEYS+[column]].drop_duplicates()
+    found = found.loc[found[column].notnull()].assign(found=True)
+
+    matched = records[ADDRESS_KEYS+[column]].merge(found, on=ADDRESS_KEYS+[column], how='left')
+    matched = matched['found'].fillna(False).to_numpy(dtype=bool)
+
+    return pd.Series(np.where(matched, records[column], ''), index=records.index, name='data_'+column)
+
+
+def resolveLocations(records, addresses):
+    """Return the location matches of the records.
+
+    The addresses are the table of the OC companies from addressTable(). The matches
+    are the columns below, built with one comparison per column instead of a loop
+    over the records:
+
+    cityMatches and stateMatches: 1 when the PatentsView city or state is the address
+    or agent city or state of the OC company, and 0 otherwise.
+
+    data_city and data_state: the PatentsView city or state when it is the city or
+    state of one of the addresses in the data field, and an empty string otherwise.
+
+    cityMatch and stateMatch: the PatentsView city or state when it matches the
+    address, agent, or data field, and an empty string otherwise. A stateMatch that
+    is still empty is filled with the state in the jurisdiction code (e.g., Us_Ca).
+    """
+
+    cityMatches = (records['city'] == records['address_city']) | (records['city'] == records['agent_city'])
+    stateMatches = (records['state'] == records['address_state']) | (records['state'] == records['agent_state'])
+
+    locations = pd.DataFrame({'cityMatches': cityMatches.astype(int), 'stateMatches': stateMatches.astype(int),
+                              'data_city': addressMatches(records, addresses, 'city'),
+                              'data_state': addressMatches(records, addresses, 'state')}, index=records.index)
+
+    locations['cityMatch'] = records['city'].where(cityMatches | (records['city'] == locations['data_city']), '')
+    locations['stateMatch'] = records['state'].where(stateMatches | (records['state'] == locations['data_state']), '')
+
+    empty = locations['stateMatch'] == ''
+    locations.loc[empty, 'stateMatch'] = records.loc[empty, 'jurisdiction_code'].str[3:]
+
+    return locations
+
+
+def coordinateTable(locations):
+    """Return the coordinate lookup with one row per city and state.
+
+    The locations have the city, state, latitude, and longitude columns. The rows
+    with a missing city, state, or coordinate, or with a latitude outside -90 to 90
+    or a longitude outside -180 to 180, are dropped, and the first row of each city
+    and state is kept. The position of a row in the table is the integer key of its
+    city and state. The number of repeated keys, and of repeated keys with other
+    coordinates than the kept row, are returned with the table.
+    """
+
+    table = locations[['city', 'state']].copy()
+    table['latitude'] = pd.to_numeric(locations['latitude'], errors='coerce')
+    table['longitude'] = pd.to_numeric(locations['longitude'], errors='coerce')
+
+    valid = table.notnull().all(axis=1) & table['latitude'].between(-90, 90) & table['longitude'].between(-180, 180)
+    table = table.loc[valid]
+
+    repeated = table.duplicated(subset=['city', 'state'])
+    conflicts = int((repeated & ~table.duplicated()).sum())
+
+    table = table.loc[~repeated].reset_index(drop=True)
+
+    return table, int(repeated.sum()), conflicts
+
+
+def coordinateIds(cities, states, table):
+    """Return the integer key of each city and state in the coordinate table, which is
+    -1 when the city and state are not in the table."""
+
+    index = pd.MultiIndex.from_frame(table[['city', 'state']])
+
+    return index.get_indexer(pd.MultiIndex.from_arrays([np.asarray(cities, dtype=object),
+                                                        np.asarray(states, dtype=object)]))
+
+
+def cityIndex(table):
+    """Return the cities of the coordinate table grouped by state.
+
+    The index maps each state to the list of its cities, processed as they are
+    compared by fuzzyCoordinateIds(), and the array of their integer keys.
+    """
+
+    index = {}
+    for state, group in table.groupby('state', sort=False):
+        index[state] = ([utils.default_process(city) for city in group['city']], group.index.to_numpy())
+
+    return index
+
+
+def fuzzyCoordinateIds(cities, states, index, cutoff=FUZZY_CITY_CUTOFF, workers=-1):
+    """Return the integer key of the most similar city of the same state for each city
+    and state, and its fuzz.ratio score.
+
+    The cities are compared after removing the characters that are not letters or
+    numbers and converting to lowercase. Each unique city and state is compared once
+    to the cities of its state in the index from cityIndex(). The scores are kept
+    as floats, so a score just below 100 is not rounded up. The key is -1 and the
+    score is NaN when no city of the state has a score of at least cutoff.
+    """
+
+    pairs = pd.DataFrame({'city': np.asarray(cities, dtype=object), 'state': np.asarray(states, dtype=object)})
+    codes = pairs.groupby(['city', 'state'], sort=False, dropna=False).ngroup().to_numpy()
+    uniques = pairs.drop_duplicates().reset_index(drop=True)
+
+    ids = np.full(len(uniques), -1, dtype=np.int64)
+    scores = np.full(len(uniques), np.nan)
+
+    for state, group in uniques.groupby('state', sort=False):
+        if state not in index:
+            continue
+
+        choices, keys = index[state]
+        rows = group.index.to_numpy()
+        queries = [utils.default_process(city) if isinstance(city, str) else '' for city in group['city']]
+
+        for start in range(0, len(rows), FUZZY_CITY_BATCH):
+            matrix = process.cdist(queries[start:start+FUZZY_CITY_BATCH], choices, scorer=fuzz.ratio,
+                                   score_cutoff=cutoff, dtype=np.float32, workers=workers)
+
+            best = matrix.argmax(axis=1)
+            score = matrix[np.arange(len(best)), best]
+            found = (score >= cutoff) & (score > 0)
+
+            batch = rows[start:start+FUZZY_CITY_BATCH]
+            ids[batch[found]] = keys[best[found]]
+            scores[batch[found]] = score[found]
+
+    return ids[codes], scores[codes]
+
+
+def zipCodes(values):
+    """Return the ZIP5 code of each zip code as an integer, which is -1 for the missing
+    and invalid zip codes.
+
+    The zip codes can be text (e.g., '55343', '55343-1234', or '553431234') or
+    numbers, where the leading zeros of a ZIP5 code were lost (e.g., 2139.0 for 02139)
+    and a ZIP+4 code has nine digits.
+    """
+
+    values = pd.Series(np.asarray(values, dtype=object).ravel())
+    codes = np.full(len(values), -1, dtype=np.int64)
+
+    ### the numbers are converted to the digits of their ZIP5 or ZIP+4 code
+    numbers = pd.to_numeric(values, errors='coerce').to_numpy(dtype=np.float64)
+    whole = np.isfinite(numbers) & (numbers >= 0) & (numbers == np.floor(numbers)) & (numbers < 10**9)
+    text = np.where(whole, pd.Series(np.where(whole, numbers, 0)).astype(np.int64).astype(str).str.zfill(5), '')
+    text = np.where(whole & (numbers >= ZIP5_CODES), pd.Series(text).str.zfill(9), text)
+
+    ### the remaining values are read as text
+    other = ~whole & values.map(lambda value: isinstance(value, str)).to_numpy()
+    text[other] = values[other].str.strip()
+
+    matched = pd.Series(text).str.extract(ZIP5_TEXT, expand=False)
+    valid = matched.notnull().to_numpy()
+    codes[valid] = matched[valid].astype(np.int64).to_numpy()
+
+    return codes
+
+
+def zipIndex(path, indexPath=None):
+    """Return the latitudes and longitudes of the ZIP5 codes, indexed by the code.
+
+    The zip file at path has the zip code, city, state, latitude, and longitude in
+    its first five columns. The first valid row of each zip code is kept, and the
+    codes without a row have NaN coordinates. When indexPath is given, the arrays are
+    kept in a compressed numpy file there and are only rebuilt from the zip file
+    when it is newer than the index.
+    """
+
+    if indexPath is not None and os.path.exists(indexPath) and os.path.getmtime(indexPath) >= os.path.getmtime(path):
+        with np.load(indexPath, allow_pickle=False) as index:
+            return index['latitude'], index['longitude']
+
+    zips = pd.read_csv(path, usecols=[0, 3, 4], dtype=str)
+    zips.columns = ['zip', 'latitude', 'longitude']
+
+    codes = zipCodes(zips['zip'])
+    latitude = pd.to_numeric(zips['latitude'], errors='coerce').to_numpy(dtype=np.float64)
+    longitude = pd.to_numeric(zips['longitude'], errors='coerce').to_numpy(dtype=np.float64)
+
+    valid = (codes >= 0) & (np.abs(latitude) <= 90) & (np.abs(longitude) <= 180)
+    codes, latitude, longitude = codes[valid], latitude[valid], longitude[valid]
+
+    ### the arrays are filled from the last row to the first, so the first row of each
+    ### zip code is kept
+    latitudes = np.full(ZIP5_CODES, np.nan)
+    longitudes = np.full(ZIP5_CODES, np.nan)
+    latitudes[codes[::-1]] = latitude[::-1]
+    longitudes[codes[::-1]] = longitude[::-1]
+
+    if indexPath is not None:
+        temp = '%s.%d.tmp.npz' % (indexPath, os.getpid())
+        np.savez_compressed(temp, latitude=latitudes, longitude=longitudes)
+        os.replace(temp, indexPath)
+
+    return latitudes, longitudes
+
+
+def attachCoordinates(records, table, pairs=COORDINATE_PAIRS, index=None, cutoff=FUZZY_CITY_CUTOFF, zips=None):
+    """Return the records with the latitude and longitude of each city and state pair.
+
+    Each pair of city and state columns in pairs is given the latitude_<suffix> and
+    longitude_<suffix> columns, placed after its state column. The coordinates are
+    NaN when the city and state are not in the coordinate table from coordinateTable().
+    The records keep their rows and order.
+
+    When the index from cityIndex() is given, the cities that are not in the table
+    are given the coordinates of the most similar city of the same state with a
+    fuzz.ratio score of at least cutoff (see fuzzyCoordinateIds()). The missing
+    cities of all of the pairs are searched at once, and each pair is also given a
+    geocodeScore_<suffix> column after its coordinates, which is 100 for the cities
+    found in the table, the score of the similar city for the cities found by the
+    search, and NaN for the cities without coordinates. The geocodeFuzzy_<suffix>
+    column after it is True for the coordinates found by the search, since a city
+    that only differs in case or punctuation also has a score of 100.
+
+    When the zip index from zipIndex() is given, the pairs with a zip code column in
+    ZIP_COLUMNS are first given the coordinates of their zip code, and only the
+    records whose zip code is missing or not in the index are geocoded by their city
+    and state. The geocodeScore of the coordinates from a zip code is 100.
+    """
+
+    latitudes = np.r_[table['latitude'].to_numpy(dtype=np.float64), np.nan]
+    longitudes = np.r_[table['longitude'].to_numpy(dtype=np.float64), np.nan]
+
+    ### the zip code of each record in the zip index, which is -1 for the records that
+    ### are geocoded by their city and state
+    zipped = []
+    for _, _, suffix in pairs:
+        codes = np.full(len(records), -1, dtype=np.int64)
+
+        if zips is not None and ZIP_COLUMNS.get(suffix) in records.columns:
+            codes = zipCodes(records[ZIP_COLUMNS[suffix]])
+            codes[np.isnan(zips[0][np.maximum(codes, 0)])] = -1
+
+        zipped.append(codes)
+
+    ids = [np.where(codes >= 0, -1, coordinateIds(records[city], records[state], table))
+           for codes, (city, state, _) in zip(zipped, pairs)]
+    scores = [np.where((pairIds >= 0) | (codes >= 0), 100.0, np.nan) for pairIds, codes in zip(ids, zipped)]
+    fuzzy = [np.zeros(len(records), dtype=bool) for pairIds in ids]
+
+    if index is not None:
+        missing = [np.flatnonzero((pairIds < 0) & (codes < 0) & records[city].notnull().to_numpy()
+                                  & (records[city] != '').to_numpy())
+                   for pairIds, codes, (city, _, _) in zip(ids, zipped, pairs)]
+
+        fuzzyIds, fuzzyScores = fuzzyCoordinateIds(
+            np.concatenate([records[city].to_numpy()[rows] for rows, (city, _, _) in zip(missing, pairs)]),
+            np.concatenate([records[state].to_numpy()[rows] for rows, (_, state, _) in zip(missing, pairs)]),
+            index, cutoff=cutoff)
+
+        start = 0
+        for pairIds, pairScores, pairFuzzy, rows in zip(ids, scores, fuzzy, missing):
+            pairIds[rows] = fuzzyIds[start:start+len(rows)]
+            pairScores[rows] = fuzzyScores[start:start+len(rows)]
+            pairFuzzy[rows] = fuzzyIds[start:start+len(rows)] >= 0
+            start += len(rows)
+
+    records = records.copy()
+    for (city, state, suffix), pairIds, pairScores, pairFuzzy, codes in zip(pairs, ids, scores, fuzzy, zipped):
+        pairLatitudes = latitudes[pairIds]
+        pairLongitudes = longitudes[pairIds]
+
+        found = codes >= 0
+        if found.any():
+            pairLatitudes[found] = zips[0][codes[found]]
+            pairLongitudes[found] = zips[1][codes[found]]
+
+        position = records.columns.get_loc(state) + 1
+        records.insert(position, 'latitude_'+suffix, pairLatitudes)
+        records.insert(position+1, 'longitude_'+suffix, pairLongitudes)
+
+        if index is not None:
+            records.insert(position+2, 'geocodeScore_'+suffix, pairScores)
+            records.insert(position+3, 'geocodeFuzzy_'+suffix, pairFuzzy)
+
+    return records
+
+
+def _haversineMeters(lat1, lon1, lat2, lon2):
+    """Return the great circle distances in meters between radian coordinates."""
+
+    h = np.sin((lat2-lat1)/2)**2 + np.cos(lat1)*np.cos(lat2)*np.sin((lon2-lon1)/2)**2
+
+    return 2*MEAN_RADIUS*np.arcsin(np.sqrt(np.minimum(h, 1)))
+
+
+def _vincentyTerms(lam, sinU1, cosU1, sinU2, cosU2):
+    """Return the terms of Vincenty's formulae for the longitude differences lam on
+    the auxiliary sphere."""
+
+    sinLam, cosLam = np.sin(lam), np.cos(lam)
+    sinSigma = np.hypot(cosU2*sinLam, cosU1*sinU2 - sinU1*cosU2*cosLam)
+    cosSigma = sinU1*sinU2 + cosU1*cosU2*cosLam
+    sigma = np.arctan2(sinSigma, cosSigma)
+
+    ### coincident points have a sinSigma of 0 and points on the equator have a
+    ### cosSqAlpha of 0
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sinAlpha = np.where(sinSigma == 0, 0, cosU1*cosU2*sinLam/sinSigma)
+        cosSqAlpha = 1 - sinAlpha**2
+        cos2SigmaM = np.where(cosSqAlpha == 0, 0, cosSigma - 2*sinU1*sinU2/cosSqAlpha)
+
+    return sinSigma, cosSigma, sigma, sinAlpha, cosSqAlpha, cos2SigmaM
+
+
+def _vincentyMeters(lat1, lon1, lat2, lon2):
+    """Return the WGS-84 distances in meters between radian coordinates and a boolean
+    array that is False for the pairs where Vincenty's formulae did not converge
+    (nearly antipodal points)."""
+
+    a, f = WGS84_AXIS, WGS84_FLATTENING
+    b = a*(1 - f)
+
+    L = lon2 - lon1
+    U1 = np.arctan((1 - f)*np.tan(lat1))
+    U2 = np.arctan((1 - f)*np.tan(lat2))
+    sinU1, cosU1, sinU2, cosU2 = np.sin(U1), np.cos(U1), np.sin(U2), np.cos(U2)
+
+    ### lam is iterated until it converges, and only the pairs that have not converged
+    ### are updated in each iteration
+    lam = L.copy()
+    active = np.arange(len(L))
+
+    for _ in range(VINCENTY_ITERATIONS):
+        terms = _vincentyTerms(lam[active], sinU1[active], cosU1[active], sinU2[active], cosU2[active])
+        sinSigma, cosSigma, sigma, sinAlpha, cosSqAlpha, cos2SigmaM = terms
+
+        C = f/16*cosSqAlpha*(4 + f*(4 - 3*cosSqAlpha))
+        previous = lam[active]
+        lam[active] = L[active] + (1 - C)*f*sinAlpha*(sigma + C*sinSigma*(cos2SigmaM + C*cosSigma*
+                                                                           (-1 + 2*cos2SigmaM**2)))
+
+        active = active[np.abs(lam[active] - previous) > VINCENTY_TOLERANCE]
+        if not len(active):
+            break
+
+    converged = np.ones(len(L), dtype=bool)
+    converged[active] = False
+
+    sinSigma, cosSigma, sigma, sinAlpha, cosSqAlpha, cos2SigmaM = _vincentyTerms(lam, sinU1, cosU1, sinU2, cosU2)
+
+    uSq = cosSqAlpha*(a**2 - b**2)/b**2
+    A = 1 + uSq/16384*(4096 + uSq*(-768 + uSq*(320 - 175*uSq)))
+    B = uSq/1024*(256 + uSq*(-128 + uSq*(74 - 47*uSq)))
+    deltaSigma = B*sinSigma*(cos2SigmaM + B/4*(cosSigma*(-1 + 2*cos2SigmaM**2) -
+                                               B/6*cos2SigmaM*(-3 + 4*sinSigma**2)*(-3 + 4*cos2SigmaM**2)))
+
+    return b*A*(sigma - deltaSigma), converged
+
+
+def distanceMiles(lat1, lon1, lat2, lon2, mode='ellipsoid'):
+    """Return the distances in miles between two sets of coordinates in degrees.
+
+    The mode is 'ellipsoid' (Vincenty's formulae on the WGS-84 ellipsoid, as geopy's
+    geodesic) or 'haversine' (a sphere with the mean earth radius). The pairs with a
+    missing coordinate or a latitude outside -90 to 90 have a NaN distance. In the
+    'ellipsoid' mode, the few nearly antipodal pairs where Vincenty's formulae do not
+    converge are calculated with geodesic.
+    """
+
+    if mode not in DISTANCE_MODES:
+        raise ValueError('mode must be one of %s' % (DISTANCE_MODES,))
+
+    coordinates = [pd.to_numeric(pd.Series(np.asarray(values).ravel()), errors='coerce').to_numpy(dtype=np.float64)
+                   for values in (lat1, lon1, lat2, lon2)]
+    lat1, lon1, lat2, lon2 = coordinates
+
+    valid = np.isfinite(np.column_stack(coordinates)).all(axis=1) & (np.abs(lat1) <= 90) & (np.abs(lat2) <= 90)
+    miles = np.full(len(valid), np.nan)
+
+    if not valid.any():
+        return miles
+
+    lat1, lon1, lat2, lon2 = [np.radians(values[valid]) for values in coordinates]
+
+    if mode == 'haversine':
+        miles[valid] = _haversineMeters(lat1, lon1, lat2, lon2)/METERS_PER_MILE
+
+    else:
+        meters, converged = _vincentyMeters(lat1, lon1, lat2, lon2)
+        miles[valid] = meters/METERS_PER_MILE
+
+        for p in np.flatnonzero(valid)[~converged]:
+            miles[p] = geodesic((coordinates[0][p], coordinates[1][p]), (coordinates[2][p], coordinates[3][p])).miles
+
+    return miles
+
+
+def useDistanceCache(path):
+    """Keep the pair distances in the numpy file at path (None turns the cache off)."""
+
+    global distanceCacheFile
+    distanceCacheFile = path
+    _distanceCache.clear()
+    _newDistances.clear()
+
+
+def distanceHitRate():
+    """Return the share of the unique coordinate pairs so far that were read from the
+    cache."""
+
+    if not distanceStats['unique']:
+        return 0.0
+
+    return distanceStats['cached']/distanceStats['unique']
+
+
+def distanceCachePath(path, mode):
+    """Return the path of the cache file that holds the pairs of a distance mode."""
+
+    root, extension = os.path.splitext(path)
+
+    return '%s.%s%s' % (root, mode, extension or '.npz')
+
+
+def loadDistanceCache(path, mode):
+    """Load the cached coordinate pairs and distances of a distance mode, which are
+    empty when the file does not exist or was made with another kernel version."""
+
+    path = distanceCachePath(path, mode)
+
+    if os.path.exists(path):
+        with np.load(path, allow_pickle=False) as cache:
+            if str(cache['tag']) == '%s-%s' % (DISTANCE_VERSION, mode):
+                return pd.DataFrame({column: cache[column] for column in PAIR_COLUMNS+['miles']})
+
+    return pd.DataFrame({column: np.empty(0, dtype=np.int64) for column in PAIR_COLUMNS}).assign(miles=np.nan)
+
+
+def _writeDistanceCache(path, mode, cache):
+    """Write the cached coordinate pairs and distances of a distance mode, replacing its
+    file in one rename."""
+
+    path = distanceCachePath(path, mode)
+    temp = '%s.%d.tmp.npz' % (path, os.getpid())
+
+    np.savez_compressed(temp, tag='%s-%s' % (DISTANCE_VERSION, mode), miles=cache['miles'].to_numpy(),
+                        **{column: cache[column].to_numpy(dtype=np.int64) for column in PAIR_COLUMNS})
+    os.replace(temp, path)
+
+
+def saveDistanceCache():
+    """Add the pairs calculated during this run to the cache file.
+
+    The file of each distance mode is read again under an exclusive lock and merged
+    with the new pairs, so the pairs added by other runs since this run read the
+    file are kept.
+    """
+
+    if distanceCacheFile is None:
+        return
+
+    for mode, frames in _newDistances.items():
+        if not frames:
+            continue
+
+        with open(distanceCachePath(distanceCacheFile, mode) + '.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+
+            cache = pd.concat([loadDistanceCache(distanceCacheFile, mode)] + frames, ignore_index=True)
+            _writeDistanceCache(distanceCacheFile, mode, cache.drop_duplicates(subset=PAIR_COLUMNS))
+
+    _newDistances.clear()
+
+
+def pairDistances(lat1, lon1, lat2, lon2, mode='ellipsoid'):
+    """Return the distances in miles between two sets of coordinates in degrees,
+    calculating each unique pair of rounded coordinates once.
+
+    The distances are the same as distanceMiles() of the coordinates rounded to
+    DISTANCE_DECIMALS places. The pairs with a missing or invalid coordinate have a
+    NaN distance and are not cached.
+    """
+
+    coordinates = [pd.to_numeric(pd.Series(np.asarray(values).ravel()), errors='coerce').to_numpy(dtype=np.float64)
+                   for values in (lat1, lon1, lat2, lon2)]
+
+    valid = np.isfinite(np.column_stack(coordinates)).all(axis=1) & (np.abs(coordinates[0]) <= 90) \
+        & (np.abs(coordinates[2]) <= 90)
+    miles = np.full(len(valid), np.nan)
+
+    ### the rounded coordinates are kept as integers, so the pairs are compared exactly
+    keys = pd.DataFrame({column: np.round(values[valid]*10**DISTANCE_DECIMALS).astype(np.int64)
+                         for column, values in zip(PAIR_COLUMNS, coordinates)})
+    codes = keys.groupby(PAIR_COLUMNS, sort=False).ngroup().to_numpy()
+    pairs = keys.drop_duplicates().reset_index(drop=True)
+
+    found = np.zeros(len(pairs), dtype=bool)
+    pairs['miles'] = np.nan
+
+    if distanceCacheFile is not None:
+        if mode not in _distanceCache:
+            _distanceCache[mode] = loadDistanceCache(distanceCacheFile, mode)
+
+        cache = _distanceCache[mode]
+        cached = pairs[PAIR_COLUMNS].merge(cache, on=PAIR_COLUMNS, how='left')['miles'].to_numpy()
+
+        found = ~np.isnan(cached)
+        pairs['miles'] = cached
+
+    ### the pairs that are not in the cache are calculated and kept in memory until
+    ### saveDistanceCache() adds them to the file
+    missing = np.flatnonzero(~found)
+    if len(missing):
+        degrees = [pairs[column].to_numpy()[missing]/10**DISTANCE_DECIMALS for column in PAIR_COLUMNS]
+        pairs.loc[missing, 'miles'] = distanceMiles(*degrees, mode=mode)
+
+        if distanceCacheFile is not None:
+            _distanceCache[mode] = pd.concat([cache, pairs.loc[missing]], ignore_index=True)
+            _newDistances.setdefault(mode, []).append(pairs.loc[missing])
+
+    miles[valid] = pairs['miles'].to_numpy()[codes]
+
+    distanceStats['pairs'] += len(codes)
+    distanceStats['unique'] += len(pairs)
+    distanceStats['cached'] += int(found.sum())
+
+    return miles
@@ -0,0 +1,419 @@
+import pandas as pd
+import numpy as np
+import re
+import os
+import ast
+import nameNormalizer
+import tokenWeights
+from rapidfuzz import fuzz
+from rapidfuzz import process
+
+"""
+Author: Joshua Chu
+Date: October 18, 2026
+
+Description: this module scores the PatentsView organization names against the OC
+names for the 'Merge OpenCorporate Results with Input Data and Clean for Scoring.py'
+script. The OC name, alternative names, and previous names of every record are
+flattened into a single table with one row per candidate name, and the ratios of all
+pairs are calculated at once by rapidfuzz, which runs in C++ across all cores. The
+scores are reduced to the best score and name of each record using the same rules as
+the previous loop over fuzzywuzzy's fuzz.ratio and process.extractOne.
+
+The scores are the same as fuzzywuzzy with python-Levenshtein installed: the ratio is
+the normalized Indel similarity times 100, rounded to the nearest integer. As with
+process.extractOne, the alternative and previous names are compared after removing
+all characters that are not letters or numbers and converting to lowercase, while the
+OC name is compared as is.
+
+The alternative_names and previous_names fields of the OC output hold lists of
+dictionaries written as strings. nameListTable() decodes each unique field once and
+returns a long table with one row per name, which is read by the scoring step instead
+of searching the strings with regular expressions.
+
+The names can also be scored with the weighted token scorer in tokenWeights.py, where
+generic tokens count less than the tokens that are particular to an organization.
+
+Each unique pair of compared names is only scored once. When a cache file is set
+with useCache(), the scores are also kept in a compressed numpy file and later runs
+only score the pairs they have not seen before. The pairs are looked up by two 64-bit
+hashes of the compared names, sorted so that all pairs are found with one binary
+search, and the file is tagged with the scorer version so it is not read after the
+scorer changes. The file is replaced in a single rename when new pairs are added, so
+other processes reading it at the same time see either the old or the new file. The
+share of the unique pairs read from the cache is kept in scoringStats.
+
+"""
+
+### the characters that are replaced with whitespace by fuzzywuzzy's full_process
+NON_WORD = re.compile(r'(?ui)\W')
+
+### the key of the company names in the alternative_names and previous_names fields,
+### and the pattern used to find the names in fields that cannot be decoded (e.g., a
+### field that was cut off)
+COMPANY_NAME_KEY = 'company_name'
+COMPANY_NAME_PATTERN = re.compile(r"""'company_name': (?:'((?:[^'\\]|\\.)*)'|"((?:[^"\\]|\\.)*)")""")
+
+### only the alternative and previous names beginning with a letter are kept
+NAME_START = re.compile('[A-Za-z]')
+
+### the kind of the names in the long table, the OC field they are decoded from, and
+### the rules they are cleaned with
+NAME_LIST_FIELDS = (
+    ('alternative', 'alternative_names', nameNormalizer.OC_ALTERNATIVE_NAME_RULES),
+    ('previous', 'previous_names', nameNormalizer.OC_PREVIOUS_NAME_RULES),
+)
+
+### the columns identifying an OC company in the long table (see companyDimension.py)
+NAME_LIST_KEYS = ['company_id']
+
+### the candidate name sources of the flattened table
+SOURCE_NAME = 0
+SOURCE_ALTERNATIVE = 1
+SOURCE_PREVIOUS = 2
+
+### the version of the scorer. It is part of the cache key, so the cached scores are
+### no longer read when the way the pairs are compared or rounded changes
+SCORER_VERSION = 'ratio-1'
+
+### the number of pairs scored, the number of unique pairs, and the number of unique
+### pairs read from the cache
+scoringStats = {'pairs': 0, 'unique': 0, 'cached': 0}
+
+### the path to the cache file, which is set with useCache()
+cacheFile = None
+
+### the keys of the two hashes of each pair, which must be 16 characters
+HASH_KEYS = ('nameMatchingPair', 'nameMatchingChck')
+
+### the odd number the query hash is multiplied by before the choice hash is added
+PAIR_MULTIPLIER = 0x9E3779B97F4A7C15
+
+
+def fullProcess(name):
+    """Return the name in the form process.extractOne compares it."""
+
+    return NON_WORD.sub(' ', name).lower().strip()
+
+
+def _processUnique(names):
+    """Apply fullProcess once to each unique name."""
+
+    codes, uniques = pd.factorize(pd.Series(names, dtype=object))
+
+    return np.array([fullProcess(name) for name in uniques], dtype=object)[codes]
+
+
+def useCache(path):
+    """Keep the pair scores in the numpy file at path (None turns the cache off)."""
+
+    global cacheFile
+    cacheFile = path
+
+
+def hitRate():
+    """Return the share of the unique pairs scored so far that were read from the cache."""
+
+    if not scoringStats['unique']:
+        return 0.0
+
+    return scoringStats['cached']/scoringStats['unique']
+
+
+def _scoreMisses(queries, choices, workers):
+    """Score the pairs with fuzz.ratio, rounded to the nearest integer."""
+
+    return np.round(process.cpdist(queries, choices, scorer=fuzz.ratio, dtype=np.float64, workers=workers))
+
+
+def _pairHashes(queries, choices, queryIndex, choiceIndex):
+    """Return the two 64-bit hashes of each pair of names.
+
+    The unique names are hashed once and the hashes of the query and choice of each
+    pair are combined, so the pairs do not need to be built as strings.
+    """
+
+    hashes = []
+    for key in HASH_KEYS:
+        queryHashes = pd.util.hash_array(np.asarray(queries, dtype=object), hash_key=key, categorize=False)
+        choiceHashes = pd.util.hash_array(np.asarray(choices, dtype=object), hash_key=key, categorize=False)
+        hashes.append(queryHashes[queryIndex]*np.uint64(PAIR_MULTIPLIER) + choiceHashes[choiceIndex])
+
+    return hashes
+
+
+def loadPairCache(path):
+    """Load the cached pair hashes and scores, which are empty when the file does not
+    exist or was made by another scorer version."""
+
+    if os.path.exists(path):
+        with np.load(path, allow_pickle=False) as cache:
+            if str(cache['scorer']) == SCORER_VERSION:
+                return cache['keys'], cache['checks'], cache['scores']
+
+    return np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.uint8)
+
+
+def savePairCache(path, keys, checks, scores):
+    """Save the pair hashes sorted by key, replacing the file in one rename."""
+
+    order = np.argsort(keys, kind='mergesort')
+    temp = '%s.%d.tmp.npz' % (path, os.getpid())
+
+    np.savez_compressed(temp, scorer=SCORER_VERSION, keys=keys[order], checks=checks[order], scores=scores[order])
+    os.replace(temp, path)
+
+
+def _cachedScores(queries, choices, queryIndex, choiceIndex, workers):
+    """Score the unique pairs, reading and adding entries in the cache file.
+
+    The pairs are given by the positions of their query and choice in the lists of
+    unique queries and choices.
+    """
+
+    keys, checks, cachedScores = loadPairCache(cacheFile)
+    pairKeys, pairChecks = _pairHashes(queries, choices, queryIndex, choiceIndex)
+
+    ### a pair is found when both of its hashes match a cached entry
+    index = np.minimum(np.searchsorted(keys, pairKeys), max(len(keys)-1, 0))
+    found = np.zeros(len(queryIndex), dtype=bool)
+    if len(keys):
+        found = (keys[index] == pairKeys) & (checks[index] == pairChecks)
+
+    scores = np.full(len(queryIndex), np.nan)
+    scores[found] = cachedScores[index[found]]
+
+    ### the pairs that are not in the cache are scored and added to the file
+    missing = np.flatnonzero(~found)
+    scores[missing] = _scoreMisses(list(queries[queryIndex[missing]]), list(choices[choiceIndex[missing]]), workers)
+
+    if len(missing):
+        savePairCache(cacheFile, np.r_[keys, pairKeys[missing]], np.r_[checks, pairChecks[missing]],
+                      np.r_[cachedScores, scores[missing].astype(np.uint8)])
+
+    scoringStats['cached'] += int(found.sum())
+
+    return scores
+
+
+def pairScores(queries, choices, workers=-1, weights=None):
+    """Return the fuzz.ratio score of each pair of names, scoring each unique pair once.
+
+    When the token weights from tokenWeights.weightTable() are given, the pairs are
+    scored with the weighted token scorer instead. These scores depend on the token
+    table, so they are not read from or added to the pair cache.
+    """
+
+    queryCodes, queryUniques = pd.factorize(pd.Series(queries, dtype=object))
+    choiceCodes, choiceUniques = pd.factorize(pd.Series(choices, dtype=object))
+
+    ### each unique pair is given by the positions of its query and choice
+    nChoices = max(len(choiceUniques), 1)
+    codes, pairs = pd.factorize(queryCodes.astype(np.int64)*nChoices + choiceCodes)
+    queryIndex = pairs // nChoices
+    choiceIndex = pairs % nChoices
+
+    if weights is not None:
+        scores = tokenWeights.tokenScores(queryUniques, choiceUniques, queryIndex, choiceIndex, weights)
+
+    elif cacheFile is None:
+        scores = _scoreMisses(list(queryUniques[queryIndex]), list(choiceUniques[choiceIndex]), workers)
+
+    else:
+        scores = _cachedScores(queryUniques, choiceUniques, queryIndex, choiceIndex, workers)
+
+    scoringStats['pairs'] += len(codes)
+    scoringStats['unique'] += len(pairs)
+
+    return scores[codes]
+
+
+def companyNames(field):
+    """Decode an alternative_names or previous_names field and return its company names."""
+
+    if not isinstance(field, str):
+        return []
+
+    try:
+        entries = ast.literal_eval(field)
+
+    except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+        return [single or double for single, double in COMPANY_NAME_PATTERN.findall(field)]
+
+    if not isinstance(entries, (list, tuple)):
+        entries = [entries]
+
+    return [entry[COMPANY_NAME_KEY] for entry in entries
+            if isinstance(entry, dict) and isinstance(entry.get(COMPANY_NAME_KEY), str)]
+
+
+def nameListTable(records, skip=None):
+    """Decode the alternative_names and previous_names fields of the OC companies into
+    a long table with one row per name.
+
+    The table has the company_id, kind ('alternative' or 'previous'), raw_name, and
+    clean_name columns. Each company is decoded once, however many rows it has in
+    records, and each unique field is only decoded once. The names are cleaned with
+    the rules in nameNormalizer.py. The rows where skip is True are not decoded.
+    """
+
+    if skip is not None:
+        records = records.loc[~np.asarray(skip, dtype=bool)]
+
+    tables = []
+    for kind, column, rules in NAME_LIST_FIELDS:
+        fields = records[NAME_LIST_KEYS+[column]].drop_duplicates(subset=NAME_LIST_KEYS)
+        codes, uniques = pd.factorize(fields[column])
+
+        ### the missing fields have a code of -1, which selects the empty list at the end
+        decoded = [[name for name in companyNames(field) if NAME_START.match(name)] for field in uniques] + [[]]
+        lengths = np.array([len(names) for names in decoded], dtype=np.int64)[codes]
+
+        table = fields[NAME_LIST_KEYS].iloc[np.repeat(np.arange(len(fields)), lengths)].reset_index(drop=True)
+        table['kind'] = kind
+        table['raw_name'] = pd.Series([name for code in codes for name in decoded[code]], dtype=object)
+        table['clean_name'] = nameNormalizer.normalizeNames(table['raw_name'], rules)
+
+        tables.append(table)
+
+    return pd.concat(tables, ignore_index=True)
+
+
+def candidateNameTable(names, keys, nameLists):
+    """Flatten the OC names and their alternative and previous names into a table with
+    one row per candidate name.
+
+    The company_id column of keys selects the names of each record in the long
+    table from nameListTable(). The row column is the position of the record and the
+    position column is the position of the name within its list. A record without
+    alternative or previous names is compared to a single empty name, as the empty
+    lists were when they were read back from the CSV file.
+    """
+
+    tables = [pd.DataFrame({'row': np.arange(len(names)), 'source': SOURCE_NAME, 'position': 0,
+                            'candidate': np.asarray(names, dtype=object)})]
+
+    records = pd.DataFrame({key: np.asarray(keys[key]) for key in NAME_LIST_KEYS})
+    records['row'] = np.arange(len(records))
+
+    for source, (kind, _, _) in zip([SOURCE_ALTERNATIVE, SOURCE_PREVIOUS], NAME_LIST_FIELDS):
+        listed = nameLists.loc[nameLists['kind'] == kind, NAME_LIST_KEYS+['clean_name']]
+        listed = listed.assign(position=listed.groupby(NAME_LIST_KEYS, dropna=False, sort=False).cumcount())
+
+        table = records.merge(listed, on=NAME_LIST_KEYS, how='left', sort=False)
+        table.sort_values(by=['row', 'position'], kind='mergesort', inplace=True)
+
+        tables.append(pd.DataFrame({'row': table['row'].to_numpy(),
+                                    'source': source,
+                                    'position': table['position'].fillna(0).to_numpy(dtype=np.int64),
+                                    'candidate': table['clean_name'].fillna('').to_numpy(dtype=object)}))
+
+    return pd.concat(tables, ignore_index=True)
+
+
+def _bestCandidates(table, scores, nRows, source):
+    """Return the highest score of each record for one source and the position of the
+    first candidate with that score (-1 for records without candidates)."""
+
+    select = (table['source'] == source).to_numpy()
+    rows = table['row'].to_numpy()[select]
+    scores = scores[select]
+    index = np.flatnonzero(select)
+
+    best = np.full(nRows, np.nan)
+    first = np.full(nRows, -1, dtype=np.int64)
+
+    if len(rows):
+        starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+        groupMax = np.maximum.reduceat(scores, starts)
+        isMax = scores == np.repeat(groupMax, np.diff(np.r_[starts, len(scores)]))
+
+        best[rows[starts]] = groupMax
+        first[rows[starts]] = np.minimum.reduceat(np.where(isMax, index, len(table)), starts)
+
+    return best, first
+
+
+def batchNameScores(organization, names, keys, nameLists, workers=-1, weights=None):
+    """Score the organization names against the OC names and their alternative and
+    previous names, and return the best score and name of each record.
+
+    keys holds the company_id of each record, and nameLists is the long table
+    of alternative and previous names from nameListTable(). The pairs are scored
+    with the weighted token scorer when weights are given (see pairScores()).
+
+    The rules are the same as the previous loop. A score of 100 against the OC name
+    is kept. Otherwise, when the alternative or previous names have exactly one
+    name, the best alternative or previous name is used if its score is higher than
+    both the OC name score and the best score of the other list. Records where
+    neither list has exactly one name keep the OC name score if both lists are
+    empty and get NaN otherwise, as do records with a missing organization or name
+    and records with one list of exactly one name and the other empty.
+    """
+
+    organization = np.asarray(organization, dtype=object)
+    names = np.asarray(names, dtype=object)
+    nRows = len(organization)
+
+    table = candidateNameTable(names, keys, nameLists)
+    rows = table['row'].to_numpy()
+    candidates = table['candidate'].to_numpy()
+    isName = (table['source'] == SOURCE_NAME).to_numpy()
+
+    ### the records with a missing organization or OC name are not scored. As in
+    ### fuzz.ratio, an empty organization has a score of 0 against a missing OC name
+    hasOrganization = np.array([isinstance(x, str) for x in organization], dtype=bool)
+    hasName = np.array([isinstance(x, str) for x in names], dtype=bool)
+    emptyOrganization = hasOrganization & (organization == '')
+    valid = hasOrganization & (hasName | emptyOrganization)
+    score = valid[rows] & (hasName[rows] | ~isName)
+
+    ### the OC name is compared as is and the alternative and previous names are
+    ### compared after processing both names
+    queries = np.empty(len(table), dtype=object)
+    choices = np.empty(len(table), dtype=object)
+
+    named = score & isName
+    queries[named] = organization[rows[named]]
+    choices[named] = candidates[named]
+
+    listed = score & ~isName
+    queries[listed] = _processUnique(organization[rows[listed]])
+    choices[listed] = _processUnique(candidates[listed])
+
+    scores = np.full(len(table), np.nan)
+    scores[score] = pairScores(queries[score], choices[score], workers, weights)
+
+    q = np.full(nRows, np.nan)
+    q[rows[isName]] = scores[isName]
+    q[emptyOrganization & ~hasName] = 0
+    s, sFirst = _bestCandidates(table, scores, nRows, SOURCE_ALTERNATIVE)
+    e, eFirst = _bestCandidates(table, scores, nRows, SOURCE_PREVIOUS)
+
+    sources = table['source'].to_numpy()
+    r = np.bincount(rows[sources == SOURCE_ALTERNATIVE], minlength=nRows)
+    d = np.bincount(rows[sources == SOURCE_PREVIOUS], minlength=nRows)
+
+    ### a score of 100 against the OC name is kept. The lists of exactly one name are
+    ### only compared when the other list is not empty. The loop raised an error for
+    ### the remaining records, which gave NaN
+    hundred = valid & (q == 100)
+    single = valid & ~hundred & ((r == 1) | (d == 1)) & (r > 0) & (d > 0)
+    useAlt = single & (s > e) & (s > q)
+    usePrev = single & (e > s) & (e > q)
+    useName = hundred | (valid & (r == 0) & (d == 0)) | (single & ~useAlt & ~usePrev)
+
+    bestScores = np.select([useName, useAlt, usePrev], [q, s, e], np.nan)
+
+    bestNames = np.full(nRows, np.nan, dtype=object)
+    bestNames[useName] = names[useName]
+    bestNames[useAlt] = candidates[sFirst[useAlt]]
+    bestNames[usePrev] = candidates[eFirst[usePrev]]
+
+    bestScores = pd.Series(bestScores, name='scores')
+
+    ### the scores are integers when no record is missing a score, as in the loop
+    if bestScores.notnull().all():
+        bestScores = bestScores.astype(int)
+
+    return pd.DataFrame({'scores': bestScores, 'names': bestNames})
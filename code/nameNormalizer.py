@@ -0,0 +1,403 @@
+import pandas as pd
+import numpy as np
+import re
+import string
+import functools
+import hashlib
+import json
+import sqlite3
+import contextlib
+
+"""
+Author: Joshua Chu
+Date: October 18, 2026
+
+Description: this module holds the organization name, city, and state cleaning rules
+shared by the 'Prepare Patentview Data for Mike - Groupby Assignee Only' scripts
+(including the 2022 PatentsView data version) and the 'Merge OpenCorporate Results with
+Input Data and Clean for Scoring.py' script. Each rule set is the same chain of
+replacements that was previously applied with one .str.replace call per rule, written
+as an ordered list of steps. A step is either a (pattern, replacement) pair, 'title',
+or 'strip'.
+
+The rule sets are compiled into a function that applies all steps to one name at a
+time. This is not a single pass over the name. Before the steps are applied, the name
+is checked once against all patterns of the rule set, and names that do not contain
+any of the patterns are returned without running the chain. Most organization names
+contain a suffix such as Inc, Corp, or Llc, so they still go through the whole chain
+of re.sub calls in order, which keeps the results the same as the original
+.str.replace chains. The check alone saves little time per name; most of the time
+is saved by normalizing each unique value once (see below).
+
+The same names, cities, and states repeat on many rows (e.g., once per patent or once
+per OC candidate), so each column is factorized and only its unique values are
+normalized. The results are mapped back to the rows, and the share of rows that
+reused a result is kept in normalizationStats.
+
+When a cache file is set with useCache(), the normalized unique values are also
+kept in a SQLite file and later runs only normalize the values they have not seen
+before. Each entry is keyed by the raw value and a hash of the rule set, so changing
+a rule gives a new hash and the old entries are no longer read. SQLite allows several
+processes to read the file at once and locks it while new entries are written. The
+cache file can be deleted at any time to start over.
+
+"""
+
+### removes any whitespace to the left and right of the strings and converts the
+### first character in each word to Uppercase and remaining characters to lowercase
+TITLE_RULES = (
+    'strip',
+    'title',
+)
+
+### the whitespace cleanup that ends most of the rule sets. The names have single
+### spaces and no whitespace to the left and right
+WHITESPACE_RULES = (
+    (r'\s+', ' '),
+    'strip',
+)
+
+### the PatentsView organization names and the disambiguated names from
+### patent_match_id_name.dta. Some strings must be replaced rather than removed
+### because the resulting organization names would not make sense or match
+### incorrectly. For example, Arjang & Co., which is the full name for the
+### organization, would become Arjang and would match to multiple records via the
+### merge instead of one. This was observed through multiple trials of cleaning the data
+PV_ORGANIZATION_RULES = (
+    'title',
+    'strip',
+    (r'\s+', ' '),
+    (' & ', ' And '),
+    (r' (Co\.|Co)$', ' Company'),
+    (r' (Corp\.|Corp)$', ' Corporation'),
+    ('Intl', 'International'),
+    ('Mfg', 'Manufacturing'),
+    (r' (Inc\.|Inc)$| Inc ', ' Incorporated'),
+    (r' (Ltd\.|Ltd)$', ' Limited'),
+    (r' (Mgmt\.|Mgmt)$| (Mgmt\.|Mgmt)', ' Management'),
+    ('Solut$', 'Solutions'),
+    ('Gen Electr|Ge$', 'General Electric'),
+    (' Gen ', ' General '),
+    ('R C A', 'Rca'),
+    ('A M P', 'Amp'),
+    ('P P G', 'Ppg'),
+    ('G T E', 'Gte'),
+    ('G A F', 'Gaf'),
+    ('Ibm', 'Ibm Corporation'),
+    ('Sys |Syt$', 'Systems '),
+    ('Ind ', 'Industries '),
+) + WHITESPACE_RULES
+
+### the PatentsView organization names of the 2022 PatentsView data, which also have
+### the Llc and Pllc suffixes removed before the WHITESPACE_RULES
+PV_2022_ORGANIZATION_RULES = PV_ORGANIZATION_RULES[:-len(WHITESPACE_RULES)] + (
+    (r'Llc|Llc\.|Pllc|Pllc\.', ''),
+) + WHITESPACE_RULES
+
+### the abbreviations spelled out in the PatentsView organization names that are
+### sent to the OC API before the suffixes are removed
+PV_SUFFIX_EXPANSION_RULES = (
+    'strip',
+    (r'\s+', ' '),
+    ('R&D', 'Research And Design'),
+    ('Medrea.+$', 'Medrea'),
+)
+
+### the suffixes removed from the PatentsView organization names that are sent to
+### the OC API
+PV_SUFFIX_REMOVAL_RULES = (
+    (r'Incorporated|Corporation|L\.P\.|A Division Of.+$| Company$', ''),
+    (r'Inc\.$| Company,$| Limited$| Limited,$|L\.L\.C\.| Lp$', ''),
+    (r' Co\.,$|Corp\.,| Company,$| Lcc$| A Div\. Of.+$ Lc$', ''),
+)
+
+### the abbreviations spelled out after the suffixes are removed
+PV_SUFFIX_TRAILING_RULES = (
+    (r' Co\.,', ' Company'),
+    ("Int'L", 'International'),
+    (r'\s+', ' '),
+)
+
+### the suffixes and commas removed from the PatentsView organization names that are
+### sent to the OC API. The suspected foreign organizations are removed after these
+### rules, followed by the WHITESPACE_RULES
+PV_SUFFIX_RULES = PV_SUFFIX_EXPANSION_RULES + PV_SUFFIX_REMOVAL_RULES + (
+    (' Llc$|,', ''),
+) + PV_SUFFIX_TRAILING_RULES
+
+### the 2022 PatentsView data keeps the commas and the Llc suffix
+PV_2022_SUFFIX_RULES = PV_SUFFIX_EXPANSION_RULES + PV_SUFFIX_REMOVAL_RULES + PV_SUFFIX_TRAILING_RULES
+
+### the names that only have their abbreviations spelled out and keep their suffixes
+PV_ABBREVIATION_RULES = PV_SUFFIX_EXPANSION_RULES + PV_SUFFIX_TRAILING_RULES
+
+### removes the characters that are not letters, numbers, or whitespace, which is used
+### to find the organization names that are too short to search in the OC API
+PUNCTUATION_RULES = (
+    (r'[^\w\s]', ''),
+)
+
+### the suffixes removed from the OC names and the assignee names. This list was
+### constructed by manually inspecting the names prior to cleaning and does not
+### represent a comprehensive list
+OC_SUFFIX_PATTERN = '|'.join(['Llc', r'L\.L\.C\.', r'Inc\.$', 'Inc$', 'Ltd', r'\(', r'\)', 'Plc', r'P\.L\.C\.', 'Pllc',
+                              r'P\.L\.L\.C\.', r'Lp\.$', 'Lp$', 'Llp$', 'LP', r'L\.P\.', 'LC', r'L\.C\.', 'Ag$', 'Gmbh',
+                              'SA$', 'Kg', 'Pvt', 'Sa$', 'BV', 'Nv$', 'Ab$', 'Pty$', 'SPA$', r'S\.P\.A\.', 'Bv',
+                              r'B\.V\.', r'B\.v\.', '@', r'\.', ','])
+
+OC_NAME_RULES = (
+    (r'\s+', ' '),
+    (' & ', ' And '),
+    ('&', ' And '),
+    (' - |-', ' '),
+    (r'\+', ' '),
+    (r' (Co\.$|Co$)', ' Company'),
+    (r' (Corp\.|Corp) | (Corp\.$|Corp$) | (Corp\.$|Corp$)|[Cc]orporation', ''),
+    ('Mfg', 'Manufacturing'),
+    ('Incorporated|Usa|Incorportated', ''),
+    (OC_SUFFIX_PATTERN, ''),
+    'strip',
+    (r' (Co\.$|Co$)', ' Company'),
+    ("'S", "'s"),
+    (r"L L C|Lc|Llc| Usa|Umi$|\/| Inc | Limited$| Llc", ''),
+    ('Dba |DBA ', ' '),
+    (r"'|\?", ''),
+    (' Company$| USA$', ''),
+) + WHITESPACE_RULES
+
+### the suffixes missed in the PatentsView organization names of the OC output
+OC_ORGANIZATION_RULES = (
+    (r"L L C|Lc|Llc| Usa|\/| Inc |\?| Ltd$| Ltd | Inc$| Company$", ''),
+) + WHITESPACE_RULES
+
+### the PatentsView and OC city names, where the abbreviations are spelled out
+CITY_RULES = (
+    (r'St\. |^St ', 'Saint '),
+    (r'Ft\. |^Ft ', 'Fort '),
+    (r'Mt\. |^Mt ', 'Mount '),
+    (r'Pte\. |^Pte ', 'Pointe '),
+)
+
+### the OC address and agent cities, which may also include the street address
+### before the city
+OC_CITY_RULES = CITY_RULES + (
+    ('Mpls', 'Minneapolis'),
+    ('^.+?, ', ''),
+)
+
+### the OC address and agent states, which were manually identified as records
+### that needed to be standardized
+OC_STATE_RULES = (
+    ('^.+?, ', ''),
+    ('^Pa [0-9].*', 'Pa'),
+    ('^.*Of ', ''),
+)
+
+### removes as much punctuation as possible from the OC alternative and previous names
+### and ensures all spaces are single spaced after processing the names
+OC_NAME_LIST_PUNCTUATION_RULES = (
+    ('-|/', ' '),
+    ('[%s]' % re.escape(string.punctuation), ''),
+    (' $| LP$', ''),
+    (r'\s+', ' '),
+)
+
+### the OC alternative names, which are decoded from the alternative_names field
+OC_ALTERNATIVE_NAME_RULES = (
+    ("'", ''),
+    'title',
+    (r'\s+', ' '),
+    (' & ', ' And '),
+    ('&', ' And '),
+    ('Mfg', 'Manufacturing'),
+    (r', Inc\.| Usa, Incorporated| Usa| Inc\.| Inc$| Incorpor$| Incorporated$|Incorporated', ''),
+    (r', Llc$| Ltd\.| Ltd| Limited| Pty\.| Pty|L\.L\.C\.| Llp$| Llc$|\(.+?\)|,Inc\.', ''),
+    (r', P\.C\.| P\.C\.| P\. C\.| D\.M\.D\.|D\.D\.S\.| D\. D\. S\.| M\.D\.|L\.L\.C', ''),
+    (r' Corporation$| Corporation,$| Corp\.$ | Corp.$| Corp\.$| Corp\.,$', ' Corporation'),
+    (r'Co\.$| Co$', 'Company'),
+    ("'", ''),
+    ('L L C|Lc|Llc', ''),
+) + OC_NAME_LIST_PUNCTUATION_RULES
+
+### the OC previous names, which are decoded from the previous_names field
+OC_PREVIOUS_NAME_RULES = (
+    ("'", ''),
+    'title',
+    'strip',
+    (r'\s+', ' '),
+    (' & ', ' And '),
+    ('&', ' And '),
+    ('Mfg', 'Manufacturing'),
+    (r', Inc\.| Usa, Incorporated| Usa| Inc\.| Inc$| Incorpor$| Incorporated$|Incorporated', ''),
+    (r', Llc$| Ltd\.| Ltd| Limited| Pty\.| Pty', ''),
+    (r'L\.L\.C\.| Llp$| Llc$|\(.+?\)|,Inc\.', ''),
+    (r', P\.C\.| P\.C\.| P\. C\.| D\.M\.D\.|D\.D\.S\.| D\. D\. S\.| M\.D\.', ''),
+    (r' Corporation$| Corporation,$| Corp\.$ | Corp.$| Corp\.$| Corp\.,$', ' Corporation'),
+    (r'Co\.$| Co$', ' Company'),
+    ("'", ''),
+    ('L L C|Lc|Llc', ''),
+) + OC_NAME_LIST_PUNCTUATION_RULES
+
+### the version of the rule compiler below. It is part of the rule set hash, so the
+### cache is invalidated when the way the rules are applied changes
+RULES_VERSION = 1
+
+### the number of raw values looked up in the cache per query. SQLite limits the
+### number of parameters in a single query
+CACHE_BATCH = 900
+
+### the number of rows and unique values normalized by normalizeNames(), and the
+### number of unique values read from the cache
+normalizationStats = {'rows': 0, 'unique': 0, 'cached': 0}
+
+### the path to the cache file, which is set with useCache()
+cacheFile = None
+
+
+def _triggerPattern(step):
+    """Return a pattern that only matches a name when the step would change it."""
+
+    if step == 'strip':
+        return r'^\s|\s$'
+
+    pattern, replacement = step
+
+    ### single spaces are replaced with single spaces, so only runs of whitespace
+    ### and other whitespace characters change the name
+    if (pattern, replacement) == (r'\s+', ' '):
+        return r'\s{2,}|[^\S ]'
+
+    return pattern
+
+
+@functools.lru_cache(maxsize=None)
+def compileRules(rules):
+    """Compile a rule set into a function that normalizes one name.
+
+    The function skips the names that no step would change using one combined
+    trigger pattern, and runs every step in order on the remaining names.
+    """
+
+    ### the 'title' steps at the start of the rule set are always applied, since they
+    ### do not use a pattern. The remaining steps are checked using the trigger
+    leading = 0
+    while leading < len(rules) and rules[leading] == 'title':
+        leading += 1
+
+    steps = []
+    for step in rules:
+        if step in ('title', 'strip'):
+            steps.append(step)
+
+        else:
+            steps.append((re.compile(step[0]), step[1]))
+
+    remaining = rules[leading:]
+    if 'title' in remaining:
+        trigger = None
+
+    else:
+        trigger = re.compile('|'.join('(?:%s)' % _triggerPattern(step) for step in remaining))
+
+    def normalize(name):
+        if not isinstance(name, str):
+            return np.nan
+
+        for step in steps[:leading]:
+            name = name.title()
+
+        if trigger is not None and not trigger.search(name):
+            return name
+
+        for step in steps[leading:]:
+            if step == 'title':
+                name = name.title()
+
+            elif step == 'strip':
+                name = name.strip()
+
+            else:
+                name = step[0].sub(step[1], name)
+
+        return name
+
+    return normalize
+
+
+def rulesHash(rules):
+    """Return the hash of a rule set, which identifies its entries in the cache."""
+
+    return hashlib.sha1(json.dumps([RULES_VERSION, rules]).encode('utf-8')).hexdigest()
+
+
+def useCache(path):
+    """Keep the normalized values in the SQLite file at path (None turns the cache off)."""
+
+    global cacheFile
+
+    if path is not None:
+        with contextlib.closing(sqlite3.connect(path, timeout=600)) as conn, conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS names (rules TEXT, raw TEXT, normalized TEXT, '
+                         'PRIMARY KEY (rules, raw)) WITHOUT ROWID')
+
+    cacheFile = path
+
+
+def _cachedNormalize(uniques, rules, normalize):
+    """Normalize the unique values, reading and adding entries in the cache file."""
+
+    key = rulesHash(rules)
+    names = [name for name in uniques if isinstance(name, str)]
+
+    with contextlib.closing(sqlite3.connect(cacheFile, timeout=600)) as conn:
+        found = {}
+        for i in range(0, len(names), CACHE_BATCH):
+            batch = names[i:i+CACHE_BATCH]
+            found.update(conn.execute('SELECT raw, normalized FROM names WHERE rules = ? AND raw IN (%s)'
+                                      % ','.join('?'*len(batch)), [key] + batch))
+
+        ### the values that are not in the cache are normalized and added in one
+        ### transaction. Entries added by another process in the meantime are kept
+        new = [(key, name, normalize(name)) for name in names if name not in found]
+        with conn:
+            conn.executemany('INSERT OR IGNORE INTO names VALUES (?, ?, ?)', new)
+
+    normalizationStats['cached'] += len(found)
+    found.update((name, value) for _, name, value in new)
+
+    return [found[name] if isinstance(name, str) else np.nan for name in uniques]
+
+
+def normalizeNames(values, rules):
+    """Apply a rule set to a Series of names and return the normalized Series.
+
+    Each unique value is normalized once and the result is mapped back to every
+    row with the same value. When a cache file is set, the unique values found in
+    the cache are not normalized again.
+    """
+
+    codes, uniques = pd.factorize(values)
+    normalize = compileRules(rules)
+
+    if cacheFile is None:
+        cleaned = [normalize(name) for name in uniques]
+
+    else:
+        cleaned = _cachedNormalize(uniques, rules, normalize)
+
+    cleaned = np.array(cleaned + [np.nan], dtype=object)
+
+    normalizationStats['rows'] += len(values)
+    normalizationStats['unique'] += len(uniques)
+
+    ### the missing values have a code of -1, which selects the NaN at the end
+    return pd.Series(cleaned[codes], index=values.index, name=values.name)
+
+
+def hitRatio():
+    """Return the share of the rows normalized so far that reused the result of a repeated value."""
+
+    if not normalizationStats['rows']:
+        return 0.0
+
+    return 1 - normalizationStats['unique']/normalizationStats['rows']
@@ -0,0 +1,727 @@
+import pandas as pd
+import numpy as np
+import json
+import os
+import copy
+
+"""
+Author: Joshua Chu
+Date: October 18, 2026
+
+Description: this module holds the columnar scoring engine used by the
+'Score OpenCorporates Data With States.py' script. The scoring rules are the same
+rules that were previously applied one record at a time in a for loop, but they
+are now written as band tables and applied to whole columns with numpy. There are
+two named profiles: 'state', which holds the rules from the state scoring script,
+and 'stateless', which holds the rules from the 'Score OpenCorporates Data With No
+States' notebook. Both profiles share the same code path. Each band
+table is a list of (low, high, points) tuples that are evaluated in order, with
+the first band that matches a record awarding the points. A band with the same
+low and high value only matches that exact value.
+
+The output of scoreCandidates() is identical to the totalScore values produced
+by the original loop.
+
+The confidence scores can be scaled using the min and max totalScore of the batch
+being scored, the fixed range declared by the band tables (see scoreRange()), or a
+calibration file saved from a previous batch run. The last two options allow each
+chunk of candidates to be scored on its own.
+
+"""
+
+### the band tables below were manually determined early on in the project and
+### are copied directly from the original scoring loop. The name bands award
+### points using the organization name length, where lengthCuts are the lengths
+### at which the next entry in lengthPoints is used. Shorter names are scored
+### lower than longer names
+STATE_RULES = {
+    'locationRule': 'cityState',
+    'dateColumns': ['dateFiledMin', 'incorporation_date'],
+    'nameBands': [(100, 100, [5], [0, 5]),
+                  (90, 100, [5, 10, 15], [0, 1, 2, 5]),
+                  (87, 90, [5, 10, 15], [-1, 1, 2, 4]),
+                  (-np.inf, 87, [], [-7])],
+    'nameMissingPoints': -10,
+    'statePoints': 5,
+    'cityPoints': 5,
+
+    ### penalizes records with a first patent applied for date that is older
+    ### than the incorporation date for that organization. The bands are
+    ### evaluated as low <= dateDiff < high
+    'incPenaltyBands': [(-5, 0, -1),
+                        (-10, -5, -3),
+                        (-np.inf, -10, -5)],
+    'incPenaltyClosed': 'left',
+
+    ### distance bands are evaluated as low <= distance < high against all three
+    ### city distances, and only when the city did not match
+    'distanceBands': [(0, 50, 5),
+                      (50, 100, 2),
+                      (100, 200, 1),
+                      (200, np.inf, -2)],
+
+    ### date difference bands are evaluated as low < dateDiff <= high
+    'dateDiffBands': [(-np.inf, 15, 5),
+                      (15, 25, 4),
+                      (25, 30, 3),
+                      (30, 35, 2),
+                      (35, np.inf, 1)],
+
+    ### the confidence scores are converted to integers using the floor function
+    'scoreBuckets': None,
+}
+
+### the stateless rules use different name bands, where the 87-90 band is replaced
+### with a 90-95 and 95-100 band, and names below 90 still receive points by length.
+### The state is matched against the jurisdiction fields first and the address,
+### agent, and data states are only used when the running score is below
+### fallbackBelow. All distances are scored since there is no city short-circuit
+STATELESS_RULES = {
+    'locationRule': 'jurisdiction',
+    'dateColumns': ['dateOfFirstPat', 'minIncDateForOrg'],
+    'nameBands': [(100, 100, [5, 10], [0, 3, 5]),
+                  (95, 100, [5, 10, 15], [-1, 1, 2, 3]),
+                  (90, 95, [5, 10, 15], [-2, 1, 2, 3]),
+                  (-np.inf, 90, [5, 10, 15], [-3, 0, 1, 2])],
+    'nameMissingPoints': -10,
+    'statePoints': 5,
+    'cityPoints': 5,
+    'fallbackBelow': 8,
+
+    ### the penalty band is evaluated as low < dateDiff <= high
+    'incPenaltyBands': [(1, np.inf, -5)],
+    'incPenaltyClosed': 'right',
+
+    'distanceBands': [(0, 0, 5),
+                      (0, 10, 4),
+                      (10, 50, 3),
+                      (50, 100, 2),
+                      (100, 200, 1),
+                      (200, np.inf, -2)],
+
+    'dateDiffBands': [(-np.inf, 15, 5),
+                      (15, 25, 4),
+                      (25, 30, 3),
+                      (30, 35, 2),
+                      (35, np.inf, 1)],
+
+    ### the confidence scores from 1 to 10 are bucketed into these scores
+    'scoreBuckets': [1, 1, 1, 1, 1, 9, 8, 8, 9, 10],
+}
+
+PROFILES = {'state': STATE_RULES, 'stateless': STATELESS_RULES}
+
+DISTANCE_COLUMNS = ['cityToAddrDistance', 'cityToAgtDistance', 'cityToDataDistance']
+
+### the column that marks a candidate file pruned with pruneCandidates(), which holds
+### the k the candidates were pruned with
+PRUNE_COLUMN = 'pruneTopK'
+
+### the best record for each ID is the record with the highest score, followed by
+### the largest dateDiff and the latest record_date. Any remaining ties are resolved
+### by keeping the first record in file order
+SELECTION_ORDER = ['score', 'dateDiff', 'record_date']
+SELECTION_ASCENDING = [False, False, False]
+
+
+def _inBand(values, low, high, closed='left'):
+    """Return a boolean mask for the values that fall inside a single band."""
+
+    ### a band with the same low and high value is an exact match, otherwise the
+    ### closed argument sets which side of the band is inclusive. NaN values never
+    ### fall inside a band because all comparisons with NaN are False
+    if low == high:
+        return values == low
+
+    elif closed == 'left':
+        return (values >= low) & (values < high)
+
+    return (values > low) & (values <= high)
+
+
+def _bandPoints(values, bands, default=0, closed='left'):
+    """Award the points from the first band each value falls into."""
+
+    conditions = [_inBand(values, low, high, closed) for low, high, points in bands]
+    choices = [points for low, high, points in bands]
+
+    return np.select(conditions, choices, default=default)
+
+
+def _anyInBandPoints(columns, bands, default=0):
+    """Award the points from the first band that any of the columns fall into."""
+
+    conditions = [np.logical_or.reduce([_inBand(c, low, high) for c in columns]) for low, high, points in bands]
+    choices = [points for low, high, points in bands]
+
+    return np.select(conditions, choices, default=default)
+
+
+def _columnsEqual(df, left, rights):
+    """Return a mask that is True where the left column equals any of the right columns."""
+
+    ### NaN is never equal to NaN, which matches the == comparisons in the original loop
+    leftValues = df[left].to_numpy(dtype=object)
+    mask = np.zeros(len(df), dtype=bool)
+
+    for right in rights:
+        mask |= (leftValues == df[right].to_numpy(dtype=object))
+
+    return mask
+
+
+def _cityStateFeatures(df, features):
+    """Add the state and city equality flags used by the state rules."""
+
+    ### the state and city are compared against the matched, address, and agent
+    ### locations. A city match sets the 'a' variable from the original loop and
+    ### prevents the record from also getting points in the distance section
+    features['stateEq'] = _columnsEqual(df, 'state', ['stateMatch', 'address_state', 'agent_state'])
+    features['cityEq'] = _columnsEqual(df, 'city', ['cityMatch', 'address_city', 'agent_city'])
+
+
+def _jurisdictionFeatures(df, features):
+    """Add the jurisdiction and fallback location matches used by the stateless rules."""
+
+    ### the PatentsView state, trademark state, and controlling entity are matched
+    ### against the jurisdiction fields in that order. The first two also check the
+    ### city (or trademark city) against the address, agent, and data cities
+    stateJuris = _columnsEqual(df, 'state', ['subJurisCode', 'subCntlEntity'])
+    tradeJuris = _columnsEqual(df, 'tradeState', ['subJurisCode', 'subCntlEntity'])
+    ctrlJuris = _columnsEqual(df, 'ctrlEntity', ['subJurisCode', 'subCntlEntity'])
+
+    cityEq = _columnsEqual(df, 'city', ['address_city', 'agent_city', 'data_city'])
+    tradeCityEq = _columnsEqual(df, 'tradeCity', ['address_city', 'agent_city', 'data_city'])
+
+    features['jurisMatch'] = np.select([stateJuris, tradeJuris, ctrlJuris], [1, 2, 3], default=0)
+    features['jurisCityEq'] = np.select([stateJuris, tradeJuris], [cityEq, tradeCityEq], default=False)
+
+    ### the first of the address, agent, and data states that matches, along with
+    ### the city from the same source
+    fallbackStates = [_columnsEqual(df, 'state', [col]) for col in ['address_state', 'agent_state', 'data_state']]
+    fallbackCities = [_columnsEqual(df, 'city', [col]) for col in ['address_city', 'agent_city', 'data_city']]
+
+    features['fallbackMatch'] = np.select(fallbackStates, [1, 2, 3], default=0)
+    features['fallbackCityEq'] = np.select(fallbackStates, fallbackCities, default=False)
+
+
+def candidateFeatures(df, rules=STATE_RULES):
+    """Extract the columns the scoring rules read into a compact feature frame.
+
+    The organization name length, location match flags, and the penalty flag
+    are computed once so the bands can be applied to plain arrays.
+    """
+
+    features = pd.DataFrame(index=df.index)
+
+    features['nameScores'] = pd.to_numeric(df['nameScores'], errors='coerce').astype('float64')
+    features['orgLength'] = df['organization'].str.len().fillna(0).astype('int64')
+
+    if rules['locationRule'] == 'cityState':
+        _cityStateFeatures(df, features)
+
+    elif rules['locationRule'] == 'jurisdiction':
+        _jurisdictionFeatures(df, features)
+
+    ### the penalty is only applied when the first patent applied for date is
+    ### older than the incorporation date
+    filedDate, incDate = rules['dateColumns']
+    filedDate = pd.to_datetime(df[filedDate], errors='coerce')
+    incDate = pd.to_datetime(df[incDate], errors='coerce')
+    features['filedBeforeInc'] = (filedDate < incDate).to_numpy()
+
+    features['dateDiff'] = pd.to_numeric(df['dateDiff'], errors='coerce').astype('float64')
+
+    for col in DISTANCE_COLUMNS:
+        features[col] = pd.to_numeric(df[col], errors='coerce').astype('float64')
+
+    return features
+
+
+def namePoints(nameScores, orgLength, rules=STATE_RULES):
+    """Score the fuzzy match scores using the name score and name length bands."""
+
+    conditions = []
+    choices = []
+
+    for low, high, lengthCuts, lengthPoints in rules['nameBands']:
+        conditions.append(_inBand(nameScores, low, high))
+        choices.append(np.asarray(lengthPoints)[np.digitize(orgLength, lengthCuts)])
+
+    return np.select(conditions, choices, default=rules['nameMissingPoints'])
+
+
+def scoreFeatures(features, rules=STATE_RULES):
+    """Calculate the totalScore for every record in a feature frame."""
+
+    nameScores = features['nameScores'].to_numpy()
+    orgLength = features['orgLength'].to_numpy()
+    filedBeforeInc = features['filedBeforeInc'].to_numpy(dtype=bool)
+    dateDiff = features['dateDiff'].to_numpy()
+    distances = [features[col].to_numpy() for col in DISTANCE_COLUMNS]
+
+    totalScore = namePoints(nameScores, orgLength, rules)
+    distancePoints = _anyInBandPoints(distances, rules['distanceBands'])
+
+    if rules['locationRule'] == 'cityState':
+        stateEq = features['stateEq'].to_numpy(dtype=bool)
+        cityEq = features['cityEq'].to_numpy(dtype=bool)
+
+        ### scoring the city-state pairs for each organization. Records with a city
+        ### match skip the distance section
+        totalScore = totalScore + np.where(stateEq, rules['statePoints'], 0)
+        totalScore = totalScore + np.where(cityEq, rules['cityPoints'], 0)
+        distancePoints = np.where(cityEq, 0, distancePoints)
+
+    elif rules['locationRule'] == 'jurisdiction':
+        jurisMatch = features['jurisMatch'].to_numpy()
+        fallbackMatch = features['fallbackMatch'].to_numpy()
+
+        totalScore = totalScore + np.where(jurisMatch > 0, rules['statePoints'], 0)
+        totalScore = totalScore + np.where(features['jurisCityEq'].to_numpy(dtype=bool), rules['cityPoints'], 0)
+
+        ### the address, agent, and data states are only used for records with a
+        ### running score below fallbackBelow
+        fallback = (totalScore < rules['fallbackBelow']) & (fallbackMatch > 0)
+        fallbackPoints = rules['statePoints'] + np.where(features['fallbackCityEq'].to_numpy(dtype=bool),
+                                                         rules['cityPoints'], 0)
+        totalScore = totalScore + np.where(fallback, fallbackPoints, 0)
+
+    totalScore = totalScore + np.where(filedBeforeInc, _bandPoints(dateDiff, rules['incPenaltyBands'],
+                                                                   closed=rules['incPenaltyClosed']), 0)
+
+    ### if no distance was able to be determined a score of zero is given
+    totalScore = totalScore + distancePoints
+
+    totalScore = totalScore + _bandPoints(dateDiff, rules['dateDiffBands'], closed='right')
+
+    return totalScore.astype('int64')
+
+
+def candidateProfiles(df, default='state', profileColumn='scoringProfile'):
+    """Return the name of the scoring profile for each record.
+
+    A combined candidate file can hold records from both pipelines by including
+    a profileColumn with the profile name of each record. Otherwise, every record
+    uses the default profile.
+    """
+
+    if profileColumn in df:
+        profiles = df[profileColumn].fillna(default)
+
+    else:
+        profiles = pd.Series(default, index=df.index)
+
+    unknown = set(profiles.unique()) - set(PROFILES)
+    if unknown:
+        raise KeyError("Unknown scoring profiles: %s" % sorted(unknown))
+
+    return profiles
+
+
+def scoreCandidates(df, profile='state'):
+    """Calculate the totalScore for every candidate record in df.
+
+    The profile is a profile name, a set of rules, or a Series with the profile
+    name of each record (see candidateProfiles()).
+    """
+
+    if isinstance(profile, dict):
+        return scoreFeatures(candidateFeatures(df, profile), profile)
+
+    elif isinstance(profile, str):
+        return scoreFeatures(candidateFeatures(df, PROFILES[profile]), PROFILES[profile])
+
+    totalScore = np.zeros(len(df), dtype='int64')
+    profile = profile.to_numpy()
+
+    for name in pd.unique(profile):
+        mask = profile == name
+        totalScore[mask] = scoreCandidates(df.loc[mask], name)
+
+    return totalScore
+
+
+def loadRules(path, base=STATE_RULES):
+    """Load a JSON file of band tables that replace the matching entries in base.
+
+    Only the entries that are changed need to be included in the file, for example
+    {"distanceBands": [[0, 25, 5], [25, 100, 2], [100, 200, 1], [200, Infinity, -2]]}.
+    """
+
+    with open(path) as f:
+        changes = json.load(f)
+
+    unknown = set(changes) - set(base)
+    if unknown:
+        raise KeyError("Unknown scoring rules in %s: %s" % (path, sorted(unknown)))
+
+    rules = copy.deepcopy(base)
+    rules.update(changes)
+
+    return rules
+
+
+def _pointsRange(points):
+    """Return the smallest and largest value in a list of points, including zero."""
+
+    return min(0, min(points)), max(0, max(points))
+
+
+def scoreRange(rules=STATE_RULES):
+    """Return the lowest and highest totalScore the band tables can produce.
+
+    The range is the sum of the lowest and highest points of each section. For
+    the state rules, the city points and distance points are never awarded
+    together, so they are treated as a single section. For the stateless rules,
+    the fallback location points are only awarded to records below fallbackBelow,
+    which limits the highest score they can reach.
+    """
+
+    namePointsList = [p for low, high, lengthCuts, lengthPoints in rules['nameBands'] for p in lengthPoints]
+    nameMin = min(namePointsList + [rules['nameMissingPoints']])
+    nameMax = max(namePointsList + [rules['nameMissingPoints']])
+
+    distanceMin, distanceMax = _pointsRange([p for low, high, p in rules['distanceBands']])
+    penaltyMin, penaltyMax = _pointsRange([p for low, high, p in rules['incPenaltyBands']])
+    dateMin, dateMax = _pointsRange([p for low, high, p in rules['dateDiffBands']])
+
+    if rules['locationRule'] == 'cityState':
+        stateMin, stateMax = _pointsRange([rules['statePoints']])
+        cityMin, cityMax = _pointsRange([rules['cityPoints'], distanceMin, distanceMax])
+        locationMin, locationMax = nameMin + stateMin + cityMin, nameMax + stateMax + cityMax
+
+    elif rules['locationRule'] == 'jurisdiction':
+        sectionMin, sectionMax = _pointsRange([rules['statePoints'], rules['statePoints'] + rules['cityPoints']])
+        locationMin = nameMin + 2*sectionMin + distanceMin
+        locationMax = max(nameMax + sectionMax, min(rules['fallbackBelow'] - 1, nameMax + sectionMax) + sectionMax)
+        locationMax = locationMax + distanceMax
+
+    return (locationMin + penaltyMin + dateMin,
+            locationMax + penaltyMax + dateMax)
+
+
+def confidenceScores(totalScore, scoreMin, scoreMax):
+    """Scale the totalScores to a confidence score between 1 and 10.
+
+    The scores are rounded to 2 decimals. Since totalScore only contains a small
+    number of unique integers, the scaling is calculated once per unique value and
+    mapped back to the records.
+    """
+
+    totalScore = pd.Series(totalScore)
+    uniqueScores = pd.Series(totalScore.unique())
+
+    scaled = ((10-1)*((uniqueScores-scoreMin)/(scoreMax-scoreMin)))+1
+
+    ### scores outside of a fixed or calibrated range are clipped to the ends of
+    ### the scale
+    scaled = scaled.clip(lower=1, upper=10)
+    scaled = pd.Series([round(num1, 2) for num1 in scaled], index=uniqueScores.to_numpy())
+
+    return totalScore.map(scaled).to_numpy()
+
+
+def profileConfidenceScores(totalScore, profiles, scoreRanges):
+    """Scale the totalScores of each profile using the range saved for that profile."""
+
+    confidenceScore = np.zeros(len(totalScore), dtype='float64')
+    totalScore = np.asarray(totalScore)
+    profiles = np.asarray(profiles)
+
+    for name in pd.unique(profiles):
+        mask = profiles == name
+        confidenceScore[mask] = confidenceScores(totalScore[mask], *scoreRanges[name])
+
+    return confidenceScore
+
+
+def bucketScores(confidenceScore, profiles):
+    """Convert the confidence scores to integer scores using the profile buckets.
+
+    Profiles without buckets use the floor function, which moves each score to the
+    next lowest integer. Profiles with buckets map the floor of each score from 1
+    to 10 to the bucket at the same position.
+    """
+
+    score = np.floor(np.asarray(confidenceScore, dtype='float64'))
+    profiles = np.asarray(profiles)
+
+    for name in pd.unique(profiles):
+        buckets = PROFILES[name]['scoreBuckets']
+
+        if buckets is not None:
+            mask = profiles == name
+            score[mask] = pd.Series(score[mask]).map(dict(zip(range(1, 11), buckets))).to_numpy(dtype='float64')
+
+    return score
+
+
+def batchScoreRanges(totalScore, profiles):
+    """Return the min and max totalScore of each profile in the batch."""
+
+    totalScore = pd.Series(np.asarray(totalScore))
+    ranges = totalScore.groupby(np.asarray(profiles)).agg(['min', 'max'])
+
+    return {name: (int(row['min']), int(row['max'])) for name, row in ranges.iterrows()}
+
+
+def saveCalibration(path, scoreRanges):
+    """Save the totalScore range of each profile used to scale the confidence scores."""
+
+    with open(path, 'w') as f:
+        json.dump({name: {'scoreMin': int(scoreMin), 'scoreMax': int(scoreMax)}
+                   for name, (scoreMin, scoreMax) in scoreRanges.items()}, f, indent=2)
+
+    os.chmod(path, 0o777)
+
+
+def loadCalibration(path):
+    """Load the totalScore ranges saved by saveCalibration()."""
+
+    with open(path) as f:
+        calibration = json.load(f)
+
+    return {name: (c['scoreMin'], c['scoreMax']) for name, c in calibration.items()}
+
+
+def _selectionKey(values, ascending):
+    """Convert a column to floats where a larger value is a better record.
+
+    Dates are converted to nanoseconds and missing values are kept as NaN, which
+    places them last in the same way sort_values does.
+    """
+
+    if pd.api.types.is_datetime64_any_dtype(values):
+        key = values.to_numpy(dtype='datetime64[ns]').astype('int64').astype('float64')
+        key[values.isna().to_numpy()] = np.nan
+
+    else:
+        key = pd.to_numeric(values, errors='coerce').to_numpy(dtype='float64')
+
+    if ascending:
+        key = -key
+
+    return key
+
+
+def topCandidates(df, k=1, by=SELECTION_ORDER, ascending=SELECTION_ASCENDING, idCol='ID'):
+    """Select the k best records for each ID and number them in a candidateRank column.
+
+    The records are ranked in the same order as sorting by [idCol] + by and keeping
+    the first k records per ID, but without sorting the whole frame. Each rank is
+    found by taking the group max of each key in turn and keeping the records that
+    tie with it, which only requires k passes of hash-based group operations. Only
+    the selected records are sorted by ID and rank at the end.
+    """
+
+    codes = pd.factorize(df[idCol])[0]
+    keys = [_selectionKey(df[col], asc) for col, asc in zip(by, ascending)]
+
+    ### the position in file order is the last key so that every rank is unique
+    keys.append(-np.arange(len(df), dtype='float64'))
+
+    remaining = np.ones(len(df), dtype=bool)
+    candidateRank = np.zeros(len(df), dtype='int64')
+
+    for r in range(1, k+1):
+        candidate = remaining.copy()
+
+        for key in keys:
+            best = pd.Series(np.where(candidate, key, np.nan)).groupby(codes).transform('max').to_numpy()
+            candidate &= (key == best) | (np.isnan(key) & np.isnan(best))
+
+        candidateRank[candidate] = r
+        remaining &= ~candidate
+
+    top = df.iloc[np.flatnonzero(candidateRank)].copy()
+    top['candidateRank'] = candidateRank[candidateRank > 0]
+
+    return top.sort_values(by=[idCol, 'candidateRank'], kind='mergesort')
+
+
+def resolveCompanyConflicts(df, by=SELECTION_ORDER, ascending=SELECTION_ASCENDING, idCol='ID',
+                            companyCols=['company_number', 'jurisdiction_code']):
+    """Assign each OC company to at most one ID, using the candidates in df.
+
+    The best records of each ID are picked on their own, so the same OC company
+    can be the best record of several IDs. This function resolves these conflicts
+    greedily: every candidate record is an edge between an ID and a company, the
+    edges are ranked using the same order as topCandidates() across all IDs, and
+    the best remaining edge is accepted as long as neither its ID nor its company
+    was already assigned. Records with a missing company are never in conflict.
+
+    Instead of walking the edges one at a time, each pass accepts every edge that
+    is the best remaining edge of both its ID and its company, which gives the same
+    assignment as the greedy walk and only needs a few passes of group operations.
+    Returns a boolean array that is True for the assigned records.
+    """
+
+    n = len(df)
+
+    ### the edges are ranked across all IDs by the selection keys, where missing
+    ### values are the worst, and by the position in file order
+    keys = [np.nan_to_num(_selectionKey(df[col], asc), nan=-np.inf) for col, asc in zip(by, ascending)]
+    order = np.lexsort([np.arange(n)] + [-key for key in reversed(keys)])
+    rank = np.empty(n, dtype='int64')
+    rank[order] = np.arange(n)
+
+    idCodes = pd.factorize(df[idCol])[0]
+    companyCodes = df.groupby(companyCols, sort=False, dropna=False).ngroup().to_numpy().copy()
+
+    ### records with a missing company get their own code so they never conflict
+    missing = df[companyCols].isna().any(axis=1).to_numpy()
+    companyCodes[missing] = companyCodes.max(initial=-1) + 1 + np.arange(missing.sum())
+
+    assigned = np.zeros(n, dtype=bool)
+    active = np.ones(n, dtype=bool)
+    idDone = np.zeros(idCodes.max(initial=-1) + 1, dtype=bool)
+    companyDone = np.zeros(companyCodes.max(initial=-1) + 1, dtype=bool)
+
+    while active.any():
+        edges = np.flatnonzero(active)
+
+        bestForId = np.full(idCodes.max(initial=-1) + 1, n)
+        np.minimum.at(bestForId, idCodes[edges], rank[edges])
+
+        bestForCompany = np.full(companyCodes.max(initial=-1) + 1, n)
+        np.minimum.at(bestForCompany, companyCodes[edges], rank[edges])
+
+        accepted = edges[(rank[edges] == bestForId[idCodes[edges]]) &
+                         (rank[edges] == bestForCompany[companyCodes[edges]])]
+        assigned[accepted] = True
+        idDone[idCodes[accepted]] = True
+        companyDone[companyCodes[accepted]] = True
+
+        ### the other edges of the assigned IDs and companies are removed
+        active &= ~idDone[idCodes] & ~companyDone[companyCodes]
+
+    return assigned
+
+
+def scoreBounds(df, rules=STATE_RULES):
+    """Return the lowest and highest totalScore each record can reach before the
+    dateDiff and distance columns are calculated.
+
+    The name and location points only need the name scores and the city and state
+    fields, so they are scored exactly. The penalty, distance, and dateDiff points
+    are replaced by the lowest and highest points of their band tables, where the
+    distance points are only included for records that can receive them.
+    """
+
+    unknown = dict({col: np.nan for col in DISTANCE_COLUMNS}, dateDiff=np.nan)
+    features = candidateFeatures(df.assign(**unknown), rules)
+
+    ### with no dateDiff or distances, only the name and location points are scored
+    known = scoreFeatures(features, rules)
+
+    distanceMin, distanceMax = _pointsRange([p for low, high, p in rules['distanceBands']])
+    penaltyMin, penaltyMax = _pointsRange([p for low, high, p in rules['incPenaltyBands']])
+    dateMin, dateMax = _pointsRange([p for low, high, p in rules['dateDiffBands']])
+
+    if rules['locationRule'] == 'cityState':
+        distance = ~features['cityEq'].to_numpy(dtype=bool)
+
+    else:
+        distance = np.ones(len(features), dtype=bool)
+
+    filedBeforeInc = features['filedBeforeInc'].to_numpy(dtype=bool)
+
+    lower = known + np.where(distance, distanceMin, 0) + np.where(filedBeforeInc, penaltyMin, 0) + dateMin
+    upper = known + np.where(distance, distanceMax, 0) + np.where(filedBeforeInc, penaltyMax, 0) + dateMax
+
+    return lower, upper
+
+
+def pruneCandidates(df, k=1, rules=STATE_RULES, idCol='ID'):
+    """Return a boolean array that is False for the records that cannot be among the
+    k best records of their ID.
+
+    The bounds from scoreBounds() are converted to scores using the fixed range
+    from scoreRange(), so the pruning is only exact when the scoring script uses
+    the 'fixed' scale mode. A record is dropped when its highest reachable score
+    is lower than the lowest reachable score of k other records of the same ID.
+    Records that could tie are kept, since ties are resolved by dateDiff.
+    """
+
+    scoreMin, scoreMax = scoreRange(rules)
+    lower, upper = scoreBounds(df, rules)
+
+    lowerScore = np.floor(confidenceScores(lower, scoreMin, scoreMax))
+    upperScore = np.floor(confidenceScores(upper, scoreMin, scoreMax))
+
+    ### the k-th highest lower bound of each ID, or -inf for IDs with fewer than
+    ### k records
+    codes = pd.factorize(df[idCol])[0]
+    order = np.lexsort([-lowerScore, codes])
+    starts = np.flatnonzero(np.r_[True, codes[order][1:] != codes[order][:-1]])
+    sizes = np.diff(np.r_[starts, len(order)])
+
+    kth = np.full(len(starts), -np.inf)
+    kth[sizes >= k] = lowerScore[order[starts[sizes >= k] + k - 1]]
+
+    ### the groups in starts are ordered by code since the codes were sorted first
+    return upperScore >= kth[codes]
+
+
+def checkPruning(df, scaleMode, topK=1):
+    """Raise a ValueError when the candidates were pruned with pruneCandidates() and
+    cannot be scored with the same results as the unpruned candidates.
+
+    The pruned candidates are marked with the PRUNE_COLUMN. The pruning uses the
+    fixed range from scoreRange(), so the other scale modes can give other scores
+    (the batch range changes when records are dropped), and only the best
+    PRUNE_COLUMN records of each ID are kept, so topK cannot be larger.
+    """
+
+    if PRUNE_COLUMN not in df:
+        return
+
+    prunedK = pd.to_numeric(df[PRUNE_COLUMN], errors='coerce').min()
+
+    if scaleMode != 'fixed':
+        raise ValueError("The candidates were pruned with pruneTopK=%s, which is only exact with the 'fixed' "
+                         "scale mode, not '%s'" % (prunedK, scaleMode))
+
+    if prunedK < topK:
+        raise ValueError("The candidates were pruned with pruneTopK=%s, which is smaller than topK=%s"
+                         % (prunedK, topK))
+
+
+def distanceDemand(df, distances=[], rules=STATE_RULES, shortCircuit=True):
+    """Return a boolean array that is True for the records whose totalScore can
+    still depend on the next distance column.
+
+    The state rules skip the distance section for records with a city match, so
+    these records never need a distance, while the stateless rules score every
+    distance. rules is a rule dict or a list of the rule dicts that will score the
+    records, and a distance is needed when any of them can use it. distances is
+    the list of the distance columns already calculated. Since the distance bands
+    are evaluated in order, a record with a calculated distance in the first band
+    receives those points no matter what the remaining distances are, so with
+    shortCircuit the remaining distances are not needed. The short-circuit depends
+    on the band edges, so the skipped distances are missing when the records are
+    re-scored with other bands.
+    """
+
+    if isinstance(rules, dict):
+        rules = [rules]
+
+    demand = np.zeros(len(df), dtype=bool)
+
+    for profileRules in rules:
+        if profileRules['locationRule'] == 'cityState':
+            needed = ~_columnsEqual(df, 'city', ['cityMatch', 'address_city', 'agent_city'])
+
+        else:
+            needed = np.ones(len(df), dtype=bool)
+
+        if shortCircuit:
+            low, high, points = profileRules['distanceBands'][0]
+
+            for values in distances:
+                needed &= ~_inBand(np.asarray(values, dtype='float64'), low, high)
+
+        demand |= needed
+
+    return demand
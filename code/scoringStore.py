@@ -0,0 +1,172 @@
+import pandas as pd
+import numpy as np
+import os
+import json
+import hashlib
+import scoringEngine
+
+"""
+Author: Joshua Chu
+Date: October 18, 2026
+
+Description: this module saves the inputs of the scoring rules as a compact feature
+store keyed by ID and candidate, where candidate is the position of the record
+within its ID in the readyForScoring.csv file. The store only holds the columns the
+band tables in scoringEngine.py read, saved with small data types to a compressed
+numpy file. Re-scoring with a changed set of bands only needs to load this file
+and does not require the 'Merge OpenCorporate Results with Input Data and Clean for
+Scoring.py' script to be run again.
+
+The module also holds the decision store used for incremental scoring. The store
+records a fingerprint of the candidate set of each ID with the company of its best
+record, so a later run only needs to score the IDs whose candidates changed.
+
+"""
+
+### the data types used to save each column of the feature store
+FEATURE_TYPES = {
+    'ID': 'int64',
+    'candidate': 'int32',
+    'nameScores': 'float32',
+    'orgLength': 'int16',
+    'stateEq': 'bool',
+    'cityEq': 'bool',
+    'filedBeforeInc': 'bool',
+    'dateDiff': 'float64',
+    'cityToAddrDistance': 'float32',
+    'cityToAgtDistance': 'float32',
+    'cityToDataDistance': 'float32',
+    'record_date': 'datetime64[ns]',
+}
+
+
+def buildFeatureStore(df):
+    """Extract the scoring features and keys from the readyForScoring data."""
+
+    features = scoringEngine.candidateFeatures(df)
+
+    features.insert(0, 'ID', df['ID'].to_numpy())
+    features.insert(1, 'candidate', df.groupby('ID', sort=False).cumcount().to_numpy())
+    features['record_date'] = pd.to_datetime(df['record_date'], errors='coerce')
+
+    return features.astype(FEATURE_TYPES).reset_index(drop=True)
+
+
+def saveFeatureStore(path, features):
+    """Save the feature store to a compressed numpy file."""
+
+    np.savez_compressed(path, **{col: features[col].to_numpy() for col in FEATURE_TYPES})
+    os.chmod(path, 0o777)
+
+
+def loadFeatureStore(path):
+    """Load the feature store saved by saveFeatureStore()."""
+
+    with np.load(path) as store:
+        features = pd.DataFrame({col: store[col] for col in FEATURE_TYPES})
+
+    return features.astype(FEATURE_TYPES)
+
+
+def featureStoreIsCurrent(path, input_directory):
+    """Check if the feature store exists and is newer than the input file."""
+
+    return os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(input_directory)
+
+
+def candidateFingerprints(chunks, idCol='ID'):
+    """Return a fingerprint of the candidate records of each ID.
+
+    The chunks should be read with dtype=str, so the fingerprint of a record does
+    not depend on the data types pandas guesses for each chunk. The fingerprint
+    changes when a record of the ID is added, removed, changed, or moved, since
+    the position of each record within its ID is part of its fingerprint.
+    """
+
+    ids = []
+    rowHashes = []
+
+    for chunk in chunks:
+        ids.append(pd.to_numeric(chunk[idCol]).to_numpy())
+        rowHashes.append(pd.util.hash_pandas_object(chunk, index=False).to_numpy())
+
+    ids = np.concatenate(ids) if ids else np.zeros(0, dtype='int64')
+    rowHashes = np.concatenate(rowHashes) if rowHashes else np.zeros(0, dtype='uint64')
+
+    positions = pd.Series(ids).groupby(ids, sort=False).cumcount().to_numpy()
+    rowHashes = pd.util.hash_pandas_object(pd.DataFrame({'row': rowHashes, 'position': positions}),
+                                           index=False).to_numpy()
+
+    ### the record fingerprints of each ID are combined with an exclusive or
+    order = np.argsort(ids, kind='mergesort')
+    starts = np.flatnonzero(np.r_[True, ids[order][1:] != ids[order][:-1]])[:len(ids)]
+
+    fingerprints = np.bitwise_xor.reduceat(rowHashes[order], starts) if len(ids) else rowHashes
+
+    return pd.Series(fingerprints, index=pd.Index(ids[order][starts], name=idCol), name='fingerprint')
+
+
+def settingsFingerprint(*settings):
+    """Return a fingerprint of the scoring rules and settings used for a run."""
+
+    return hashlib.sha1(json.dumps(settings, default=str, sort_keys=True).encode()).hexdigest()
+
+
+def saveDecisionStore(path, fingerprints, winners, settings, idCol='ID'):
+    """Save the candidate fingerprint and best company of each ID to a compressed numpy file."""
+
+    winners = winners.drop_duplicates(subset=[idCol]).set_index(idCol).reindex(fingerprints.index)
+
+    np.savez_compressed(path,
+                        ID=fingerprints.index.to_numpy(),
+                        fingerprint=fingerprints.to_numpy(dtype='uint64'),
+                        company_number=winners['company_number'].astype(str).to_numpy(dtype=str),
+                        jurisdiction_code=winners['jurisdiction_code'].astype(str).to_numpy(dtype=str),
+                        settings=np.array(settings))
+    os.chmod(path, 0o777)
+
+
+def loadDecisionStore(path):
+    """Load the decision store saved by saveDecisionStore() and its settings fingerprint."""
+
+    with np.load(path) as store:
+        decisions = pd.DataFrame({col: store[col] for col in ['ID', 'fingerprint', 'company_number',
+                                                              'jurisdiction_code']})
+        settings = str(store['settings'])
+
+    return decisions, settings
+
+
+def changedIDs(fingerprints, decisions, idCol='ID'):
+    """Return the IDs that are new or whose candidates changed since the decisions were saved,
+    and the IDs that no longer have candidates."""
+
+    previous = decisions.set_index(idCol)['fingerprint']
+    known = fingerprints.index.isin(previous.index)
+
+    unchanged = np.zeros(len(fingerprints), dtype=bool)
+    unchanged[known] = previous.loc[fingerprints.index[known]].to_numpy() == fingerprints.to_numpy()[known]
+
+    changed = fingerprints.index[~unchanged]
+    removed = decisions.loc[~decisions[idCol].isin(fingerprints.index), idCol].to_numpy()
+
+    return changed.to_numpy(), removed
+
+
+def mergeScoredFile(path, changedPath, replaceIDs, idCol='ID'):
+    """Replace the records of replaceIDs in a scoring output file with the records
+    in changedPath, keeping the file sorted by ID.
+
+    Both files are read as text, so the records that are kept are written back
+    exactly as they were.
+    """
+
+    previous = pd.read_csv(path, dtype=str, keep_default_na=False)
+    changed = pd.read_csv(changedPath, dtype=str, keep_default_na=False)
+
+    previous = previous.loc[~pd.to_numeric(previous[idCol]).isin(replaceIDs)]
+    merged = pd.concat([previous, changed], axis=0, ignore_index=True)
+    merged = merged.iloc[np.argsort(pd.to_numeric(merged[idCol]).to_numpy(), kind='mergesort')]
+
+    merged.to_csv(path, index=False)
+    os.chmod(path, 0o777)
@@ -0,0 +1,163 @@
+import pandas as pd
+import numpy as np
+import itertools
+import copy
+import scoringEngine
+
+"""
+Author: Joshua Chu
+Date: October 18, 2026
+
+Description: this module evaluates many configurations of the scoring rules against
+a set of human-reviewed labels. Each configuration is a small set of parameters that
+replace the band edges and points of the state rules in scoringEngine.py. The
+features are extracted once and every configuration is scored with the columnar
+engine, followed by a top-1 selection that reuses a single sort of the candidates.
+The precision and recall of the top-1 pick is reported for each configuration.
+
+The confidence scores, and so acceptScore, depend on the totalScore range used to
+scale them, so the configurations are scaled with the same scale modes as the
+scoring script: 'batch' uses the range of every candidate in the input file scored
+with the configuration, 'fixed' uses scoringEngine.scoreRange(), and 'calibration'
+uses the range saved by a previous batch run of the scoring script. A tuned
+acceptScore only applies to scoring runs with the same scale mode.
+
+"""
+
+### the parameters that can be tuned and their values in the state rules. The name
+### cuts are the lower edges of the 87-90 and 90-100 bands, the distance cuts are the
+### upper edges of the 0-50, 50-100, and 100-200 mile bands, and acceptScore is the
+### lowest score (1-10) that is accepted as a match
+TUNING_DEFAULTS = {
+    'nameLowCut': 87,
+    'nameHighCut': 90,
+    'nameBelowPoints': -7,
+    'nameMissingPoints': -10,
+    'statePoints': 5,
+    'cityPoints': 5,
+    'distanceNearMiles': 50,
+    'distanceMidMiles': 100,
+    'distanceFarMiles': 200,
+    'distanceNearPoints': 5,
+    'distanceMidPoints': 2,
+    'distanceFarPoints': 1,
+    'distanceOutPoints': -2,
+    'acceptScore': 1,
+}
+
+
+def rulesFromParams(params, base=scoringEngine.STATE_RULES):
+    """Build a set of scoring rules from the tuning parameters.
+
+    Parameters that are not included are taken from TUNING_DEFAULTS.
+    """
+
+    unknown = set(params) - set(TUNING_DEFAULTS)
+    if unknown:
+        raise KeyError("Unknown tuning parameters: %s" % sorted(unknown))
+
+    p = dict(TUNING_DEFAULTS, **params)
+    rules = copy.deepcopy(base)
+
+    exact, high, low, below = rules['nameBands']
+    rules['nameBands'] = [exact,
+                          (p['nameHighCut'], 100, high[2], high[3]),
+                          (p['nameLowCut'], p['nameHighCut'], low[2], low[3]),
+                          (-np.inf, p['nameLowCut'], [], [p['nameBelowPoints']])]
+    rules['nameMissingPoints'] = p['nameMissingPoints']
+    rules['statePoints'] = p['statePoints']
+    rules['cityPoints'] = p['cityPoints']
+    rules['distanceBands'] = [(0, p['distanceNearMiles'], p['distanceNearPoints']),
+                              (p['distanceNearMiles'], p['distanceMidMiles'], p['distanceMidPoints']),
+                              (p['distanceMidMiles'], p['distanceFarMiles'], p['distanceFarPoints']),
+                              (p['distanceFarMiles'], np.inf, p['distanceOutPoints'])]
+
+    return rules
+
+
+def parameterGrid(space):
+    """Return every combination of the values listed for each parameter."""
+
+    names = list(space)
+
+    return [dict(zip(names, values)) for values in itertools.product(*[space[n] for n in names])]
+
+
+def parameterSample(space, n, seed=0):
+    """Return n configurations with a random value drawn for each parameter."""
+
+    rng = np.random.RandomState(seed)
+
+    return [{name: values[rng.randint(len(values))] for name, values in space.items()} for i in range(n)]
+
+
+def evaluateConfigurations(features, correct, nMatches, configs, scaleMode='fixed', rangeFeatures=None,
+                           calibration=None):
+    """Score every configuration and report the precision and recall of the top-1 pick.
+
+    features holds the scoring features with the ID, dateDiff, and record_date
+    columns for the labeled IDs only. correct is True for the candidates that are
+    the reviewed company for their ID, and nMatches is the number of labeled IDs
+    where the reviewers found a correct company, including the IDs with no
+    candidates in the input file, so the recall counts the IDs lost upstream.
+
+    With the 'batch' scale mode, rangeFeatures holds the scoring features of every
+    candidate in the input file (duplicate rows can be dropped), and with the
+    'calibration' scale mode, calibration is the (scoreMin, scoreMax) range saved
+    by the scoring script.
+    """
+
+    if scaleMode not in ('batch', 'fixed', 'calibration'):
+        raise ValueError("Unknown scale mode: %s" % scaleMode)
+
+    ### the candidates are sorted once by ID and the tie-break columns. After this,
+    ### the top-1 pick of a configuration is the first candidate of each ID with the
+    ### highest score, which only needs a group max
+    order = pd.DataFrame({'ID': pd.factorize(features['ID'])[0],
+                          'dateDiff': features['dateDiff'].to_numpy(),
+                          'record_date': features['record_date'].to_numpy(),
+                          'position': np.arange(len(features))})
+    order = order.sort_values(by=['ID', 'dateDiff', 'record_date', 'position'],
+                              ascending=[True, False, False, True]).index.to_numpy()
+
+    sortedFeatures = features.iloc[order].reset_index(drop=True)
+    correct = np.asarray(correct, dtype=bool)[order]
+
+    codes = pd.factorize(sortedFeatures['ID'])[0]
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    positions = np.arange(len(sortedFeatures))
+
+    results = []
+
+    for params in configs:
+        rules = rulesFromParams(params)
+        totalScore = scoringEngine.scoreFeatures(sortedFeatures, rules)
+
+        if scaleMode == 'batch':
+            batchScore = scoringEngine.scoreFeatures(rangeFeatures, rules)
+            scoreMin, scoreMax = batchScore.min(), batchScore.max()
+
+        elif scaleMode == 'fixed':
+            scoreMin, scoreMax = scoringEngine.scoreRange(rules)
+
+        else:
+            scoreMin, scoreMax = calibration
+
+        score = np.floor(scoringEngine.confidenceScores(totalScore, scoreMin, scoreMax))
+
+        groupMax = np.maximum.reduceat(score, starts)
+        isMax = score == np.repeat(groupMax, np.diff(np.r_[starts, len(score)]))
+        picks = np.minimum.reduceat(np.where(isMax, positions, len(score)), starts)
+
+        accepted = groupMax >= dict(TUNING_DEFAULTS, **params)['acceptScore']
+        nAccepted = accepted.sum()
+        nCorrect = (accepted & correct[picks]).sum()
+
+        precision = nCorrect/nAccepted if nAccepted else np.nan
+        recall = nCorrect/nMatches if nMatches else np.nan
+
+        results.append(dict(params, scaleMode=scaleMode, scoreMin=scoreMin, scoreMax=scoreMax,
+                            accepted=nAccepted, correct=nCorrect, precision=precision, recall=recall,
+                            f1=2*precision*recall/(precision+recall) if precision+recall else np.nan))
+
+    return pd.DataFrame(results)
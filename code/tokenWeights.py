@@ -0,0 +1,202 @@
+import pandas as pd
+import numpy as np
+import re
+import sqlite3
+import contextlib
+
+"""
+Author: Joshua Chu
+Date: October 18, 2026
+
+Description: this module keeps the token frequency table used by the weighted token
+scorer in nameMatching.py. Generic tokens such as Technologies, Systems, Industries,
+and International give high fuzz.ratio scores between unrelated organizations, so the
+weighted token scorer compares the names by their tokens instead, where each token is
+weighted by the inverse of the number of names that contain it (idf). A name is
+represented by the vector of its token weights scaled to a length of one, and the
+score of a pair of names is the dot product of their vectors (the cosine similarity)
+times 100. The vectors of the unique names are built once and the dot products of all
+pairs are calculated at once with numpy, which is much faster than the edit distance
+of fuzz.ratio.
+
+The table counts the number of PatentsView organization names and OC names that
+contain each token. When a table file is set with useTable(), the counts are kept in
+a SQLite file with the names that were counted, so each run only adds the names it
+has not seen before and the counts grow with every run. Otherwise the counts are
+kept in memory for the current run only. The table file can be deleted at any time
+to start over.
+
+"""
+
+### the characters that separate the tokens of a name, which are the same characters
+### that are removed by fuzzywuzzy's full_process
+NON_WORD = re.compile(r'(?ui)\W')
+
+### the number of names looked up in the table per query. SQLite limits the number of
+### parameters in a single query
+TABLE_BATCH = 900
+
+### the number of names counted in the table, and the number of names added by the
+### current run
+tableStats = {'names': 0, 'added': 0}
+
+### the path to the table file, which is set with useTable()
+tableFile = None
+
+### the counts kept in memory when no table file is set
+memoryNames = set()
+memoryCounts = {}
+
+
+def nameTokens(name):
+    """Return the unique lowercase tokens of a name."""
+
+    return frozenset(NON_WORD.sub(' ', name).lower().split())
+
+
+def useTable(path):
+    """Keep the token counts in the SQLite file at path (None keeps them in memory)."""
+
+    global tableFile
+
+    if path is not None:
+        with contextlib.closing(sqlite3.connect(path, timeout=600)) as conn, conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS names (name TEXT PRIMARY KEY) WITHOUT ROWID')
+            conn.execute('CREATE TABLE IF NOT EXISTS tokens (token TEXT PRIMARY KEY, names INTEGER) WITHOUT ROWID')
+
+    tableFile = path
+
+
+def _tokenCounts(names):
+    """Return the number of names that contain each token."""
+
+    counts = {}
+    for name in names:
+        for token in nameTokens(name):
+            counts[token] = counts.get(token, 0) + 1
+
+    return counts
+
+
+def updateTable(names):
+    """Add the names that have not been counted before to the token counts.
+
+    Each unique name is counted once, however many rows or runs it appears in.
+    Returns the number of names added.
+    """
+
+    names = [name for name in pd.unique(pd.Series(names, dtype=object)) if isinstance(name, str)]
+
+    if tableFile is None:
+        new = [name for name in names if name not in memoryNames]
+        memoryNames.update(new)
+
+        for token, count in _tokenCounts(new).items():
+            memoryCounts[token] = memoryCounts.get(token, 0) + count
+
+        tableStats['names'] = len(memoryNames)
+
+    else:
+        with contextlib.closing(sqlite3.connect(tableFile, timeout=600)) as conn, conn:
+            ### the names are added and counted in one transaction, so names added by
+            ### another process in the meantime are not counted twice
+            found = set()
+            for i in range(0, len(names), TABLE_BATCH):
+                batch = names[i:i+TABLE_BATCH]
+                found.update(name for name, in conn.execute('SELECT name FROM names WHERE name IN (%s)'
+                                                            % ','.join('?'*len(batch)), batch))
+
+            new = [name for name in names if name not in found]
+            conn.executemany('INSERT INTO names VALUES (?)', [(name,) for name in new])
+            conn.executemany('INSERT INTO tokens VALUES (?, ?) ON CONFLICT (token) DO UPDATE '
+                             'SET names = names + excluded.names', _tokenCounts(new).items())
+
+            tableStats['names'] = conn.execute('SELECT COUNT(*) FROM names').fetchone()[0]
+
+    tableStats['added'] += len(new)
+
+    return len(new)
+
+
+def weightTable():
+    """Return the idf weight of each token in the table.
+
+    The weight is log((1 + N)/(1 + n)) + 1, where N is the number of names counted
+    and n is the number of names that contain the token.
+    """
+
+    if tableFile is None:
+        counts = pd.Series(memoryCounts, dtype=np.float64)
+
+    else:
+        with contextlib.closing(sqlite3.connect(tableFile, timeout=600)) as conn:
+            counts = pd.read_sql_query('SELECT token, names FROM tokens', conn, index_col='token')['names']
+
+    return np.log((1 + tableStats['names'])/(1 + counts.astype(np.float64))) + 1
+
+
+def tokenVectors(names, weights):
+    """Return the token vectors of the names as sorted (row, token) keys and values.
+
+    The tokens are numbered by the vocabulary returned with the vectors. Tokens that
+    are not in the weight table have the weight of a token found in no names.
+    """
+
+    tokens = pd.Series([sorted(nameTokens(name)) for name in names], dtype=object).explode()
+    tokens = tokens.loc[tokens.notnull()]
+
+    tokenIds, vocabulary = pd.factorize(tokens)
+    rows = tokens.index.to_numpy(dtype=np.int64)
+
+    unseen = np.log(1 + tableStats['names']) + 1
+    values = weights.reindex(vocabulary).fillna(unseen).to_numpy()[tokenIds]
+
+    ### each vector is scaled to a length of one
+    lengths = np.sqrt(np.bincount(rows, values**2, minlength=len(names)))
+    values = values/lengths[rows]
+
+    return rows, tokenIds.astype(np.int64), values, pd.Index(vocabulary)
+
+
+def tokenScores(queries, choices, queryIndex, choiceIndex, weights):
+    """Return the weighted token score of each pair of names, rounded to the nearest
+    integer.
+
+    The pairs are given by the positions of their query and choice in the lists of
+    unique queries and choices. Two names without tokens have a score of 100, as
+    they do with fuzz.ratio.
+    """
+
+    rows, tokenIds, values, vocabulary = tokenVectors(list(queries)+list(choices), weights)
+    nQueries = len(queries)
+    nTokens = max(len(vocabulary), 1)
+
+    isQuery = rows < nQueries
+    queryRows, queryTokens, queryValues = rows[isQuery], tokenIds[isQuery], values[isQuery]
+
+    ### the choice vectors are looked up by their (choice, token) keys, which are sorted
+    ### since the rows are in order and the tokens are sorted within each name
+    choiceKeys = (rows[~isQuery]-nQueries)*nTokens + tokenIds[~isQuery]
+    order = np.argsort(choiceKeys, kind='mergesort')
+    choiceKeys, choiceValues = choiceKeys[order], values[~isQuery][order]
+
+    ### each pair is expanded to the tokens of its query, and the matching tokens of its
+    ### choice are found with one binary search
+    starts = np.searchsorted(queryRows, queryIndex, side='left')
+    lengths = np.searchsorted(queryRows, queryIndex, side='right') - starts
+    pairs = np.repeat(np.arange(len(queryIndex)), lengths)
+    entries = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+
+    keys = choiceIndex[pairs]*nTokens + queryTokens[entries]
+    index = np.minimum(np.searchsorted(choiceKeys, keys), max(len(choiceKeys)-1, 0))
+    found = choiceKeys[index] == keys if len(choiceKeys) else np.zeros(len(keys), dtype=bool)
+
+    dots = np.bincount(pairs[found], queryValues[entries[found]]*choiceValues[index[found]],
+                       minlength=len(queryIndex))
+
+    ### the names without tokens have a score of 0, or 100 against another name without tokens
+    queryEmpty = np.bincount(rows[isQuery], minlength=nQueries)[queryIndex] == 0
+    choiceEmpty = np.bincount(rows[~isQuery]-nQueries, minlength=len(choices))[choiceIndex] == 0
+    dots[queryEmpty & choiceEmpty] = 1
+
+    return np.round(np.minimum(dots, 1)*100)